@@ -0,0 +1,125 @@
+"""
+OpenAI Batch API plumbing for offline bulk runs.
+
+    flask batch compile    # pending personas/scripts -> BATCH_FOLDER/<id>.jsonl
+    flask batch submit     # upload compiled files and create the batches
+    flask batch collect    # fetch finished batches and complete their rows
+    flask batch run        # all three, for cron
+    flask batch cancel ID  # cancel a batch and its requests
+
+Personas and scripts requested with mode=batch are stored as "pending"
+instead of being sent. Compiling groups them into JSONL files of
+/v1/responses requests (custom_id "persona:<id>" / "script:<id>"); the
+results are applied with the same code as polling and webhooks. Batches
+are billed at half price and don't use the interactive rate limits, in
+exchange for up to 24h of latency. The domain side (which rows, which
+prompts, applying results) lives with the other job code in sora.py.
+"""
+import json
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+from metrics import upstream
+
+ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+TERMINAL = ("completed", "failed", "expired", "cancelled")
+# Every other status upstream reports; listed so the collect sweep reads them through the status index
+OPEN = ("validating", "in_progress", "finalizing", "cancelling")
+MAX_REQUESTS = 50000   # per batch, an API limit
+
+
+def request_line(custom_id, body):
+    return {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body}
+
+
+def write(batch, lines, root):
+    """Write a batch's request lines to root/<batch id>.jsonl."""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"{batch.id}.jsonl")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+    batch.path = path
+    batch.request_count = len(lines)
+
+
+def upload(client, batch):
+    """Upload a compiled batch's input file."""
+    with open(batch.path, "rb") as f, upstream("batch", "files.create"):
+        uploaded = client.files.create(file=f, purpose="batch")
+    batch.input_file_id = uploaded.id
+
+
+def create(client, batch):
+    """Create the upstream batch for an uploaded input file."""
+    with upstream("batch", "batches.create"):
+        remote = client.batches.create(input_file_id=batch.input_file_id, endpoint=ENDPOINT,
+                                       completion_window=COMPLETION_WINDOW,
+                                       metadata={"batch_id": batch.id})
+    batch.openai_batch_id = remote.id
+    batch.status = remote.status
+    batch.submitted_at = datetime.utcnow()
+
+
+def refresh(client, batch):
+    """Update a submitted batch from upstream; True once it is terminal."""
+    with upstream("batch", "batches.retrieve"):
+        remote = client.batches.retrieve(batch.openai_batch_id)
+    batch.status = remote.status
+    batch.output_file_id = getattr(remote, "output_file_id", None)
+    batch.error_file_id = getattr(remote, "error_file_id", None)
+    counts = getattr(remote, "request_counts", None)
+    if counts is not None:
+        counts = counts if isinstance(counts, dict) else vars(counts)
+        batch.completed_count = counts.get("completed") or 0
+        batch.failed_count = counts.get("failed") or 0
+    if batch.status in TERMINAL:
+        batch.completed_at = datetime.utcnow()
+        return True
+    return False
+
+
+def cancel(client, batch):
+    """Cancel a submitted batch upstream; it ends as "cancelled" once in-flight requests finish."""
+    with upstream("batch", "batches.cancel"):
+        remote = client.batches.cancel(batch.openai_batch_id)
+    batch.status = remote.status
+    if batch.status in TERMINAL:
+        batch.completed_at = datetime.utcnow()
+
+
+def results(client, batch):
+    """(custom_id, response body, error) for every line of the output and error files."""
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        with upstream("batch", "files.content"):
+            content = client.files.content(file_id)
+        for raw in content.text.splitlines():
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                yield line["custom_id"], None, line.get("error") or response.get("body")
+            else:
+                yield line["custom_id"], response["body"], None
+
+
+def as_response(body):
+    """A batched /v1/responses body in the shape responses.retrieve returns."""
+    text = "".join(
+        part.get("text", "")
+        for item in body.get("output") or [] if item.get("type") == "message"
+        for part in item.get("content") or [] if part.get("type") == "output_text"
+    )
+    return SimpleNamespace(id=body.get("id"), status=body.get("status", "completed"), output_text=text)
+
+
+def init_app(app):
+    app.config.setdefault("BATCH_FOLDER", os.environ.get("BATCH_FOLDER", "batches"))
+    app.config.setdefault("BATCH_MAX_REQUESTS", min(int(os.environ.get("BATCH_MAX_REQUESTS", 5000)), MAX_REQUESTS))
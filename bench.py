@@ -0,0 +1,411 @@
+"""
+Offline load/latency benchmark for the sora.py API.
+
+Drives the full persona -> script -> video flow for N concurrent users
+against a throwaway SQLite database and the in-process FakeOpenAI, then
+reports throughput, per-endpoint latency percentiles, DB query counts and
+RSS. Nothing touches the network or the real app.db.
+
+    python bench.py --users 8 --flows 2
+    python bench.py --users 32 --latency 0.05 --failure-rate 0.1 --json
+    python bench.py --webhooks         # signed completion events, polling as fallback
+    python bench.py --startup          # cold-start time vs STARTUP_BUDGET_MS
+"""
+import argparse
+import io
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_openai import FakeOpenAI
+
+
+TERMINAL = ("completed", "failed")
+
+
+def _percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def _rss_kb():
+    """Current resident set size in KB (falls back to the peak value)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _make_image(size_kb):
+    """A real JPEG padded with a trailing comment so it is roughly size_kb."""
+    from PIL import Image as PILImage
+
+    buf = io.BytesIO()
+    PILImage.new("RGB", (64, 64), (200, 120, 40)).save(buf, format="JPEG")
+    data = buf.getvalue()
+    if size_kb * 1024 > len(data):
+        data = data[:-2] + b"\xff\xfe" + b"\x00" * (size_kb * 1024 - len(data)) + b"\xff\xd9"
+    return data
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint latencies and query counts."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)   # endpoint -> [seconds]
+        self.queries = defaultdict(int)      # endpoint -> total queries
+        self.errors = defaultdict(int)       # endpoint -> non-2xx count
+        self.local = threading.local()
+
+    def count_query(self, *args):
+        self.local.queries = getattr(self.local, "queries", 0) + 1
+
+    def call(self, endpoint, fn, *args, **kwargs):
+        self.local.queries = 0
+        start = time.perf_counter()
+        resp = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.queries[endpoint] += self.local.queries
+            if resp.status_code >= 400:
+                self.errors[endpoint] += 1
+        return resp
+
+
+def build_app(workdir, openai_client=None, **config):
+    """Create the sora app against a scratch database and folders inside workdir."""
+    import sora
+    from extensions import db
+
+    app = sora.create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(workdir, "bench.db"),
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "VIDEO_FOLDER": os.path.join(workdir, "videos"),
+        "RATELIMIT_ENABLED": False,
+        **config,
+    }, openai_client=openai_client)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def run_flow(client, rec, user_idx, flow_idx, image_bytes, poll_interval, timeout, fused=False, mode=None,
+             export=False, seconds=None, think=0.0):
+    """One persona -> script -> video flow; returns the final video status."""
+
+    def poll(endpoint, url):
+        deadline = time.time() + timeout
+        while True:
+            data = rec.call(endpoint, client.get, url).get_json() or {}
+            if data.get("status") in TERMINAL or time.time() > deadline:
+                return data.get("status")
+            time.sleep(poll_interval)
+
+    r = rec.call("POST /api/project", client.post, "/api/project", data={
+        "name": f"Bench {user_idx}-{flow_idx}", "description": "Benchmark project"})
+    project_id = r.get_json()["project_id"]
+
+    r = rec.call("POST /api/save-img", client.post, "/api/save-img", data={
+        "image": (io.BytesIO(image_bytes), "product.jpg")}, content_type="multipart/form-data")
+    image_id = r.get_json()["image_id"]
+
+    rec.call("POST /api/add-project-img", client.post, "/api/add-project-img", data={
+        "project_id": project_id, "image_id": image_id})
+
+    persona_form = {
+        "description": "A reusable stainless steel water bottle that keeps drinks cold for 24h",
+        "product_name": "Bench Bottle",
+        "person_description": "Active young professional",
+        "image_id": image_id,
+        "project_id": project_id,
+    }
+    extra = {"mode": mode} if mode else {}
+    if fused:
+        r = rec.call("POST /api/persona-script", client.post, "/api/persona-script",
+                     data={**persona_form, "tone": "casual"})
+        script_id = (r.get_json() or {}).get("script_id")
+    else:
+        r = rec.call("POST /api/persona", client.post, "/api/persona", data={**persona_form, **extra})
+        persona_id = (r.get_json() or {}).get("persona_id")
+        if not persona_id or poll("GET /api/persona/<id>/status", f"/api/persona/{persona_id}/status") != "completed":
+            return "persona_failed"
+        time.sleep(think)   # the user reads the persona before asking for a script
+
+        r = rec.call("POST /api/script", client.post, "/api/script", data={
+            "persona_id": persona_id, "tone": "casual", **extra, **({"seconds": seconds} if seconds else {})})
+        script_id = (r.get_json() or {}).get("script_id")
+    script_start = time.perf_counter()
+    if not script_id or poll("GET /api/script/<id>/status", f"/api/script/{script_id}/status") != "completed":
+        return "script_failed"
+    with rec.lock:
+        # What the user waits for between asking for a script and having it
+        rec.latencies["script wait"].append(time.perf_counter() - script_start)
+
+    r = rec.call("POST /api/video", client.post, "/api/video", data={"script_id": script_id})
+    video_id = (r.get_json() or {}).get("video_id")
+    if not video_id:
+        return "video_failed"
+    status = poll("GET /api/video/<id>/status", f"/api/video/{video_id}/status")
+    if export and status == "completed":
+        r = rec.call("GET /api/project/<id>/export", client.get, f"/api/project/{project_id}/export")
+        if r.status_code != 200 or len(r.data) != int(r.headers["Content-Length"]):
+            return "export_failed"
+    return status
+
+
+def run_user(app, rec, user_idx, flows, image_bytes, poll_interval, timeout, fused=False, mode=None,
+             export=False, seconds=None, think=0.0):
+    client = app.test_client()
+    rec.call("POST /auth/dev-login", client.post, "/auth/dev-login",
+             data={"email": f"user{user_idx}@bench.local"})
+    return [run_flow(client, rec, user_idx, i, image_bytes, poll_interval, timeout, fused, mode, export, seconds,
+                     think)
+            for i in range(flows)]
+
+
+WEBHOOK_SECRET = "whsec_" + "YmVuY2gtd2ViaG9vay1zZWNyZXQ="
+
+
+def deliver_webhooks(app, fake, rec, stop, interval=0.05):
+    """Post the fake's signed job events to the app, like OpenAI would."""
+    client = app.test_client()
+    while not stop.wait(interval):
+        for event in fake.due_events():
+            body, headers = fake.sign_event(event, WEBHOOK_SECRET)
+            rec.call("POST /api/webhooks/openai", client.post, "/api/webhooks/openai",
+                     data=body, headers=headers)
+
+
+def run_batches(app, stop, interval=0.2):
+    """Run `flask batch run` in a loop, like the cron job would."""
+    runner = app.test_cli_runner()
+    while not stop.wait(interval):
+        result = runner.invoke(args=["batch", "run"])
+        if result.exception is not None:
+            print(f"flask batch run failed: {result.exception!r}", file=sys.stderr)
+
+
+def run_benchmark(args):
+    from sqlalchemy import event
+    from extensions import db
+
+    workdir = tempfile.mkdtemp(prefix="ugc-bench-")
+    fake = FakeOpenAI(latency=args.latency, jitter=args.jitter, job_seconds=args.job_seconds,
+                      video_seconds=args.video_seconds, failure_rate=args.failure_rate,
+                      error_rate=args.error_rate, output_chars=args.output_chars,
+                      video_bytes=args.video_kb * 1024, seed=args.seed)
+    config = {}
+    if args.webhooks:
+        config = {"OPENAI_WEBHOOK_SECRET": WEBHOOK_SECRET,
+                  "STATUS_POLL_INTERVAL": args.fallback_poll_interval}
+    if args.inline_images:
+        config["OPENAI_FILES_ENABLED"] = False
+    if args.speculative:
+        config["SPECULATIVE_SCRIPTS"] = True
+    app = build_app(workdir, openai_client=fake, **config)
+
+    rec = Recorder()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", rec.count_query)
+
+    image_bytes = _make_image(args.image_kb)
+    stop = threading.Event()
+    if args.webhooks:
+        threading.Thread(target=deliver_webhooks, args=(app, fake, rec, stop), daemon=True).start()
+    if args.batch:
+        app.config["BATCH_FOLDER"] = os.path.join(workdir, "batches")
+        threading.Thread(target=run_batches, args=(app, stop), daemon=True).start()
+    rss_before = _rss_kb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_user, app, rec, u, args.flows, image_bytes,
+                               args.poll_interval, args.timeout, args.fused,
+                               "batch" if args.batch else None, args.export, args.seconds, args.think)
+                   for u in range(args.users)]
+        outcomes = [o for f in futures for o in f.result()]
+    wall = time.perf_counter() - start
+    stop.set()
+    event.remove(engine, "before_cursor_execute", rec.count_query)
+
+    endpoints = {}
+    for name, values in sorted(rec.latencies.items()):
+        values.sort()
+        endpoints[name] = {
+            "count": len(values),
+            "errors": rec.errors[name],
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p50_ms": 1000 * _percentile(values, 50),
+            "p95_ms": 1000 * _percentile(values, 95),
+            "p99_ms": 1000 * _percentile(values, 99),
+            "queries_per_call": rec.queries[name] / len(values),
+        }
+
+    total_requests = sum(e["count"] for e in endpoints.values())
+    return {
+        "users": args.users,
+        "flows": len(outcomes),
+        "completed_flows": outcomes.count("completed"),
+        "outcomes": {o: outcomes.count(o) for o in sorted(set(outcomes))},
+        "wall_seconds": wall,
+        "flows_per_second": len(outcomes) / wall if wall else 0.0,
+        "requests_per_second": total_requests / wall if wall else 0.0,
+        "db_queries": sum(rec.queries.values()),
+        "upstream_calls": dict(fake.calls),
+        "rss_kb_before": rss_before,
+        "rss_kb_after": _rss_kb(),
+        "rss_kb_peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "endpoints": endpoints,
+        "workdir": workdir,
+    }
+
+
+STARTUP_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; {module}.create_app(); "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_startup(module="sora", runs=5):
+    """Cold import + create_app() time of module, in fresh interpreters, in ms."""
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env["PYTHONWARNINGS"] = "ignore"
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET.format(module=module)],
+                             cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(1000 * float(out.strip().splitlines()[-1]))
+    samples.sort()
+    return {"module": module, "runs": runs, "min_ms": samples[0],
+            "median_ms": samples[len(samples) // 2], "max_ms": samples[-1]}
+
+
+def seed_rows(app, videos):
+    """Bulk-insert a realistic spread of users, projects, images, personas, scripts and videos."""
+    import uuid
+    from datetime import datetime, timedelta
+    from extensions import db
+    from models import Image, Persona, Project, Project_images, Script, User, Video
+
+    # Mostly finished rows, as in a database that has been running for a while
+    statuses = ("completed",) * 45 + ("failed", "failed", "queued", "in_progress", "cancelled")
+    now = datetime.utcnow()
+    users, projects, images, links, personas, scripts, rows = [], [], [], [], [], [], []
+    for i in range(videos):
+        at = now - timedelta(minutes=videos - i)
+        status = statuses[i % len(statuses)]
+        if i % 50 == 0:
+            users.append({"id": str(uuid.uuid4()), "email": f"seed{i}@example.com", "credits": 0, "created_at": at})
+        if i % 10 == 0:
+            projects.append({"id": str(uuid.uuid4()), "user_id": users[-1]["id"], "name": f"p{i}", "created_at": at})
+            digest = uuid.uuid4().hex * 2
+            images.append({"id": str(uuid.uuid4()), "user_id": users[-1]["id"], "url": "", "path": f"blobs/{digest}",
+                           "sha256": digest, "created_at": at})
+            links.append({"project_id": projects[-1]["id"], "image_id": images[-1]["id"]})
+        if i % 2 == 0:
+            personas.append({"id": str(uuid.uuid4()), "project_id": projects[-1]["id"], "image_id": images[-1]["id"],
+                             "product_name": "p", "description": "d", "persona_json": {}, "status": status,
+                             "openai_job_id": f"resp_{uuid.uuid4().hex}", "created_at": at})
+            scripts.append({"id": str(uuid.uuid4()), "persona_id": personas[-1]["id"],
+                            "project_id": projects[-1]["id"], "tone": "casual", "script_txt": "", "status": status,
+                            "openai_job_id": f"resp_{uuid.uuid4().hex}", "created_at": at})
+        rows.append({"id": str(uuid.uuid4()), "script_id": scripts[-1]["id"], "project_id": projects[-1]["id"],
+                     "status": status, "openai_job_id": f"video_{uuid.uuid4().hex}", "created_at": at,
+                     "file_path": f"videos/{uuid.uuid4()}.mp4" if status == "completed" else None})
+    with app.app_context():
+        for model, values in ((User, users), (Project, projects), (Image, images), (Project_images, links),
+                              (Persona, personas), (Script, scripts), (Video, rows)):
+            db.session.execute(model.__table__.insert(), values)
+        db.session.commit()
+
+
+def print_report(report, out=sys.stdout):
+    out.write(f"users={report['users']} flows={report['flows']} "
+              f"completed={report['completed_flows']} outcomes={report['outcomes']}\n")
+    out.write(f"wall={report['wall_seconds']:.2f}s  flows/s={report['flows_per_second']:.2f}  "
+              f"req/s={report['requests_per_second']:.1f}\n")
+    out.write(f"db_queries={report['db_queries']}  upstream={report['upstream_calls']}\n")
+    out.write(f"rss_kb before={report['rss_kb_before']} after={report['rss_kb_after']} "
+              f"peak={report['rss_kb_peak']}\n\n")
+    out.write(f"{'endpoint':<32}{'count':>7}{'err':>5}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'q/call':>8}\n")
+    for name, e in report["endpoints"].items():
+        out.write(f"{name:<32}{e['count']:>7}{e['errors']:>5}{e['p50_ms']:>9.1f}"
+                  f"{e['p95_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['queries_per_call']:>8.1f}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the UGC generator API offline.")
+    parser.add_argument("--users", type=int, default=4, help="concurrent simulated users")
+    parser.add_argument("--flows", type=int, default=1, help="persona->script->video flows per user")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-stage polling timeout")
+    parser.add_argument("--image-kb", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake upstream RTT in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--job-seconds", type=float, default=0.2)
+    parser.add_argument("--video-seconds", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output-chars", type=int, default=None)
+    parser.add_argument("--video-kb", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--webhooks", action="store_true",
+                        help="deliver signed job events and throttle status polling")
+    parser.add_argument("--fallback-poll-interval", type=float, default=30.0,
+                        help="STATUS_POLL_INTERVAL used with --webhooks")
+    parser.add_argument("--fused", action="store_true",
+                        help="create persona and script with one /api/persona-script call")
+    parser.add_argument("--batch", action="store_true",
+                        help="queue personas/scripts with mode=batch and run `flask batch run` in a loop")
+    parser.add_argument("--inline-images", action="store_true",
+                        help="send images as base64 data URLs instead of Files API ids")
+    parser.add_argument("--export", action="store_true",
+                        help="download each finished project as a ZIP from /api/project/<id>/export")
+    parser.add_argument("--seconds", type=int, default=None,
+                        help="ad length; over 12 renders one clip per scene and stitches them (needs ffmpeg)")
+    parser.add_argument("--speculative", action="store_true",
+                        help="pre-generate scripts in the user's usual tones when a persona completes")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="seconds a user waits between a finished persona and asking for its script")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure cold import + create_app() time instead of load")
+    parser.add_argument("--startup-budget-ms", type=float,
+                        default=float(os.environ.get("STARTUP_BUDGET_MS", 1000)))
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        results = [measure_startup(m) for m in ("sora", "chat_server")]
+        for r in results:
+            print(f"{r['module']:<12} min={r['min_ms']:.0f}ms median={r['median_ms']:.0f}ms "
+                  f"max={r['max_ms']:.0f}ms budget={args.startup_budget_ms:.0f}ms")
+        if any(r["median_ms"] > args.startup_budget_ms for r in results):
+            sys.exit("startup budget exceeded")
+        return
+
+    report = run_benchmark(args)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Content-addressed storage for uploaded images.
+
+File uploads are spooled straight into UPLOAD_FOLDER and hashed while the
+multipart body is parsed, so storing one is a single rename to
+
+    <UPLOAD_FOLDER>/blobs/<first 2 hex>/<sha256>.<ext>
+
+Identical bytes always land on the same blob, however often (and by whom)
+they are uploaded; Image rows point at the shared file.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app, has_request_context, request
+
+
+CHUNK_SIZE = 64 * 1024
+HEADER_BYTES = 16
+SPOOL_DIR = ".spool"
+
+
+def sniff_image_type(head):
+    """Extension for the image format in the leading bytes, or None. No decoding."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class HashingSpool:
+    """Temp file that hashes, counts and keeps the header of what is written to it."""
+
+    def __init__(self, directory):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix="upload-")
+        self.file = os.fdopen(fd, "w+b")
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        if len(self.head) < HEADER_BYTES:
+            self.head += bytes(data[:HEADER_BYTES - len(self.head)])
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def discard(self):
+        """Close and remove the temp file unless it was already moved into the store."""
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def spool_dir(upload_root):
+    path = os.path.join(upload_root, SPOOL_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def spool_from(stream, upload_root):
+    """A HashingSpool for stream, copying it in chunks unless it already is one."""
+    if isinstance(stream, HashingSpool):
+        return stream
+    spool = HashingSpool(spool_dir(upload_root))
+    if has_request_context():
+        # Removed with the request's own spools if it is never stored
+        request.__dict__.setdefault("_spools", []).append(spool)
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        spool.write(chunk)
+    return spool
+
+
+def blob_name(digest, ext):
+    """Path of a blob relative to the upload folder (also its URL path)."""
+    return f"blobs/{digest[:2]}/{digest}.{ext}"
+
+
+def store(spool, upload_root, ext):
+    """
+    Move spool into the blob store and return (path, relative name). If the
+    blob already exists the spool is simply dropped.
+    """
+    name = blob_name(spool.hash.hexdigest(), ext)
+    path = os.path.join(upload_root, name)
+    if os.path.exists(path):
+        spool.discard()
+        return path, name
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    spool.file.flush()
+    spool.file.close()
+    os.replace(spool.path, path)
+    return path, name
+
+
+class UploadRequest(Request):
+    """Request class whose file uploads are HashingSpools inside UPLOAD_FOLDER."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        spool = HashingSpool(spool_dir(current_app.config["UPLOAD_FOLDER"]))
+        self.__dict__.setdefault("_spools", []).append(spool)
+        return spool
+
+    def close(self):
+        super().close()
+        for spool in self.__dict__.pop("_spools", ()):
+            spool.discard()
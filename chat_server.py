@@ -1,31 +1,238 @@
-from openai import OpenAI
+import json
 import os
-from flask import Flask, request, jsonify
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_cors import CORS
 
-# Load API key from environment
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("Please set the OPENAI_API_KEY environment variable")
+import metrics
+
+bp = Blueprint("chat", __name__)
+
+# Stable shared prefix: always the first message, byte-for-byte identical
+# across sessions, so upstream prompt caching can reuse it.
+SYSTEM_PROMPT = (
+    "You are a copywriting assistant for short, authentic user-generated-content "
+    "(UGC) video ads. Help the user brainstorm hooks, tighten dialogue and adjust "
+    "tone. Keep answers concise and practical."
+)
+
+SESSIONS = OrderedDict()  # session_id -> Conversation, least recently used first
+SESSIONS_LOCK = Lock()
+
+CHAT_PROMPT_TOKENS = metrics.add_counter(
+    "ugc_chat_prompt_tokens_total", "Prompt tokens sent to the chat model.", ("model",))
+CHAT_CACHED_TOKENS = metrics.add_counter(
+    "ugc_chat_cached_tokens_total", "Prompt tokens served from the upstream prompt cache.", ("model",))
+
+
+def create_app(config=None, openai_client=None):
+    """Application factory; the OpenAI client is only built on the first /chat call."""
+    app = Flask(__name__)
+    # Upstream connection pool shared by all requests in this worker
+    app.config["OPENAI_MAX_CONNECTIONS"] = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    app.config["OPENAI_MAX_KEEPALIVE"] = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+    app.config["OPENAI_TIMEOUT"] = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    # Conversation sessions (in-process; use sticky routing with several workers)
+    app.config["CHAT_SYSTEM_PROMPT"] = SYSTEM_PROMPT
+    app.config["CHAT_TOKEN_BUDGET"] = int(os.getenv("CHAT_TOKEN_BUDGET", "6000"))
+    app.config["CHAT_MAX_MESSAGES"] = int(os.getenv("CHAT_MAX_MESSAGES", "40"))
+    app.config["CHAT_SUMMARY_TOKENS"] = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+    app.config["CHAT_MAX_SESSIONS"] = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+    app.config["CHAT_SESSION_TTL"] = int(os.getenv("CHAT_SESSION_TTL", "3600"))
+    if config:
+        app.config.update(config)
+    CORS(app)
+    metrics.init_app(app)
+    app.register_blueprint(bp)
+    if openai_client is not None:
+        app.extensions["openai_client"] = openai_client
+    return app
+
+
+_CLIENT_LOCK = Lock()
+
+def get_client():
+    """Return the app's OpenAI client, constructing it on first use."""
+    client = current_app.extensions.get("openai_client")
+    if client is None:
+        with _CLIENT_LOCK:
+            client = current_app.extensions.get("openai_client")
+            if client is None:
+                # Load API key from environment
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise ValueError("Please set the OPENAI_API_KEY environment variable")
+                import httpx
+                from openai import DefaultHttpxClient, OpenAI   # heavy import, deferred until the first request
+                http_client = DefaultHttpxClient(limits=httpx.Limits(
+                    max_connections=current_app.config["OPENAI_MAX_CONNECTIONS"],
+                    max_keepalive_connections=current_app.config["OPENAI_MAX_KEEPALIVE"],
+                ))
+                client = current_app.extensions["openai_client"] = OpenAI(
+                    api_key=api_key, http_client=http_client, timeout=current_app.config["OPENAI_TIMEOUT"])
+    return client
+
+
+def estimate_tokens(messages):
+    """Rough token count (~4 chars per token plus per-message overhead)."""
+    return sum(len(m["content"]) // 4 + 4 for m in messages)
+
+
+class Conversation:
+    """Bounded server-side history for one chat session."""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.summary = ""          # compressed form of the turns dropped so far
+        self.history = []          # [{"role": ..., "content": ...}], oldest first
+        self.lock = Lock()
+        self.revision = 0          # bumped whenever history changes, see record()
+        self.last_used = time.time()
+        self.turns = 0
+        self.truncations = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def messages_for(self, message, system_prompt):
+        """System prefix, then summary, then history: most stable first for cache hits."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": "Summary of the earlier conversation:\n" + self.summary})
+        return messages + self.history + [{"role": "user", "content": message}]
+
+    def trim(self, message, config):
+        """
+        Once the next prompt would exceed the token budget (or message cap),
+        fold the oldest turns into the summary until it is back to 60% of the
+        budget. Trimming well below the limit keeps the prefix unchanged, and
+        therefore cacheable, for the next several turns.
+        """
+        budget, max_messages = config["CHAT_TOKEN_BUDGET"], config["CHAT_MAX_MESSAGES"]
+        system_prompt = config["CHAT_SYSTEM_PROMPT"]
+        if (estimate_tokens(self.messages_for(message, system_prompt)) <= budget
+                and len(self.history) <= max_messages):
+            return
+
+        dropped = []
+        while self.history and (
+                estimate_tokens(self.messages_for(message, system_prompt)) > budget * 0.6
+                or len(self.history) > max_messages // 2):
+            dropped.extend(self.history[:2])   # one user/assistant turn
+            del self.history[:2]
+        if dropped:
+            self.truncations += 1
+            self.revision += 1
+            self.summary = _summarize(self.summary, dropped, config["CHAT_SUMMARY_TOKENS"])
+
+    def record(self, message, reply, usage, revision):
+        """
+        Append a user/assistant turn whose prompt was built at revision; False,
+        keeping only the usage, if there is no reply or another turn changed
+        the history since. trim() relies on history being whole pairs.
+        """
+        prompt, cached = _usage_tokens(usage)
+        self.prompt_tokens += prompt
+        self.cached_tokens += cached
+        if not reply or revision != self.revision:
+            return False
+        self.history.append({"role": "user", "content": message})
+        self.history.append({"role": "assistant", "content": reply})
+        self.turns += 1
+        self.revision += 1
+        return True
+
+    def stats(self):
+        return {
+            "session_id": self.id,
+            "turns": self.turns,
+            "messages": len(self.history),
+            "truncations": self.truncations,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+        }
+
+
+def _summarize(summary, dropped, max_tokens):
+    """
+    Cheap extractive summary with no extra upstream call: the first sentence of
+    each dropped message, newest kept when over max_tokens.
+    """
+    lines = summary.splitlines() if summary else []
+    for m in dropped:
+        first = m["content"].strip().split("\n", 1)[0]
+        first = first.split(". ", 1)[0][:200]
+        lines.append(f"- {m['role']}: {first}")
+    while lines and len("\n".join(lines)) > max_tokens * 4:
+        lines.pop(0)
+    return "\n".join(lines)
+
 
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
+def _usage_tokens(usage):
+    """(prompt_tokens, cached_tokens) from a chat usage object, tolerating gaps."""
+    if usage is None:
+        return 0, 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(usage, "prompt_tokens", 0) or 0,
+            (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0)
 
-app = Flask(__name__)
-CORS(app)
 
+def _record_usage(model, usage):
+    prompt, cached = _usage_tokens(usage)
+    CHAT_PROMPT_TOKENS.inc(model, amount=prompt)
+    CHAT_CACHED_TOKENS.inc(model, amount=cached)
+    return {"prompt_tokens": prompt, "cached_tokens": cached,
+            "cached_ratio": cached / prompt if prompt else 0.0}
 
-@app.route("/health", methods=["GET"])
+
+def get_session(session_id=None):
+    """
+    Look up (or with no id, create) a conversation, evicting expired and
+    least recently used sessions. Returns None for an unknown id.
+    """
+    config = current_app.config
+    now = time.time()
+    with SESSIONS_LOCK:
+        while SESSIONS:
+            oldest = next(iter(SESSIONS.values()))
+            if now - oldest.last_used <= config["CHAT_SESSION_TTL"] and len(SESSIONS) < config["CHAT_MAX_SESSIONS"]:
+                break
+            SESSIONS.popitem(last=False)
+
+        if session_id is None:
+            conv = Conversation(str(uuid.uuid4()))
+            SESSIONS[conv.id] = conv
+        else:
+            conv = SESSIONS.get(session_id)
+            if conv is None:
+                return None
+            SESSIONS.move_to_end(session_id)
+        conv.last_used = now
+        return conv
+
+
+@bp.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok"})
 
 
-@app.route("/chat", methods=["POST"])
+@bp.route("/chat", methods=["POST"])
 def chat():
     """Simple text endpoint that forwards the user's message to the Chat API.
 
-    Request JSON: { "message": "...", "model": "optional-model" }
-    Response JSON: { "id": "...", "text": "assistant reply" }
+    Request JSON: { "message": "...", "model": "optional-model", "stream": false,
+                    "session_id": "optional, from a previous reply" }
+    Response JSON: { "id": "...", "text": "assistant reply", "session_id": "...",
+                     "usage": { "prompt_tokens", "cached_tokens", "cached_ratio" } }
+
+    The server keeps the conversation history, so clients send only the new
+    message. With "stream": true (or Accept: text/event-stream) the reply is
+    sent as server-sent events as tokens arrive: `data: {"text": "..."}` per
+    delta, then `event: done` carrying the id, session_id and usage.
     """
     data = request.get_json(force=True, silent=True)
     if not data:
@@ -37,13 +244,29 @@ def chat():
     if not message:
         return jsonify({"error": "`message` field is required"}), 400
 
+    conv = get_session(data.get("session_id"))
+    if conv is None:
+        return jsonify({"error": "Unknown or expired session_id"}), 404
+
+    with conv.lock:
+        conv.trim(message, current_app.config)
+        messages = conv.messages_for(message, current_app.config["CHAT_SYSTEM_PROMPT"])
+        revision = conv.revision
+
+    if data.get("stream") or request.accept_mimetypes.best == "text/event-stream":
+        try:
+            return _stream_chat(model, messages, conv, message, revision)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
     try:
         # Create a chat completion using the SDK
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": message}],
-            max_tokens=500,
-        )
+        with metrics.upstream(model, "chat.completions.create"):
+            resp = get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=500,
+            )
 
         # Extract text from common response shapes
         text = None
@@ -59,13 +282,100 @@ def chat():
             # Fallback to stringifying the response
             text = str(resp)
 
-        return jsonify({"id": getattr(resp, "id", None), "text": text})
+        usage = getattr(resp, "usage", None)
+        with conv.lock:
+            if not conv.record(message, text, usage, revision):
+                current_app.logger.warning("Chat session %s changed during a turn; the turn is not kept", conv.id)
+
+        return jsonify({
+            "id": getattr(resp, "id", None),
+            "text": text,
+            "session_id": conv.id,
+            "usage": _record_usage(model, usage),
+        })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _sse(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+
+@bp.route("/chat/sessions/<session_id>", methods=["GET"])
+def session_stats(session_id):
+    conv = get_session(session_id)
+    if conv is None:
+        return jsonify({"error": "Unknown or expired session_id"}), 404
+    return jsonify(conv.stats())
+
+
+@bp.route("/chat/sessions/<session_id>", methods=["DELETE"])
+def end_session(session_id):
+    with SESSIONS_LOCK:
+        conv = SESSIONS.pop(session_id, None)
+    if conv is None:
+        return jsonify({"error": "Unknown or expired session_id"}), 404
+    return jsonify(conv.stats())
+
+
+def _stream_chat(model, messages, conv, message, revision):
+    """
+    Proxy a streaming completion as server-sent events.
+
+    The upstream request is opened before the response starts so that auth
+    and validation errors still come back as a JSON 500. If the client goes
+    away, the WSGI server closes our generator and the finally block closes
+    the upstream stream, which stops the generation on OpenAI's side.
+    """
+    start = time.perf_counter()
+    stream = get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=500,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    def generate():
+        first_token = True
+        response_id = None
+        usage = None
+        parts = []
+        failed = False
+        try:
+            for chunk in stream:
+                response_id = response_id or getattr(chunk, "id", None)
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = getattr(chunk.choices[0].delta, "content", None)
+                if not delta:
+                    continue
+                if first_token and metrics.ENABLED:
+                    metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "chat_first_token")
+                first_token = False
+                parts.append(delta)
+                yield _sse({"text": delta})
+            yield _sse({"id": response_id, "session_id": conv.id,
+                        "usage": _record_usage(model, usage)}, event="done")
+        except Exception as e:
+            failed = True
+            yield _sse({"error": str(e)}, event="error")
+        finally:
+            stream.close()
+            # A reply cut short by the client going away is kept; one cut short by an error is not
+            with conv.lock:
+                conv.record(message, "" if failed else "".join(parts), usage, revision)
+            if metrics.ENABLED:
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "chat_stream")
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "5000"))
     # Debug True is convenient for local testing; remove or set via env in production
-    app.run(host="0.0.0.0", port=port, debug=True)
+    create_app().run(host="0.0.0.0", port=port, debug=True)
@@ -1,5 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from flask_login import LoginManager
 
 db = SQLAlchemy()   # unbound
-migrate = Migrate() # unbound
\ No newline at end of file
+migrate = Migrate() # unbound
+limiter = Limiter(get_remote_address, default_limits=["60/minute"])   # unbound
+login_manager = LoginManager()   # unbound
@@ -0,0 +1,820 @@
+"""
+Local stand-in for the parts of the OpenAI API this app uses.
+
+Two ways to use it:
+
+  * In-process: build a FakeOpenAI and hand it to an app factory
+    (e.g. `sora.create_app(openai_client=FakeOpenAI(job_seconds=0.2))`).
+  * Over HTTP: `python fake_openai.py --port 8100` and start the app with
+    OPENAI_BASE_URL=http://localhost:8100/v1 so the real SDK talks to it.
+    Add --webhook-url http://localhost:5000/api/webhooks/openai and
+    --webhook-secret whsec_... to also get signed job-completion events.
+
+Latency, job duration, failure rates and payload sizes are all configurable
+so benchmarks can be run offline with repeatable numbers.
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+
+DEFAULT_PERSONA_TEXT = (
+    "I. Core Identity\n"
+    "Name: Maya Torres. Age: 29. Occupation: Pediatric nurse.\n"
+    "II. Look\nEffortless ponytail, comfort-first athleisure.\n"
+    "III. Vibe\nWarm, pragmatic, talks like a friend giving honest advice.\n"
+)
+
+DEFAULT_SCRIPT_TEXT = (
+    "SCRIPT: Quick honest morning take\n"
+    "The energy: calm, friend-to-friend recommendation\n"
+    "0:00-0:02: \"Okay, wait...\"\n"
+    "0:02-0:09: \"This is literally the only thing I grab in the morning, like, it just works.\"\n"
+    "0:09-0:12: \"Yeah. Just that.\"\n"
+)
+
+# Structured outputs, keyed by the `text.format` schema name
+DEFAULT_STRUCTURED = {
+    "persona": {
+        "core_identity": {"name": "Maya Torres", "age": 29, "gender": "Female", "ethnicity": "Latina",
+                          "location": "A walkable suburb of Austin", "occupation": "Pediatric nurse"},
+        "appearance": {"general": "Friendly, open face", "hair": "Effortless ponytail",
+                       "clothing": "Comfort-first athleisure", "signature_details": "Simple gold necklace"},
+        "personality": {"traits": ["warm", "pragmatic", "witty"], "demeanor": "Calm and grounded",
+                        "communication_style": "Talks like a friend giving honest advice"},
+        "lifestyle": {"hobbies": "Weekend hikes", "values": "Buying fewer, better things",
+                      "pain_points": "Rushed mornings between shifts", "home_environment": "Bright, tidy apartment"},
+        "credibility": "Long shifts make her recommendations for everyday essentials feel earned.",
+    },
+    "ad_script": {
+        "title": "Quick honest morning take",
+        "energy": "calm, friend-to-friend recommendation",
+        "dialogue": [
+            {"start": "0:00", "end": "0:02", "line": "Okay, wait..."},
+            {"start": "0:02", "end": "0:09", "line": "This is literally the only thing I grab in the morning, like, it just works."},
+            {"start": "0:09", "end": "0:12", "line": "Yeah. Just that."},
+        ],
+        "shots": [{"second": "0-12", "camera": "Handheld selfie, slight wobble", "action": "Holds product up, talks"}],
+        "technical": {"orientation": "Vertical", "filming_method": "Selfie mode", "dominant_hand": "Right",
+                      "location": "Kitchen", "lighting": "Window light", "audio": "Quiet room"},
+    },
+}
+DEFAULT_STRUCTURED["long_ad_script"] = {
+    "title": "Three honest mornings",
+    "energy": DEFAULT_STRUCTURED["ad_script"]["energy"],
+    "scenes": [{"dialogue": DEFAULT_STRUCTURED["ad_script"]["dialogue"], "shots": DEFAULT_STRUCTURED["ad_script"]["shots"]}
+               for _ in range(3)],
+    "technical": DEFAULT_STRUCTURED["ad_script"]["technical"],
+}
+DEFAULT_STRUCTURED["persona_product"] = {
+    "persona": DEFAULT_STRUCTURED["persona"],
+    "product": {"category": "Insulated water bottle", "colors": ["matte black", "brushed steel"],
+                "materials": "Stainless steel, silicone grip", "shape_and_size": "Tall cylinder, about 25 cm",
+                "packaging": "None, shown on its own", "label_text": "Small laser-etched logo near the base",
+                "distinctive_details": "Flip-up straw lid with a carry loop"},
+}
+DEFAULT_STRUCTURED["persona_script"] = {
+    "persona": DEFAULT_STRUCTURED["persona"], "script": DEFAULT_STRUCTURED["ad_script"]}
+DEFAULT_STRUCTURED["persona_product_script"] = {
+    "persona": DEFAULT_STRUCTURED["persona"], "product": DEFAULT_STRUCTURED["persona_product"]["product"],
+    "script": DEFAULT_STRUCTURED["ad_script"]}
+
+
+JOB_PREFIXES = {"response": "resp", "video": "video", "batch": "batch"}
+
+
+class FakeAPIError(Exception):
+    """Raised by the fake when a request-level error is injected."""
+    status_code = 500
+
+
+class FakeNotFoundError(FakeAPIError):
+    """Raised for unknown or expired ids, like the API's 404s."""
+    status_code = 404
+
+
+class _Content:
+    """Mimics the binary response wrapper returned by download_content."""
+
+    def __init__(self, data):
+        self.content = data
+
+    def read(self):
+        return self.content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+
+class _ChatStream:
+    """Iterator of chat.completion.chunk objects; close() ends it early."""
+
+    def __init__(self, fake, d, chunks, delay, include_usage=False):
+        self._fake = fake
+        self._d = d
+        self._chunks = chunks
+        self._delay = delay
+        self.include_usage = include_usage
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self._chunks:
+            if self.closed:
+                return
+            time.sleep(self._delay)
+            yield SimpleNamespace(id=self._d["id"], model=self._d["model"], usage=None, choices=[
+                SimpleNamespace(index=0, finish_reason=None, delta=SimpleNamespace(content=piece))])
+        yield SimpleNamespace(id=self._d["id"], model=self._d["model"], usage=None, choices=[
+            SimpleNamespace(index=0, finish_reason="stop", delta=SimpleNamespace(content=None))])
+        if self.include_usage:
+            usage = dict(self._d["usage"])
+            details = SimpleNamespace(**usage.pop("prompt_tokens_details"))
+            yield SimpleNamespace(id=self._d["id"], model=self._d["model"], choices=[],
+                                  usage=SimpleNamespace(**usage, prompt_tokens_details=details))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            with self._fake._lock:
+                self._fake.calls["chat.completions.stream_closed"] += 1
+
+
+class FakeOpenAI:
+    """
+    In-memory OpenAI client covering responses.create/retrieve/cancel,
+    videos.create/retrieve/delete/download_content, files.create/retrieve/delete/
+    content, batches.create/retrieve/cancel and chat.completions.create.
+
+    latency       - seconds added to every call (simulated network RTT)
+    jitter        - extra uniform random latency in [0, jitter)
+    job_seconds   - how long a background response takes to complete
+    video_seconds - how long a video render takes to complete
+    failure_rate  - probability that a submitted job ends up "failed"
+    error_rate    - probability that any call raises FakeAPIError
+    output_chars  - size of the generated text outputs
+    video_bytes   - size of the downloaded MP4 payload
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, job_seconds=0.5, video_seconds=1.0,
+                 failure_rate=0.0, error_rate=0.0, output_chars=None,
+                 video_bytes=256 * 1024, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.job_seconds = job_seconds
+        self.video_seconds = video_seconds
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.output_chars = output_chars
+        self.video_bytes = video_bytes
+
+        self.calls = Counter()          # "responses.create" -> count
+        self.jobs = {}                  # job id -> job dict
+        self.stored_files = {}          # file id -> file dict (content under "data")
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._prompt_prefixes = set()   # hashes of chat message prefixes already sent
+        self._emitted = set()           # job ids whose webhook event was already produced
+
+        self.responses = SimpleNamespace(create=self._responses_create,
+                                         retrieve=self._responses_retrieve,
+                                         cancel=self._responses_cancel)
+        self.videos = SimpleNamespace(create=self._videos_create,
+                                      retrieve=self._videos_retrieve,
+                                      delete=self._videos_delete,
+                                      download_content=self._videos_download_content)
+        self.files = SimpleNamespace(create=self._files_create,
+                                     retrieve=self._files_retrieve,
+                                     delete=self._files_delete,
+                                     content=self._files_content)
+        self.batches = SimpleNamespace(create=self._batches_create,
+                                       retrieve=self._batches_retrieve,
+                                       cancel=self._batches_cancel)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+
+    # Helpers
+    # --------------------------------------------------------------------------
+
+    def _call(self, name):
+        """Record the call, then apply simulated latency and error injection."""
+        with self._lock:
+            self.calls[name] += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeAPIError(f"Injected error in {name}")
+
+    def _new_job(self, kind, duration, **extra):
+        with self._lock:
+            job = {
+                "id": f"{JOB_PREFIXES[kind]}_{uuid.uuid4().hex}",
+                "kind": kind,
+                "created_at": time.time(),
+                "duration": duration,
+                "fail": bool(self.failure_rate) and self._random.random() < self.failure_rate,
+                **extra,
+            }
+            self.jobs[job["id"]] = job
+        return job
+
+    def _get_job(self, job_id, kind):
+        job = self.jobs.get(job_id)
+        if job is None or job["kind"] != kind:
+            raise FakeNotFoundError(f"No such {kind}: {job_id}")
+        return job
+
+    def _get_file(self, file_id):
+        f = self.stored_files.get(file_id)
+        if f is None or (f["expires_at"] and f["expires_at"] <= time.time()):
+            raise FakeNotFoundError(f"No such file: {file_id}")
+        return f
+
+    @staticmethod
+    def job_status(job):
+        elapsed = time.time() - job["created_at"]
+        if elapsed < job["duration"] * 0.1:
+            return "queued"
+        if elapsed < job["duration"]:
+            return "in_progress"
+        return "failed" if job["fail"] else "completed"
+
+    def due_events(self):
+        """Webhook events for jobs that reached a terminal state since the last call."""
+        now = time.time()
+        events = []
+        with self._lock:
+            for job in list(self.jobs.values()):
+                if job["id"] in self._emitted:
+                    continue
+                status = self.job_status(job)
+                if job.get("cancelled") and status != "completed":
+                    status = "cancelled"
+                if status not in ("completed", "failed", "cancelled"):
+                    continue
+                self._emitted.add(job["id"])
+                events.append({
+                    "id": f"evt_{uuid.uuid4().hex}",
+                    "object": "event",
+                    "created_at": int(now),
+                    "type": f"{job['kind']}.{status}",
+                    "data": {"id": job["id"]},
+                })
+        return events
+
+    @staticmethod
+    def sign_event(event, secret):
+        """Serialize event and build Standard Webhooks headers for it, like OpenAI does."""
+        body = json.dumps(event).encode()
+        msg_id = event["id"]
+        timestamp = str(int(time.time()))
+        key = base64.b64decode(secret[len("whsec_"):]) if secret.startswith("whsec_") else secret.encode()
+        digest = hmac.new(key, f"{msg_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+        headers = {
+            "webhook-id": msg_id,
+            "webhook-timestamp": timestamp,
+            "webhook-signature": "v1," + base64.b64encode(digest).decode(),
+            "Content-Type": "application/json",
+        }
+        return body, headers
+
+    def _text_for(self, prompt):
+        # Route the canned output by prompt so personas and scripts look different
+        text = DEFAULT_SCRIPT_TEXT if "UGC video script" in (prompt or "") else DEFAULT_PERSONA_TEXT
+        if self.output_chars:
+            text = (text * (self.output_chars // len(text) + 1))[:self.output_chars]
+        return text
+
+    # Serialisation (shared by the in-process objects and the HTTP server)
+    # --------------------------------------------------------------------------
+
+    def running(self, kind):
+        """Jobs of kind still queued or in progress, i.e. holding upstream capacity."""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return sum(1 for job in jobs if job["kind"] == kind and not job.get("cancelled")
+                   and self.job_status(job) in ("queued", "in_progress"))
+
+    def response_dict(self, job):
+        status = self.job_status(job)
+        if job.get("cancelled") and status != "completed":
+            status = "cancelled"
+        output = []
+        if status == "completed":
+            output = [{
+                "type": "message",
+                "id": f"msg_{job['id']}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": job["text"], "annotations": []}],
+            }]
+        return {
+            "id": job["id"],
+            "object": "response",
+            "created_at": int(job["created_at"]),
+            "model": job["model"],
+            "status": status,
+            "background": True,
+            "output": output,
+            "error": {"code": "server_error", "message": "Injected failure"} if status == "failed" else None,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+        }
+
+    def video_dict(self, job):
+        status = self.job_status(job)
+        elapsed = time.time() - job["created_at"]
+        return {
+            "id": job["id"],
+            "object": "video",
+            "created_at": int(job["created_at"]),
+            "model": job["model"],
+            "status": status,
+            "progress": min(100, int(100 * elapsed / job["duration"])) if job["duration"] else 100,
+            "seconds": job["seconds"],
+            "size": job["size"],
+            "error": {"code": "server_error", "message": "Injected failure"} if status == "failed" else None,
+        }
+
+    @staticmethod
+    def _as_object(d, **extra):
+        return SimpleNamespace(**d, **extra)
+
+    # responses
+    # --------------------------------------------------------------------------
+
+    def _responses_create(self, model=None, input=None, text=None, **kwargs):
+        self._call("responses.create")
+        output = self._output_for(input, text)
+        job = self._new_job("response", self.job_seconds, model=model, text=output)
+        return self._as_object(self.response_dict(job), output_text="")
+
+    def _output_for(self, input, text):
+        """Canned output for a responses.create body; checks any input_image file ids."""
+        prompt = ""
+        for message in input or []:
+            for part in message.get("content", []):
+                if part.get("type") == "input_text":
+                    prompt += part.get("text", "")
+                elif part.get("type") == "input_image":
+                    if part.get("file_id"):
+                        self._get_file(part["file_id"])
+                    with self._lock:
+                        # What the request body spends on the image: a short id or the whole data URL
+                        self.calls["responses.image_bytes"] += len(part.get("file_id") or part.get("image_url") or "")
+        fmt = (text or {}).get("format") or {}
+        if fmt.get("type") == "json_schema" and fmt.get("name") in DEFAULT_STRUCTURED:
+            output = json.dumps(DEFAULT_STRUCTURED[fmt["name"]])
+        else:
+            output = self._text_for(prompt)
+        return output
+
+    def _responses_retrieve(self, response_id, **kwargs):
+        self._call("responses.retrieve")
+        d = self.response_dict(self._get_job(response_id, "response"))
+        text = d["output"][0]["content"][0]["text"] if d["output"] else ""
+        return self._as_object(d, output_text=text)
+
+    def _responses_cancel(self, response_id, **kwargs):
+        self._call("responses.cancel")
+        job = self._get_job(response_id, "response")
+        job["cancelled"] = True
+        return self._as_object(self.response_dict(job), output_text="")
+
+    # videos
+    # --------------------------------------------------------------------------
+
+    def _videos_create(self, model=None, prompt=None, input_reference=None,
+                       seconds="4", size="720x1280", **kwargs):
+        self._call("videos.create")
+        if input_reference is not None and hasattr(input_reference, "read"):
+            input_reference.read()  # the real SDK uploads the whole file
+        job = self._new_job("video", self.video_seconds, model=model, prompt=prompt,
+                            seconds=seconds, size=size)
+        return self._as_object(self.video_dict(job))
+
+    def _videos_retrieve(self, video_id, **kwargs):
+        self._call("videos.retrieve")
+        return self._as_object(self.video_dict(self._get_job(video_id, "video")))
+
+    def _videos_delete(self, video_id, **kwargs):
+        self._call("videos.delete")
+        self._get_job(video_id, "video")
+        with self._lock:
+            self.jobs.pop(video_id, None)
+        return SimpleNamespace(id=video_id, object="video.deleted", deleted=True)
+
+    def video_payload(self, video_id):
+        # Minimal ftyp box followed by padding up to the configured size
+        header = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom"
+        return header + b"\x00" * max(0, self.video_bytes - len(header))
+
+    def _videos_download_content(self, video_id, **kwargs):
+        self._call("videos.download_content")
+        job = self._get_job(video_id, "video")
+        if self.job_status(job) != "completed":
+            raise FakeAPIError(f"Video {video_id} is not ready")
+        return _Content(self.video_payload(video_id))
+
+    # files
+    # --------------------------------------------------------------------------
+
+    @staticmethod
+    def _read_upload(file):
+        """Content and name of anything the SDK accepts as `file`."""
+        if isinstance(file, tuple):
+            name, content = file[0], file[1]
+        else:
+            name, content = getattr(file, "name", None) or "upload", file
+        if hasattr(content, "read"):
+            content = content.read()
+        return content, str(name).rsplit("/", 1)[-1]
+
+    def file_dict(self, f):
+        return {k: v for k, v in f.items() if k != "data"}
+
+    def _files_create(self, file=None, purpose=None, expires_after=None, **kwargs):
+        self._call("files.create")
+        data, name = self._read_upload(file)
+        f = self._store_file(data, name, purpose)
+        seconds = (expires_after or {}).get("seconds")
+        if seconds:
+            f["expires_at"] = f["created_at"] + int(seconds)
+        return self._as_object(self.file_dict(f))
+
+    def _files_retrieve(self, file_id, **kwargs):
+        self._call("files.retrieve")
+        return self._as_object(self.file_dict(self._get_file(file_id)))
+
+    def _files_delete(self, file_id, **kwargs):
+        self._call("files.delete")
+        with self._lock:
+            if self.stored_files.pop(file_id, None) is None:
+                raise FakeNotFoundError(f"No such file: {file_id}")
+        return SimpleNamespace(id=file_id, object="file", deleted=True)
+
+    def _files_content(self, file_id, **kwargs):
+        self._call("files.content")
+        return _Content(self._get_file(file_id)["data"])
+
+    def _store_file(self, data, name, purpose):
+        f = {"id": f"file-{uuid.uuid4().hex}", "object": "file", "bytes": len(data),
+             "created_at": int(time.time()), "expires_at": None, "filename": name,
+             "purpose": purpose, "status": "processed", "data": data}
+        with self._lock:
+            self.stored_files[f["id"]] = f
+        return f
+
+    # batches
+    # --------------------------------------------------------------------------
+
+    def _batches_create(self, input_file_id=None, endpoint=None, completion_window="24h",
+                        metadata=None, **kwargs):
+        self._call("batches.create")
+        data = self._get_file(input_file_id)["data"]
+        lines = [json.loads(raw) for raw in data.decode("utf-8").splitlines() if raw.strip()]
+        with self._lock:
+            self.calls["batches.requests"] += len(lines)
+        # A batch takes as long as one of its jobs; real ones take minutes to hours
+        job = self._new_job("batch", self.job_seconds, lines=lines, endpoint=endpoint,
+                            input_file_id=input_file_id, completion_window=completion_window,
+                            metadata=metadata or {}, cancelled=False)
+        return self._as_object(self.batch_dict(job))
+
+    def _batches_retrieve(self, batch_id, **kwargs):
+        self._call("batches.retrieve")
+        return self._as_object(self.batch_dict(self._get_job(batch_id, "batch")))
+
+    def _batches_cancel(self, batch_id, **kwargs):
+        self._call("batches.cancel")
+        job = self._get_job(batch_id, "batch")
+        job["cancelled"] = True
+        return self._as_object(self.batch_dict(job))
+
+    def _batch_outputs(self, job):
+        """Write the output and error files of a finished batch, once."""
+        with self._lock:
+            if "output_file_id" in job:
+                return
+            job["output_file_id"] = job["error_file_id"] = None
+        ok, errors = [], []
+        for line in job["lines"]:
+            body = line.get("body") or {}
+            result = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": line.get("custom_id")}
+            try:
+                output = self._output_for(body.get("input"), body.get("text"))
+            except FakeAPIError as e:
+                errors.append({**result, "response": {"status_code": e.status_code, "body": {
+                    "error": {"message": str(e), "type": "invalid_request_error"}}}, "error": None})
+                continue
+            response = {"id": f"resp_{uuid.uuid4().hex}", "created_at": time.time(), "duration": 0,
+                        "fail": False, "model": body.get("model"), "text": output}
+            ok.append({**result, "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                                              "body": self.response_dict(response)}, "error": None})
+        for key, rows in (("output_file_id", ok), ("error_file_id", errors)):
+            if rows:
+                data = "".join(json.dumps(r) + "\n" for r in rows).encode()
+                job[key] = self._store_file(data, f"{job['id']}_{key[:-8]}.jsonl", "batch_output")["id"]
+        job["counts"] = (len(ok), len(errors))
+
+    def batch_dict(self, job):
+        status = {"queued": "validating"}.get(self.job_status(job), self.job_status(job))
+        if job["cancelled"] and status != "completed":
+            status = "cancelled"
+        if status == "completed":
+            self._batch_outputs(job)
+        done, failed = job.get("counts", (0, 0))
+        return {
+            "id": job["id"],
+            "object": "batch",
+            "endpoint": job["endpoint"],
+            "input_file_id": job["input_file_id"],
+            "completion_window": job["completion_window"],
+            "status": status,
+            "output_file_id": job.get("output_file_id"),
+            "error_file_id": job.get("error_file_id"),
+            "created_at": int(job["created_at"]),
+            "request_counts": {"total": len(job["lines"]), "completed": done, "failed": failed},
+            "errors": {"data": [{"code": "server_error", "message": "Injected failure"}]} if status == "failed" else None,
+            "metadata": job["metadata"],
+        }
+
+    # chat.completions
+    # --------------------------------------------------------------------------
+
+    def _cached_prompt_tokens(self, messages):
+        """
+        Approximate upstream prompt caching: the longest message prefix seen
+        before is cached, counted in 128-token blocks once it reaches 1024.
+        """
+        digest = hashlib.sha256()
+        cached_chars = chars = 0
+        with self._lock:
+            for m in messages or []:
+                content = str(m.get("content", ""))
+                digest.update(f"{m.get('role')}\x00{content}\x00".encode())
+                chars += len(content)
+                key = digest.hexdigest()
+                if key in self._prompt_prefixes:
+                    cached_chars = chars
+                else:
+                    self._prompt_prefixes.add(key)
+        tokens = cached_chars // 4
+        return 0 if tokens < 1024 else tokens - tokens % 128
+
+    def chat_dict(self, model, messages):
+        text = self._text_for("")
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages or [])
+        return {
+            "id": f"chatcmpl_{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": text},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": (prompt_chars + len(text)) // 4,
+                "prompt_tokens_details": {"cached_tokens": self._cached_prompt_tokens(messages)},
+            },
+        }
+
+    def chat_chunks(self, text, size=16):
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _chat_create(self, model=None, messages=None, stream=False, **kwargs):
+        self._call("chat.completions.create")
+        d = self.chat_dict(model, messages)
+        if stream:
+            # Spread the generation time over the chunks so the first one arrives early
+            chunks = self.chat_chunks(d["choices"][0]["message"]["content"])
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return _ChatStream(self, d, chunks, self.job_seconds / max(1, len(chunks)), include_usage)
+        time.sleep(self.job_seconds)
+        choices = [SimpleNamespace(index=c["index"], finish_reason=c["finish_reason"],
+                                   message=SimpleNamespace(**c["message"])) for c in d["choices"]]
+        usage = dict(d["usage"])
+        details = SimpleNamespace(**usage.pop("prompt_tokens_details"))
+        return SimpleNamespace(id=d["id"], model=d["model"], choices=choices,
+                               usage=SimpleNamespace(**usage, prompt_tokens_details=details))
+
+
+# HTTP server
+# ------------------------------------------------------------------------------
+
+def create_server(fake):
+    """Wrap a FakeOpenAI in a Flask app that speaks the /v1 REST shapes."""
+    from flask import Flask, request, jsonify, Response
+
+    server = Flask(__name__)
+
+    def _error(e):
+        return jsonify({"error": {"message": str(e), "type": "fake_error"}}), e.status_code
+
+    @server.route("/v1/responses", methods=["POST"])
+    def responses_create():
+        body = request.get_json(force=True)
+        try:
+            obj = fake.responses.create(**body)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.response_dict(fake.jobs[obj.id]))
+
+    @server.route("/v1/responses/<response_id>", methods=["GET"])
+    def responses_retrieve(response_id):
+        try:
+            fake.responses.retrieve(response_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.response_dict(fake.jobs[response_id]))
+
+    @server.route("/v1/responses/<response_id>/cancel", methods=["POST"])
+    def responses_cancel(response_id):
+        try:
+            fake.responses.cancel(response_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.response_dict(fake.jobs[response_id]))
+
+    @server.route("/v1/videos", methods=["POST"])
+    def videos_create():
+        try:
+            obj = fake.videos.create(input_reference=request.files.get("input_reference"),
+                                     **request.form.to_dict())
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.video_dict(fake.jobs[obj.id]))
+
+    @server.route("/v1/videos/<video_id>", methods=["GET", "DELETE"])
+    def videos_retrieve(video_id):
+        try:
+            if request.method == "DELETE":
+                return jsonify(vars(fake.videos.delete(video_id)))
+            fake.videos.retrieve(video_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.video_dict(fake.jobs[video_id]))
+
+    @server.route("/v1/videos/<video_id>/content", methods=["GET"])
+    def videos_content(video_id):
+        try:
+            content = fake.videos.download_content(video_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return Response(content.read(), mimetype="video/mp4")
+
+    @server.route("/v1/files", methods=["POST"])
+    def files_create():
+        upload = request.files.get("file")
+        seconds = request.form.get("expires_after[seconds]")
+        try:
+            obj = fake.files.create(file=(upload.filename, upload.read()), purpose=request.form.get("purpose"),
+                                    expires_after={"anchor": "created_at", "seconds": seconds} if seconds else None)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.file_dict(fake.stored_files[obj.id]))
+
+    @server.route("/v1/files/<file_id>", methods=["GET", "DELETE"])
+    def files_item(file_id):
+        try:
+            if request.method == "DELETE":
+                return jsonify(vars(fake.files.delete(file_id)))
+            fake.files.retrieve(file_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.file_dict(fake.stored_files[file_id]))
+
+    @server.route("/v1/files/<file_id>/content", methods=["GET"])
+    def files_content(file_id):
+        try:
+            content = fake.files.content(file_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return Response(content.read(), mimetype="application/octet-stream")
+
+    @server.route("/v1/batches", methods=["POST"])
+    def batches_create():
+        try:
+            obj = fake.batches.create(**request.get_json(force=True))
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.batch_dict(fake.jobs[obj.id]))
+
+    @server.route("/v1/batches/<batch_id>", methods=["GET"])
+    def batches_retrieve(batch_id):
+        try:
+            fake.batches.retrieve(batch_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.batch_dict(fake.jobs[batch_id]))
+
+    @server.route("/v1/batches/<batch_id>/cancel", methods=["POST"])
+    def batches_cancel(batch_id):
+        try:
+            fake.batches.cancel(batch_id)
+        except FakeAPIError as e:
+            return _error(e)
+        return jsonify(fake.batch_dict(fake.jobs[batch_id]))
+
+    @server.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        body = request.get_json(force=True)
+        try:
+            fake._call("chat.completions.create")
+        except FakeAPIError as e:
+            return _error(e)
+        d = fake.chat_dict(body.get("model"), body.get("messages"))
+        if not body.get("stream"):
+            time.sleep(fake.job_seconds)
+            return jsonify(d)
+
+        chunks = fake.chat_chunks(d["choices"][0]["message"]["content"])
+
+        def events():
+            for piece in chunks + [None]:
+                time.sleep(fake.job_seconds / max(1, len(chunks)))
+                chunk = {"id": d["id"], "object": "chat.completion.chunk", "created": d["created"],
+                         "model": d["model"], "choices": [{
+                             "index": 0,
+                             "delta": {"content": piece} if piece else {},
+                             "finish_reason": None if piece else "stop"}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {"id": d["id"], "object": "chat.completion.chunk", "created": d["created"],
+                         "model": d["model"], "choices": [], "usage": d["usage"]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return Response(events(), mimetype="text/event-stream")
+
+    @server.route("/_fake/stats", methods=["GET"])
+    def stats():
+        return jsonify({"calls": dict(fake.calls), "jobs": len(fake.jobs)})
+
+    return server
+
+
+def deliver_webhooks(fake, url, secret, interval=0.2, stop=None):
+    """POST signed events for finished jobs to url until stop is set; failures are retried."""
+    import urllib.request
+
+    stop = stop or threading.Event()
+    pending = []
+    while not stop.wait(interval):
+        pending.extend(fake.due_events())
+        retry = []
+        for event in pending:
+            body, headers = fake.sign_event(event, secret)
+            try:
+                urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers), timeout=30).close()
+                fake.calls["webhooks.delivered"] += 1
+            except OSError:
+                retry.append(event)
+        pending = retry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--job-seconds", type=float, default=0.5)
+    parser.add_argument("--video-seconds", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output-chars", type=int, default=None)
+    parser.add_argument("--video-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--webhook-url", default=None, help="POST signed job events here")
+    parser.add_argument("--webhook-secret", default=None, help="whsec_... signing secret")
+    args = parser.parse_args(argv)
+
+    fake = FakeOpenAI(latency=args.latency, jitter=args.jitter, job_seconds=args.job_seconds,
+                      video_seconds=args.video_seconds, failure_rate=args.failure_rate,
+                      error_rate=args.error_rate, output_chars=args.output_chars,
+                      video_bytes=args.video_bytes, seed=args.seed)
+    if args.webhook_url:
+        if not args.webhook_secret:
+            parser.error("--webhook-url needs --webhook-secret")
+        threading.Thread(target=deliver_webhooks, args=(fake, args.webhook_url, args.webhook_secret),
+                         daemon=True).start()
+    create_server(fake).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Idempotency-Key support for the POST generation endpoints.
+
+    @bp.route('/api/video', methods=['POST'])
+    @login_required
+    @idempotent
+    def video(): ...
+
+A request carrying an `Idempotency-Key` header first inserts
+(user, key) into idempotency_keys. The primary key makes that insert
+atomic: the one request that gets it runs the view and stores the
+response; retries with the same key get that stored response back
+(with `Idempotent-Replayed: true`) instead of creating another row and
+another upstream job. A retry that arrives while the first request is
+still running waits up to IDEMPOTENCY_WAIT seconds for its result, then
+gets a 409 to retry later. Reusing a key for a different request is a 422.
+
+A response of 500 or up is only kept if the request had already
+committed a write (its row, and so maybe its upstream job): replaying it
+is then safer than running the view again. Otherwise the key is given
+back so it can be retried. Keys
+expire after IDEMPOTENCY_TTL (default 24h), and a claim whose request
+died mid-flight can be taken over after IDEMPOTENCY_LOCK_SECONDS.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, g, has_request_context, jsonify, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+WAIT_STEP = 0.1         # seconds between looks at a key still in flight
+SWEEP_INTERVAL = 600    # seconds between deletes of expired keys, per process
+
+_LAST_SWEEP = [float("-inf")]
+_SWEEP_LOCK = threading.Lock()
+
+
+def fingerprint():
+    """Hash of what makes this request this request: endpoint and form fields."""
+    h = hashlib.sha256(request.path.encode())
+    for name, value in sorted(request.form.items(multi=True)):
+        h.update(b"\0" + name.encode() + b"=" + value.encode())
+    return h.hexdigest()
+
+
+def _sweep():
+    now = time.monotonic()
+    with _SWEEP_LOCK:
+        if now - _LAST_SWEEP[0] < SWEEP_INTERVAL:
+            return
+        _LAST_SWEEP[0] = now
+    IdempotencyKey.query.filter(IdempotencyKey.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _claim(key, digest):
+    """Insert the key for this request; True if this request should run the view."""
+    now = datetime.utcnow()
+    row = IdempotencyKey(user_id=current_user.id, key=key, fingerprint=digest, status="processing",
+                         created_at=now, expires_at=now + timedelta(seconds=current_app.config["IDEMPOTENCY_TTL"]))
+    try:
+        db.session.add(row)
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+
+    # Taken: an expired key, or a claim whose request died, can be reused
+    stale = now - timedelta(seconds=current_app.config["IDEMPOTENCY_LOCK_SECONDS"])
+    taken_over = IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == current_user.id, IdempotencyKey.key == key,
+        db.or_(IdempotencyKey.expires_at < now,
+               db.and_(IdempotencyKey.status == "processing", IdempotencyKey.created_at < stale)),
+    ).update({
+        "fingerprint": digest, "status": "processing", "response_status": None, "response_body": None,
+        "created_at": now, "expires_at": row.expires_at,
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(taken_over)
+
+
+def _replay(row):
+    resp = Response(row.response_body, status=row.response_status, mimetype=row.mimetype)
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _existing(key, digest):
+    """The stored response for a key another request claimed, waiting for it if in flight."""
+    deadline = time.monotonic() + current_app.config["IDEMPOTENCY_WAIT"]
+    while True:
+        row = db.session.get(IdempotencyKey, (current_user.id, key), populate_existing=True)
+        if row is None:
+            return None   # its request failed and gave the key back
+        if row.fingerprint != digest:
+            return jsonify({'success': False,
+                            'error': f'{HEADER} was already used for a different request'}), 422
+        if row.status == "completed":
+            return _replay(row)
+        if time.monotonic() >= deadline:
+            resp = jsonify({'success': False, 'error': 'A request with this idempotency key is in progress'})
+            resp.headers["Retry-After"] = "1"
+            return resp, 409
+        db.session.rollback()   # end the read so the next look sees the other request's commit
+        time.sleep(WAIT_STEP)
+
+
+# Writes of the view under way: "pending" flushed or bulk-updated rows not
+# committed yet, "committed" once any of them has been.
+
+def _writes():
+    return g.get("idempotency_writes") if has_request_context() else None
+
+
+def _on_write(*args):
+    writes = _writes()
+    if writes is not None:
+        writes["pending"] = True
+
+
+def _on_bulk(context):
+    if context.result.rowcount:
+        _on_write()
+
+
+def _on_commit(session):
+    writes = _writes()
+    if writes is not None and writes["pending"]:
+        writes["committed"] = True
+
+
+def _on_rollback(session):
+    writes = _writes()
+    if writes is not None:
+        writes["pending"] = False
+
+
+def _persisted():
+    return _writes()["committed"]
+
+
+def _store(key, resp):
+    q = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key)
+    if resp.status_code >= 500 and not _persisted():
+        q.delete(synchronize_session=False)
+    else:
+        q.update({"status": "completed", "response_status": resp.status_code,
+                  "response_body": resp.get_data(as_text=True), "mimetype": resp.mimetype},
+                 synchronize_session=False)
+    db.session.commit()
+
+
+def idempotent(view):
+    """Run view at most once per Idempotency-Key (and user); replay its response to retries."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'error': f'{HEADER} is longer than {MAX_KEY_LENGTH} characters'}), 400
+
+        _sweep()
+        digest = fingerprint()
+        for _ in range(2):   # a second try if the first holder gave the key back meanwhile
+            if _claim(key, digest):
+                break
+            existing = _existing(key, digest)
+            if existing is not None:
+                return existing
+        else:
+            return jsonify({'success': False, 'error': 'A request with this idempotency key is in progress'}), 409
+
+        g.idempotency_writes = {"pending": False, "committed": False}
+        try:
+            resp = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            error = jsonify({'success': False, 'error': 'Internal server error'})
+            error.status_code = 500
+            _store(key, error)
+            raise
+        db.session.rollback()   # anything the view left uncommitted isn't part of its response
+        _store(key, resp)
+        return resp
+    return wrapper
+
+
+def init_app(app):
+    session = db.session
+    if not event.contains(session, "after_flush", _on_write):
+        event.listen(session, "after_flush", _on_write)
+        event.listen(session, "after_bulk_update", _on_bulk)
+        event.listen(session, "after_bulk_delete", _on_bulk)
+        event.listen(session, "after_commit", _on_commit)
+        event.listen(session, "after_rollback", _on_rollback)
+    env = os.environ.get
+    app.config.setdefault("IDEMPOTENCY_TTL", int(env("IDEMPOTENCY_TTL", 24 * 3600)))
+    app.config.setdefault("IDEMPOTENCY_WAIT", float(env("IDEMPOTENCY_WAIT", 10)))
+    # Longer than any generation request takes; a claim older than this belongs to a dead request
+    app.config.setdefault("IDEMPOTENCY_LOCK_SECONDS", int(env("IDEMPOTENCY_LOCK_SECONDS", 120)))
@@ -0,0 +1,88 @@
+"""
+Image validation, transcoding and thumbnailing for bulk imports.
+
+process_image() is a plain top-level function so it can run in a
+ProcessPoolExecutor: it takes and returns only paths, strings and numbers,
+and writes its outputs straight into the content-addressed blob store.
+"""
+import hashlib
+import io
+import os
+import tempfile
+
+from blobs import blob_name
+
+
+MAX_SIDE = 4096      # larger images are downscaled when transcoded
+THUMB_SIDE = 320
+JPEG_QUALITY = 90
+
+
+def thumb_name(digest):
+    """Path of a thumbnail relative to the upload folder (also its URL path)."""
+    return f"thumbs/{digest[:2]}/{digest}.jpg"
+
+
+def _write_atomic(upload_root, name, data):
+    path = os.path.join(upload_root, name)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def _jpeg_bytes(img, max_side):
+    img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=JPEG_QUALITY)
+    return buf.getvalue()
+
+
+def process_image(src, digest, ext, upload_root, max_side=MAX_SIDE, thumb_side=THUMB_SIDE):
+    """
+    Fully decode src to validate it, store it as a blob (WEBP and oversized
+    images are transcoded to JPEG, which is what the GPT input path wants)
+    and write a JPEG thumbnail. src is moved or removed.
+
+    Returns a dict with ok/error, and on success the blob and thumbnail
+    names relative to upload_root plus sha256, size, width and height.
+    """
+    from PIL import Image as PILImage, UnidentifiedImageError
+
+    try:
+        with PILImage.open(src) as img:
+            img.load()
+            width, height = img.size
+            if img.format == "WEBP" or max(img.size) > max_side:
+                data = _jpeg_bytes(img, max_side)
+                digest, ext = hashlib.sha256(data).hexdigest(), "jpg"
+                path = _write_atomic(upload_root, blob_name(digest, ext), data)
+                os.remove(src)
+            else:
+                path = os.path.join(upload_root, blob_name(digest, ext))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(src, path)
+            _write_atomic(upload_root, thumb_name(digest), _jpeg_bytes(img, thumb_side))
+    except (UnidentifiedImageError, OSError, ValueError):
+        try:
+            os.remove(src)
+        except FileNotFoundError:
+            pass
+        return {"ok": False, "error": "Invalid or corrupt image"}
+
+    return {
+        "ok": True,
+        "name": blob_name(digest, ext),
+        "path": path,
+        "thumb_name": thumb_name(digest),
+        "sha256": digest,
+        "size": os.path.getsize(path),
+        "width": width,
+        "height": height,
+    }
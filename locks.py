@@ -0,0 +1,131 @@
+"""
+Lease-based locks on the app database, for work that must run on one node
+at a time however many hosts run the app or worker.py.
+
+    token = locks.acquire("worker:reconcile")   # None while another process holds it
+    locks.renew("worker:reconcile", token)      # False once it has been lost
+    locks.release("worker:reconcile", token)
+
+    with locks.hold(f"batch:{batch.id}") as token:
+        if token is None:
+            return   # someone else is on it
+        alive = locks.keeper(f"batch:{batch.id}", token)
+        for item in work:
+            if not alive():
+                return   # lost it; the new holder carries on
+
+Each lock is a row in `locks` (name, holder, expires_at, token). Acquiring
+is a conditional UPDATE that only succeeds on a free or expired row (or an
+INSERT for a new name), so exactly one process wins. A holder that dies
+stops renewing and the lock is taken over once it expires; no node needs
+to know about the others. Every acquisition bumps the row's fencing token.
+A holder that paused past its expiry (GC, a slow upload) still has the
+old token, so check(name, token) before an irreversible step tells it
+that it is no longer the owner. Work that can outlast the lease renews it
+as it goes with keeper(). Rows are never deleted, which keeps tokens
+increasing, so lock names should come from a bounded set; a once-only
+claim on a row is a conditional UPDATE of that row instead.
+"""
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Lock
+
+
+def holder():
+    """This process, as "host:pid"."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _expiry(ttl):
+    return datetime.utcnow() + timedelta(seconds=ttl or current_app.config["LOCK_TTL"])
+
+
+def acquire(name, ttl=None):
+    """Take lock name for ttl seconds (default LOCK_TTL); the fencing token, or None if held. Commits."""
+    db.session.commit()
+    now = datetime.utcnow()
+    taken = Lock.query.filter(
+        Lock.name == name,
+        db.or_(Lock.expires_at.is_(None), Lock.expires_at < now),
+    ).update({
+        "holder": holder(),
+        "token": Lock.token + 1,
+        "acquired_at": now,
+        "expires_at": _expiry(ttl),
+    }, synchronize_session=False)
+    db.session.commit()
+    if taken:
+        return db.session.query(Lock.token).filter(Lock.name == name).scalar()
+    if db.session.get(Lock, name) is not None:
+        return None
+    try:
+        db.session.add(Lock(name=name, holder=holder(), token=1, acquired_at=now, expires_at=_expiry(ttl)))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()   # created by someone else in between
+        return None
+    return 1
+
+
+def renew(name, token, ttl=None):
+    """Extend a held lock; False if it expired and was taken over. Commits."""
+    renewed = Lock.query.filter(Lock.name == name, Lock.token == token).update(
+        {"expires_at": _expiry(ttl)}, synchronize_session=False)
+    db.session.commit()
+    return bool(renewed)
+
+
+def check(name, token):
+    """Whether token is still the live holder of lock name."""
+    return db.session.query(Lock.query.filter(
+        Lock.name == name, Lock.token == token, Lock.expires_at > datetime.utcnow()).exists()).scalar()
+
+
+def keeper(name, token, ttl=None):
+    """
+    A function for long work under a held lock: it renews the lock once a
+    third of ttl has passed since the last renewal and returns False once
+    the lock has been lost. Renewing commits.
+    """
+    ttl = ttl or current_app.config["LOCK_TTL"]
+    due = [time.monotonic() + ttl / 3]
+
+    def alive():
+        if time.monotonic() < due[0]:
+            return True
+        due[0] = time.monotonic() + ttl / 3
+        return renew(name, token, ttl)
+    return alive
+
+
+def release(name, token):
+    """Free a lock if token still holds it. Commits."""
+    Lock.query.filter(Lock.name == name, Lock.token == token).update(
+        {"holder": None, "expires_at": None}, synchronize_session=False)
+    db.session.commit()
+
+
+@contextmanager
+def hold(name, ttl=None):
+    """acquire/release around a block; yields the token, or None when the lock is held elsewhere."""
+    token = acquire(name, ttl)
+    try:
+        yield token
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if token is not None:
+            release(name, token)
+
+
+def init_app(app):
+    app.config.setdefault("LOCK_TTL", int(os.environ.get("LOCK_TTL", 60)))
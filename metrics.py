@@ -0,0 +1,244 @@
+"""
+Minimal in-process metrics with a Prometheus text exposition endpoint.
+
+    from metrics import span, upstream
+
+    with span("db_commit"):
+        db.session.commit()
+
+    with upstream("gpt-5", "responses.create"):
+        resp = client.responses.create(...)
+
+Set METRICS_ENABLED=0 to turn everything into no-ops: span()/upstream()
+then return a shared null context and the request hooks are not installed.
+
+/metrics needs `Authorization: Bearer $METRICS_TOKEN`; without a token it
+only answers direct requests from localhost. Gauges run database queries,
+so their samples are cached for METRICS_GAUGE_TTL seconds per process.
+"""
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+GAUGE_TTL = float(os.environ.get("METRICS_GAUGE_TTL", 5))
+LOOPBACK = ("127.0.0.1", "::1")
+
+# Upstream jobs take seconds to minutes, request stages take milliseconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), labels + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class GaugeCollector:
+    """A gauge whose samples are produced by a callback at scrape time, at most every GAUGE_TTL seconds."""
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback   # () -> iterable of (labels tuple, value)
+        self._samples = None
+        self._taken_at = 0.0
+        self._lock = threading.Lock()
+
+    def samples(self):
+        # Held while the callback runs, so concurrent scrapes share one round of queries
+        with self._lock:
+            now = time.monotonic()
+            if self._samples is None or now - self._taken_at >= GAUGE_TTL:
+                self._samples = sorted(self.callback())
+                self._taken_at = now
+            return self._samples
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+HTTP_REQUEST_SECONDS = _register(Histogram(
+    "ugc_http_request_seconds", "Time spent handling HTTP requests.", ("method", "endpoint", "status")))
+STAGE_SECONDS = _register(Histogram(
+    "ugc_stage_seconds", "Time spent in a request or job stage.", ("stage",)))
+OPENAI_REQUEST_SECONDS = _register(Histogram(
+    "ugc_openai_request_seconds", "Latency of OpenAI API calls.", ("model", "operation", "outcome")))
+OPENAI_ERRORS = _register(Counter(
+    "ugc_openai_errors_total", "OpenAI API calls that raised.", ("model", "operation")))
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "labels", "start", "error_counter")
+
+    def __init__(self, histogram, labels, error_counter=None):
+        self.histogram = histogram
+        self.labels = labels
+        self.error_counter = error_counter
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.error_counter is None:
+            self.histogram.observe(elapsed, *self.labels)
+        else:
+            self.histogram.observe(elapsed, *self.labels, "error" if exc_type else "ok")
+            if exc_type:
+                self.error_counter.inc(*self.labels)
+        return False
+
+
+def span(stage):
+    """Time a named stage (form validation, DB commit, disk write, ...)."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(STAGE_SECONDS, (stage,))
+
+
+def upstream(model, operation):
+    """Time an OpenAI call, labelled by model and SDK operation."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(OPENAI_REQUEST_SECONDS, (model, operation), OPENAI_ERRORS)
+
+
+def add_counter(name, documentation, labelnames=()):
+    """Register a counter owned by another module."""
+    return _register(Counter(name, documentation, labelnames))
+
+
+def add_gauge(name, documentation, labelnames, callback):
+    """Register a scrape-time gauge, e.g. job counts by status."""
+    return _register(GaugeCollector(name, documentation, labelnames, callback))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+def authorized(request, token):
+    """Whether request may read /metrics: the bearer token, or without one a direct local request."""
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    # A proxied request arrives from localhost too; the forwarding header gives it away
+    return request.remote_addr in LOOPBACK and "X-Forwarded-For" not in request.headers
+
+
+def init_app(app):
+    """Install per-request timing hooks and the /metrics endpoint on app."""
+    from flask import Response, g, jsonify, request
+
+    app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN"))
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        if not authorized(request, app.config["METRICS_TOKEN"]):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "_metrics_start", None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                         request.method, endpoint, str(response.status_code))
+        return response
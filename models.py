@@ -16,6 +16,7 @@ class User(db.Model, UserMixin):
     id = db.Column(db.String, primary_key=True, default=gen_id)
     email = db.Column(db.String, unique=True, nullable=True)   # add google auth later
     credits = db.Column(db.Integer, nullable=False, default=0)
+    plan = db.Column(db.String, nullable=False, default="free", server_default="free")   # "free" until a purchase
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     projects = db.relationship("Project", backref="user", lazy=True)
@@ -45,6 +46,8 @@ class Project_images(db.Model):
         # This guarantees that (project_id, image_id) is unique
         # It's redundant when both are primary keys, but harmless
         db.UniqueConstraint("project_id", "image_id", name="uq_project_image"),
+        # The primary key covers project -> images; this is images -> projects
+        Index("ix_project_images_image_id", "image_id"),
     )
 
 class Image(db.Model):
@@ -54,10 +57,19 @@ class Image(db.Model):
 
     url = db.Column(db.String, nullable=False)
     path = db.Column(db.String, nullable=False)          # local path or S3 key
+    thumb_url = db.Column(db.String, nullable=True)
+    sha256 = db.Column(db.String(64), nullable=True)     # content hash, names the shared blob
+    size = db.Column(db.Integer, nullable=True)          # bytes
+    openai_file_id = db.Column(db.String, nullable=True)          # Files API upload, see openai_files.py
+    openai_file_expires_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     __table_args__ = (
         Index("ix_images_user_created", "user_id", "created_at"),
+        # One row per user and content; rows of different users share the blob
+        Index("ix_images_user_sha256", "user_id", "sha256", unique=True),
+        # Rows of any user with the same content (shared Files API ids), latest expiry first
+        Index("ix_images_sha256_file_expires", "sha256", "openai_file_expires_at"),
     )
 
 class Persona(db.Model):
@@ -69,19 +81,34 @@ class Persona(db.Model):
     description = db.Column(db.Text, nullable=False)
     project_id = db.Column(db.String, nullable=False)
     image_id = db.Column(db.String, nullable=False)
+    person_description = db.Column(db.Text, nullable=True)
+    source_persona_id = db.Column(db.String, nullable=True)    # set when forked from a similar persona
     
-    persona_json = db.Column(SqliteJSON, nullable=False)       # store the GPT persona dict
+    persona_json = db.Column(SqliteJSON, nullable=False)       # structured persona (schemas.PersonaProfile)
     persona_txt = db.Column(db.Text, nullable=True)       # full raw text
+    product_visual = db.Column(SqliteJSON, nullable=True)      # schemas.ProductVisual; scripts skip the image when set
 
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    status = db.Column(db.String, nullable=False, default="processing")     # queued | processing | completed | failed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)   # persona_index watermark
+    status = db.Column(db.String, nullable=False, default="processing")     # queued | processing | completed | failed | cancelled
     openai_job_id = db.Column(db.String, index=True)
+    model = db.Column(db.String, nullable=True)                # chosen by policy.py
+    reasoning_effort = db.Column(db.String, nullable=True)
+    verbosity = db.Column(db.String, nullable=True)
+    policy_reason = db.Column(db.String, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    speculated_at = db.Column(db.DateTime, nullable=True)     # speculative scripts queued, see speculative.py
+    fused = db.Column(db.Boolean, nullable=False, default=False, server_default="0")  # persona+script in one call
+    batch_id = db.Column(db.String, db.ForeignKey("batches.id"), nullable=True, index=True)   # bulk mode
     
     scripts = db.relationship("Script", backref="persona", lazy=True, cascade="all,delete")
 
     __table_args__ = (
-        Index("ix_personas_user_created", "project_id", "created_at"),
+        Index("ix_personas_project_created", "project_id", "created_at"),
+        Index("ix_personas_status_created", "status", "created_at"),
+        Index("ix_personas_image_id", "image_id"),
+        Index("ix_personas_project_status_updated", "project_id", "status", "updated_at"),
     )
 
 class Script(db.Model):
@@ -90,17 +117,31 @@ class Script(db.Model):
     persona_id = db.Column(db.String, db.ForeignKey("personas.id"), nullable=False)
     project_id = db.Column(db.String, nullable=False)
 
-    script_txt = db.Column(db.Text, nullable=True)
+    script_json = db.Column(SqliteJSON, nullable=True)         # structured script (schemas.AdScript or LongAdScript)
+    script_txt = db.Column(db.Text, nullable=True)             # rendered text, used as the Sora prompt
     
     tone = db.Column(db.String, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    status = db.Column(db.String, nullable=False, default="processing")     # queued | processing | completed | failed
+    status = db.Column(db.String, nullable=False, default="processing")     # queued | processing | completed | failed | cancelled | expired
     openai_job_id = db.Column(db.String, index=True)
+    model = db.Column(db.String, nullable=True)                # chosen by policy.py
+    reasoning_effort = db.Column(db.String, nullable=True)
+    verbosity = db.Column(db.String, nullable=True)
+    policy_reason = db.Column(db.String, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    fused = db.Column(db.Boolean, nullable=False, default=False, server_default="0")  # persona+script in one call
+    batch_id = db.Column(db.String, db.ForeignKey("batches.id"), nullable=True, index=True)   # bulk mode
+    segments = db.Column(db.Integer, nullable=True)            # scenes of a long-form script; None: one clip
+    speculative = db.Column(db.Boolean, nullable=False, default=False, server_default="0")  # queued before it was asked for
+    claimed_at = db.Column(db.DateTime, nullable=True)         # when a request took a speculative row
     
     videos = db.relationship("Video", backref="script", lazy=True, cascade="all,delete")
 
     __table_args__ = (
         Index("ix_scripts_persona_created", "persona_id", "created_at"),
+        Index("ix_scripts_project_created", "project_id", "created_at"),
+        Index("ix_scripts_status_created", "status", "created_at"),
+        Index("ix_scripts_speculative_claimed", "speculative", "claimed_at", "created_at"),
     )
 
 class Video(db.Model):
@@ -109,16 +150,97 @@ class Video(db.Model):
     script_id = db.Column(db.String, db.ForeignKey("scripts.id"), nullable=False)
     project_id = db.Column(db.String, nullable=False)
 
-    status = db.Column(db.String, nullable=False, default="queued")  # queued|processing|completed|failed
+    status = db.Column(db.String, nullable=False, default="queued")  # queued|processing|completed|failed|expired|cancelled
     openai_job_id = db.Column(db.String, index=True)
     
     file_path = db.Column(db.String, nullable=True)                   # local path or S3 key
     video_url = db.Column(db.String, nullable=True)                   # public URL if serving via HTTP
+    size = db.Column(db.Integer, nullable=True)                       # bytes of file_path
+    poster_path = db.Column(db.String, nullable=True)                 # JPEG poster frame
+    poster_url = db.Column(db.String, nullable=True)
+    preview_path = db.Column(db.String, nullable=True)                # short looping WEBP
+    preview_url = db.Column(db.String, nullable=True)
     error = db.Column(db.Text, nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     completed_at = db.Column(db.DateTime, nullable=True)
+    last_accessed_at = db.Column(db.DateTime, nullable=True)          # last served, for LRU eviction
+    lease_owner = db.Column(db.String, nullable=True)                 # "host:pid" polling/downloading it
+    lease_expires_at = db.Column(db.DateTime, nullable=True)          # claim can be taken over after this
+    segments = db.Column(db.Integer, nullable=True)                   # clips stitched into this video; None: one render
+
+    parts = db.relationship("VideoSegment", backref="video", lazy=True, cascade="all,delete",
+                            order_by="VideoSegment.position")
 
     __table_args__ = (
         Index("ix_videos_status_created", "status", "created_at"),
-    )
\ No newline at end of file
+        Index("ix_videos_script_created", "script_id", "created_at"),
+        Index("ix_videos_project_created", "project_id", "created_at"),
+        Index("ix_videos_file_path", "file_path"),   # storage.touch on every serve
+        Index("ix_videos_status_poster_completed", "status", "poster_path", "completed_at"),   # postprocess sweep
+    )
+
+class VideoSegment(db.Model):
+    """One Sora render of a long-form video; the finished clips are concatenated in position order."""
+    __tablename__ = "video_segments"
+    id = db.Column(db.String, primary_key=True, default=gen_id)
+    video_id = db.Column(db.String, db.ForeignKey("videos.id"), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+
+    status = db.Column(db.String, nullable=False, default="queued")  # queued|in_progress|downloading|completed|failed|cancelled
+    openai_job_id = db.Column(db.String, index=True)
+    file_path = db.Column(db.String, nullable=True)                   # deleted once stitched
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    lease_owner = db.Column(db.String, nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("video_id", "position", name="uq_video_segment_position"),
+    )
+
+class Batch(db.Model):
+    """One OpenAI Batch API submission of pending personas/scripts (see batches.py)."""
+    __tablename__ = "batches"
+    id = db.Column(db.String, primary_key=True, default=gen_id)
+
+    status = db.Column(db.String, nullable=False, default="compiled", index=True)  # compiled | validating | in_progress | finalizing | completed | failed | expired | cancelled
+    path = db.Column(db.String, nullable=True)                        # local JSONL input
+    request_count = db.Column(db.Integer, nullable=False, default=0)
+    input_file_id = db.Column(db.String, nullable=True)
+    openai_batch_id = db.Column(db.String, nullable=True, index=True)
+    output_file_id = db.Column(db.String, nullable=True)
+    error_file_id = db.Column(db.String, nullable=True)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    submitted_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+class Lock(db.Model):
+    """A named lease held by one process at a time (see locks.py)."""
+    __tablename__ = "locks"
+    name = db.Column(db.String, primary_key=True)                     # e.g. "worker:reconcile", "batch:<id>"
+
+    holder = db.Column(db.String, nullable=True)                      # "host:pid", None when free
+    token = db.Column(db.Integer, nullable=False, default=0)          # fencing token, bumped on every acquire
+    acquired_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)                # free again after this
+
+class IdempotencyKey(db.Model):
+    """The stored response for a client's Idempotency-Key (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+    user_id = db.Column(db.String, db.ForeignKey("users.id"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+
+    fingerprint = db.Column(db.String(64), nullable=False)            # sha256 of path + form, to catch key reuse
+    status = db.Column(db.String, nullable=False, default="processing")  # processing | completed
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    mimetype = db.Column(db.String, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,87 @@
+"""
+Upload-once image references for GPT-5 calls.
+
+Rather than inlining an image as a base64 data URL (a third larger than the
+file) in every responses.create, each Image is uploaded to the Files API
+once and sent as {"type": "input_image", "file_id": ...}. The id and its
+expiry are stored on the row and shared by every row with the same sha256.
+Uploads are made with an expiry (OPENAI_FILE_TTL); an id that is close to
+expiring is replaced on next use. If the upload fails the caller falls back
+to the data URL.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db
+from metrics import upstream
+from models import Image
+
+log = logging.getLogger(__name__)
+
+PURPOSE = "vision"
+REFRESH_MARGIN = 3600   # seconds; ids expiring sooner than this are replaced
+
+# Striped locks so concurrent requests for the same image upload it once per process
+_LOCKS = [threading.Lock() for _ in range(32)]
+
+
+def _lock_for(img):
+    return _LOCKS[hash(img.sha256 or img.id) % len(_LOCKS)]
+
+
+def _fresh(img, after):
+    return bool(img.openai_file_id and img.openai_file_expires_at and img.openai_file_expires_at > after)
+
+
+def file_id_for(img, client):
+    """A usable Files API id for img, uploading it if needed; None when disabled or on failure."""
+    if not current_app.config["OPENAI_FILES_ENABLED"]:
+        return None
+    fresh_after = datetime.utcnow() + timedelta(seconds=REFRESH_MARGIN)
+    if _fresh(img, fresh_after):
+        return img.openai_file_id
+
+    with _lock_for(img):
+        # Another request, or another row with the same bytes, may have uploaded it meanwhile
+        same = Image.id == img.id if not img.sha256 else Image.sha256 == img.sha256
+        shared = (Image.query.filter(same, Image.openai_file_id.isnot(None),
+                                     Image.openai_file_expires_at > fresh_after)
+                  .order_by(Image.openai_file_expires_at.desc()).first())
+        if shared is not None:
+            file_id, expires_at = shared.openai_file_id, shared.openai_file_expires_at
+        else:
+            ttl = current_app.config["OPENAI_FILE_TTL"]
+            try:
+                with open(img.path, "rb") as f, upstream("files", "files.create"):
+                    resp = client.files.create(file=f, purpose=PURPOSE,
+                                               expires_after={"anchor": "created_at", "seconds": ttl})
+            except Exception as e:
+                log.warning("Files API upload failed for image %s: %s", img.id, e)
+                return None
+            file_id = resp.id
+            expires_at = (datetime.utcfromtimestamp(resp.expires_at) if getattr(resp, "expires_at", None)
+                          else datetime.utcnow() + timedelta(seconds=ttl))
+
+        (Image.query.filter(same)
+         .update({"openai_file_id": file_id, "openai_file_expires_at": expires_at}, synchronize_session=False))
+        db.session.commit()
+    return file_id
+
+
+def forget(img):
+    """Drop a file id the API rejected (e.g. deleted upstream) so the next call re-uploads."""
+    same = Image.id == img.id if not img.sha256 else Image.sha256 == img.sha256
+    (Image.query.filter(same, Image.openai_file_id == img.openai_file_id)
+     .update({"openai_file_id": None, "openai_file_expires_at": None}, synchronize_session=False))
+    db.session.commit()
+
+
+def init_app(app):
+    env = os.environ.get
+    app.config.setdefault("OPENAI_FILES_ENABLED", env("OPENAI_FILES_ENABLED", "1").lower() not in ("0", "false", "no"))
+    # The Files API accepts 1 hour to 30 days
+    app.config.setdefault("OPENAI_FILE_TTL", int(env("OPENAI_FILE_TTL", 7 * 24 * 3600)))
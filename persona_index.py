@@ -0,0 +1,251 @@
+"""
+Local TF-IDF similarity index over completed personas.
+
+Each persona is indexed as two fields: its inputs (product name,
+description, person description) and the generated persona_txt. A query
+(the inputs of a new request) is scored by cosine similarity against the
+inputs; similarity to persona_txt can only lift a score towards 1, so
+identical inputs always score 1.0. Nothing leaves the process.
+
+The index is partitioned by user, since a search only ever looks at the
+searching user's personas. A partition is loaded from the database on the
+user's first search in a process (the MAX_USERS most recently searched are
+kept) and kept current by add() as personas complete. Every search checks
+the partition against a (count, max updated_at) watermark of the user's
+completed personas, so personas completed, edited or deleted by other
+processes are picked up by diffing ids and updated_at.
+"""
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from flask import current_app
+
+from extensions import db
+from models import Persona, Project
+
+
+TEXT_WEIGHT = 0.3   # share of the remaining gap to 1.0 that persona_txt similarity can close
+MAX_USERS = 500     # user partitions kept per process
+LOAD_CHUNK = 500    # personas per IN (...) when loading a partition
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its of on or "
+    "our she that the their them they this to was we were with you your".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def input_text(product_name, description, person_description):
+    return " ".join(filter(None, (product_name, description, person_description)))
+
+
+class _Field:
+    """
+    Inverted index for one text field, with document norms kept current as
+    documents are added and removed.
+
+    idf_t = A - b_t, with A = log(n + 1) + 1 depending only on the document
+    count and b_t = log(df_t + 1) only on the term. A document's squared norm,
+    sum_t (w_t * idf_t)^2, is then A^2*s0 - 2A*s1 + s2 for s0 = sum w^2,
+    s1 = sum w^2*b_t and s2 = sum w^2*b_t^2. A document coming or going only
+    moves b_t for its own terms, so only the documents sharing one of them
+    have s1/s2 adjusted, and A is applied at query time.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)   # term -> {doc id: term frequency weight}
+        self.df = Counter()
+        self.docs = {}                      # doc id -> {term: weight}
+        self.sums = {}                      # doc id -> [s0, s1, s2]
+
+    def _b(self, term):
+        return math.log(self.df.get(term, 0) + 1)
+
+    def _move_df(self, term, delta):
+        old = self._b(term)
+        self.df[term] += delta
+        if self.df[term] <= 0:
+            del self.df[term]
+        new = self._b(term)
+        for doc_id, w in self.postings.get(term, {}).items():
+            sums = self.sums[doc_id]
+            sums[1] += w * w * (new - old)
+            sums[2] += w * w * (new * new - old * old)
+
+    def add(self, doc_id, tokens):
+        weights = {term: 1 + math.log(tf) for term, tf in Counter(tokens).items()}
+        for term in weights:
+            self._move_df(term, 1)   # before the new posting, which starts from the new df
+        sums = [0.0, 0.0, 0.0]
+        for term, w in weights.items():
+            self.postings[term][doc_id] = w
+            b = self._b(term)
+            sums[0] += w * w
+            sums[1] += w * w * b
+            sums[2] += w * w * b * b
+        self.docs[doc_id] = weights
+        self.sums[doc_id] = sums
+
+    def remove(self, doc_id):
+        weights = self.docs.pop(doc_id, None)
+        if weights is None:
+            return
+        del self.sums[doc_id]
+        for term in weights:
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+            self._move_df(term, -1)
+
+    def idf(self, term, n_docs):
+        return math.log((n_docs + 1) / (self.df.get(term, 0) + 1)) + 1
+
+    def norm(self, doc_id, n_docs):
+        s0, s1, s2 = self.sums[doc_id]
+        a = math.log(n_docs + 1) + 1
+        return math.sqrt(max(a * a * s0 - 2 * a * s1 + s2, 0.0))
+
+    def scores(self, tokens, n_docs):
+        query = {t: (1 + math.log(tf)) * self.idf(t, n_docs) for t, tf in Counter(tokens).items()}
+        q_norm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+        acc = defaultdict(float)
+        for term, q_w in query.items():
+            idf = self.idf(term, n_docs)
+            for doc_id, w in self.postings.get(term, {}).items():
+                acc[doc_id] += q_w * w * idf
+        scores = {}
+        for doc_id, dot in acc.items():
+            norm = self.norm(doc_id, n_docs)
+            if norm:
+                scores[doc_id] = dot / (q_norm * norm)
+        return scores
+
+
+def completed_query(user_id):
+    """The user's completed personas, as the index reads them."""
+    # IN (subquery) rather than a join, so SQLite reads (project_id, status, updated_at) per project
+    # instead of walking every completed persona through the status index
+    projects = db.session.query(Project.id).filter(Project.user_id == user_id)
+    return Persona.query.filter(Persona.project_id.in_(projects.scalar_subquery()), Persona.status == "completed")
+
+
+def watermark_query(user_id):
+    """(count, max updated_at) of the user's completed personas; any insert, edit or delete moves it."""
+    return completed_query(user_id).with_entities(db.func.count(Persona.id), db.func.max(Persona.updated_at))
+
+
+class _UserIndex:
+    """The personas of one user: searches never look past them, so neither does idf."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inputs = _Field()
+        self.text = _Field()
+        self.versions = {}      # persona id -> updated_at it was indexed at
+        self.watermark = None   # watermark_query() result the partition was last synced to
+
+    def put(self, persona_id, updated_at, product_name, description, person_description, persona_txt):
+        if persona_id in self.versions:
+            if self.versions[persona_id] == updated_at:
+                return
+            self.remove(persona_id)
+        self.versions[persona_id] = updated_at
+        self.inputs.add(persona_id, tokenize(input_text(product_name, description, person_description)))
+        self.text.add(persona_id, tokenize(persona_txt))
+
+    def remove(self, persona_id):
+        self.versions.pop(persona_id, None)
+        self.inputs.remove(persona_id)
+        self.text.remove(persona_id)
+
+    def sync(self, user_id):
+        """Apply edits, deletes and personas indexed by other processes; one query when nothing moved."""
+        mark = tuple(watermark_query(user_id).one())
+        if mark == self.watermark:
+            return
+        current = dict(completed_query(user_id).with_entities(Persona.id, Persona.updated_at))
+        for persona_id in [p for p, v in self.versions.items() if p not in current or current[p] != v]:
+            self.remove(persona_id)
+        todo = [p for p in current if p not in self.versions]
+        for i in range(0, len(todo), LOAD_CHUNK):
+            for row in (db.session.query(Persona.id, Persona.updated_at, Persona.product_name, Persona.description,
+                                         Persona.person_description, Persona.persona_txt)
+                        .filter(Persona.id.in_(todo[i:i + LOAD_CHUNK]))):
+                self.put(*row)
+        self.watermark = mark
+
+
+class PersonaIndex:
+    def __init__(self, max_users=None):
+        self.lock = threading.Lock()
+        self.max_users = max_users or MAX_USERS
+        self.users = OrderedDict()   # user id -> _UserIndex, least recently searched first
+
+    def _partition(self, user_id, create=True):
+        with self.lock:
+            part = self.users.get(user_id)
+            if part is not None:
+                self.users.move_to_end(user_id)
+            elif create:
+                part = self.users[user_id] = _UserIndex()
+                while len(self.users) > self.max_users:
+                    self.users.popitem(last=False)
+            return part
+
+    def add(self, persona, user_id):
+        # A user not loaded in this process is read in full on their first search
+        part = self._partition(user_id, create=False)
+        if part is not None:
+            with part.lock:
+                part.put(persona.id, persona.updated_at, persona.product_name, persona.description,
+                         persona.person_description, persona.persona_txt)
+
+    def search(self, user_id, query, k=5, exclude=()):
+        """Top-k (persona id, score) among user_id's personas, best first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        part = self._partition(user_id)
+        with part.lock:
+            part.sync(user_id)
+            n = len(part.versions)
+            by_input = part.inputs.scores(tokens, n)
+            by_text = part.text.scores(tokens, n)
+        hits = []
+        for doc_id in set(by_input) | set(by_text):
+            if doc_id in exclude:
+                continue
+            base = by_input.get(doc_id, 0.0)
+            score = base + TEXT_WEIGHT * (1 - base) * by_text.get(doc_id, 0.0)
+            hits.append((doc_id, score))
+        hits.sort(key=lambda h: h[1], reverse=True)
+        return hits[:k]
+
+
+_LOCK = threading.Lock()
+
+
+def get_index():
+    """The app's persona index; partitions are loaded per user as they search."""
+    index = current_app.extensions.get("persona_index")
+    if index is None:
+        with _LOCK:
+            index = current_app.extensions.get("persona_index")
+            if index is None:
+                index = current_app.extensions["persona_index"] = PersonaIndex(
+                    current_app.config.get("PERSONA_INDEX_MAX_USERS"))
+    return index
+
+
+def add(persona):
+    """Index a persona that just completed (no-op until the index exists)."""
+    index = current_app.extensions.get("persona_index")
+    if index is not None:
+        project = db.session.get(Project, persona.project_id)
+        index.add(persona, project.user_id if project else None)
@@ -0,0 +1,190 @@
+"""
+Picks model, reasoning effort and verbosity for each GPT-5 stage.
+
+    decision = policy.choose("persona", input_chars=len(prompt_inputs), user=current_user)
+    enqueue_chatGPT_background(..., model=decision.model, effort=decision.effort, ...)
+
+Starting from a per-stage default, the effort is raised for long inputs and
+paid users (User.plan other than "free"; the starter credits every account
+gets don't count) and lowered when a near-identical persona already exists
+(a cache hit in persona_index). It is then checked against what earlier rows
+with the same model, effort and verbosity actually did: if they failed or
+came back unparseable too often, effort goes up; if they were reliable but
+slower than the stage's latency budget, effort comes down. The decision and
+its reason are stored on the row so the policy itself can be analysed.
+
+POLICY_MODEL picks the model (default gpt-5); with POLICY_SMALL_MODEL set,
+free-tier requests that land on minimal/low effort use that instead.
+POLICY_ENABLED=0 pins the original settings (persona high/high, script
+medium/medium on gpt-5).
+
+    flask policy plan EMAIL pro     # until purchases set it
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from statistics import median
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from extensions import db
+from models import Persona, Script, User
+
+
+EFFORTS = ("minimal", "low", "medium", "high")
+
+# stage -> (effort, verbosity, latency budget in seconds)
+DEFAULTS = {
+    "persona": ("medium", "medium", 90),
+    "script": ("low", "medium", 60),
+    "fused": ("medium", "medium", 120),
+}
+FIXED = {
+    "persona": ("gpt-5", "high", "high"),
+    "script": ("gpt-5", "medium", "medium"),
+    "fused": ("gpt-5", "high", "high"),
+}
+
+LONG_INPUT_CHARS = 1500
+CACHE_HIT_SIMILARITY = 0.6   # persona_index score that counts as a cache hit
+MIN_SAMPLES = 20        # rows needed before measured stats override the rules
+MAX_BAD_RATE = 0.1      # failed or unparseable outputs tolerated at an effort level
+STATS_WINDOW = 200      # most recent finished rows per stage
+STATS_TTL = 300         # seconds
+
+FREE_PLAN = "free"
+
+_STATS = {}             # stage -> (computed at, {(model, effort, verbosity): {"n", "bad", "p50"}})
+_STATS_LOCK = threading.Lock()
+
+
+@dataclass
+class Decision:
+    model: str
+    effort: str
+    verbosity: str
+    reason: str
+
+
+def _shift(effort, steps):
+    i = min(max(EFFORTS.index(effort) + steps, 0), len(EFFORTS) - 1)
+    return EFFORTS[i]
+
+
+def paid(user):
+    return user is not None and (getattr(user, "plan", None) or FREE_PLAN) != FREE_PLAN
+
+
+def stats_query(model_cls, status, fused):
+    """The latest finished rows of one status the stats are measured on."""
+    # One query per status, so each walks the (status, created_at) index instead of sorting the table
+    return (model_cls.query
+            .filter(model_cls.status == status, model_cls.reasoning_effort.isnot(None),
+                    model_cls.fused.is_(fused), model_cls.batch_id.is_(None))
+            .order_by(model_cls.created_at.desc())
+            .limit(STATS_WINDOW))
+
+
+def _row_stats(model_cls, raw_column, fused):
+    rows = [row for status in ("completed", "failed") for row in stats_query(model_cls, status, fused)]
+    rows = sorted(rows, key=lambda row: row.created_at, reverse=True)[:STATS_WINDOW]
+    by_setting = {}
+    for row in rows:
+        s = by_setting.setdefault((row.model, row.reasoning_effort, row.verbosity),
+                                  {"n": 0, "bad": 0, "latencies": []})
+        s["n"] += 1
+        data = getattr(row, raw_column)
+        if row.status == "failed" or (isinstance(data, dict) and "raw" in data):
+            s["bad"] += 1
+        elif row.completed_at:
+            s["latencies"].append((row.completed_at - row.created_at).total_seconds())
+    return {key: {"n": s["n"], "bad": s["bad"] / s["n"],
+                "p50": median(s["latencies"]) if s["latencies"] else None}
+            for key, s in by_setting.items()}
+
+
+def stats(stage):
+    """Sample count, bad-output rate and median latency per (model, effort, verbosity) of a stage (cached)."""
+    now = time.monotonic()
+    with _STATS_LOCK:
+        cached = _STATS.get(stage)
+        if cached and now - cached[0] < STATS_TTL:
+            return cached[1]
+    # Fused jobs are measured on their Script rows, which complete with the Persona
+    model_cls, column = (Persona, "persona_json") if stage == "persona" else (Script, "script_json")
+    result = _row_stats(model_cls, column, stage == "fused")
+    with _STATS_LOCK:
+        _STATS[stage] = (now, result)
+    return result
+
+
+def choose(stage, input_chars=0, user=None, cache_hit=False):
+    """Decision for one request of stage ("persona", "script" or "fused")."""
+    if not current_app.config.get("POLICY_ENABLED", True):
+        model, effort, verbosity = FIXED[stage]
+        return Decision(model, effort, verbosity, "fixed")
+
+    effort, verbosity, budget = DEFAULTS[stage]
+    reasons = [f"default {effort}"]
+    if input_chars > LONG_INPUT_CHARS:
+        effort = _shift(effort, 1)
+        reasons.append("long input")
+    is_paid = paid(user)
+    if is_paid:
+        effort = _shift(effort, 1)
+        verbosity = "high" if stage == "persona" else verbosity
+        reasons.append("paid tier")
+    if cache_hit:
+        effort = _shift(effort, -1)
+        reasons.append("similar persona exists")
+
+    def model_for(e):
+        small = current_app.config.get("POLICY_SMALL_MODEL")
+        if small and not is_paid and EFFORTS.index(e) <= EFFORTS.index("low"):
+            return small
+        return current_app.config.get("POLICY_MODEL", "gpt-5")
+
+    # Compared with rows run the same way: a small model or terser output says little about the others
+    measured = stats(stage)
+    current = measured.get((model_for(effort), effort, verbosity))
+    if current and current["n"] >= MIN_SAMPLES and current["bad"] > MAX_BAD_RATE and effort != "high":
+        effort = _shift(effort, 1)
+        reasons.append(f"bad rate {current['bad']:.0%} at {_shift(effort, -1)}")
+    elif current and current["n"] >= MIN_SAMPLES and current["p50"] and current["p50"] > budget:
+        lower_effort = _shift(effort, -1)
+        lower = measured.get((model_for(lower_effort), lower_effort, verbosity))
+        if lower and lower["n"] >= MIN_SAMPLES and lower["bad"] <= MAX_BAD_RATE:
+            effort = lower_effort
+            reasons.append(f"p50 {current['p50']:.0f}s over {budget}s budget")
+
+    model = model_for(effort)
+    if model != current_app.config.get("POLICY_MODEL", "gpt-5"):
+        reasons.append("small model")
+    return Decision(model, effort, verbosity, ", ".join(reasons))
+
+
+cli = AppGroup("policy", help="Generation policy.")
+
+
+@cli.command("plan")
+@click.argument("email")
+@click.argument("plan")
+def plan_command(email, plan):
+    """Set a user's plan; anything but "free" gets the paid-tier settings."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise SystemExit(f"No user {email}")
+    user.plan = plan
+    db.session.commit()
+    click.echo(f"{email}: {plan} ({'paid' if paid(user) else 'free'} tier)")
+
+
+def init_app(app):
+    app.config.setdefault("POLICY_ENABLED",
+                          os.environ.get("POLICY_ENABLED", "1").lower() not in ("0", "false", "no"))
+    app.config.setdefault("POLICY_MODEL", os.environ.get("POLICY_MODEL", "gpt-5"))
+    app.config.setdefault("POLICY_SMALL_MODEL", os.environ.get("POLICY_SMALL_MODEL"))   # e.g. gpt-5-mini
+    app.cli.add_command(cli)
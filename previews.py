@@ -0,0 +1,192 @@
+"""
+Poster frames and animated previews for completed videos.
+
+Once a video is downloaded, submit() queues generate() on a small bounded
+thread pool. Each job runs ffmpeg twice, for a JPEG poster frame and a short
+looping WEBP, and records both on the Video row so the gallery never has to
+load the MP4s. Without ffmpeg on PATH (or FFMPEG_BINARY) this is a no-op.
+concat() joins the segments of a long-form video with the same binary.
+
+    flask previews backfill     # generate missing previews for older videos
+"""
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from extensions import db
+from metrics import span
+from models import Video
+
+log = logging.getLogger(__name__)
+
+POSTER_DIR = "posters"
+PREVIEW_DIR = "previews"
+POSTER_WIDTH = 360
+PREVIEW_WIDTH = 240
+PREVIEW_SECONDS = 3
+PREVIEW_FPS = 8
+FFMPEG_TIMEOUT = 60
+
+_LOCK = threading.Lock()
+
+
+def ffmpeg():
+    return current_app.config.get("FFMPEG_BINARY") or shutil.which("ffmpeg")
+
+
+def names(video_path):
+    """Poster and preview paths for a video, relative to VIDEO_FOLDER."""
+    base = os.path.splitext(os.path.basename(video_path))[0]
+    return f"{POSTER_DIR}/{base}.jpg", f"{PREVIEW_DIR}/{base}.webp"
+
+
+def _sibling_url(video_url, name):
+    # Previews are served from the same /videos/ route as the MP4 itself
+    return video_url.rsplit("/", 1)[0] + "/" + name
+
+
+def _ffmpeg(binary, *args):
+    subprocess.run([binary, "-nostdin", "-loglevel", "error", "-y", *args],
+                   check=True, capture_output=True, timeout=FFMPEG_TIMEOUT)
+
+
+def _part_name(path):
+    # Keeps the extension, which is how ffmpeg picks the output format
+    base, ext = os.path.splitext(path)
+    return f"{base}.{os.getpid()}-{threading.get_ident()}.part{ext}"
+
+
+def _render_to(binary, path, *args):
+    """
+    Run ffmpeg into a temporary name next to path and rename it into place,
+    so a timeout or crash never leaves a truncated file where it is served
+    (with a long max-age) from.
+    """
+    part = _part_name(path)
+    try:
+        _ffmpeg(binary, *args, part)
+        os.replace(part, path)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def render(binary, video_path, poster_path, preview_path):
+    for path in (poster_path, preview_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with span("video_poster"):
+        # -ss before -i seeks by keyframe, so this doesn't decode the whole clip
+        _render_to(binary, poster_path, "-ss", "1", "-i", video_path, "-frames:v", "1",
+                   "-vf", f"scale={POSTER_WIDTH}:-2", "-q:v", "4")
+    with span("video_preview"):
+        _render_to(binary, preview_path, "-t", str(PREVIEW_SECONDS), "-i", video_path, "-an",
+                   "-vf", f"fps={PREVIEW_FPS},scale={PREVIEW_WIDTH}:-2",
+                   "-c:v", "libwebp", "-quality", "50", "-loop", "0")
+
+
+def concat(binary, paths, out_path):
+    """Join clips of the same encoding end to end (concat demuxer, stream copy) into out_path."""
+    list_path = out_path + ".txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            f.write("file '%s'\n" % os.path.abspath(path).replace("'", "'\\''"))
+    try:
+        _ffmpeg(binary, "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", "-movflags", "+faststart", out_path)
+    finally:
+        os.remove(list_path)
+
+
+def generate(video_id):
+    """Render and record the poster and preview of one completed video."""
+    v = db.session.get(Video, video_id)
+    binary = ffmpeg()
+    if v is None or v.status != "completed" or not v.file_path or not binary:
+        return False
+
+    poster_name, preview_name = names(v.file_path)
+    root = current_app.config["VIDEO_FOLDER"]
+    poster_path = os.path.join(root, poster_name)
+    preview_path = os.path.join(root, preview_name)
+    try:
+        render(binary, v.file_path, poster_path, preview_path)
+    except (subprocess.SubprocessError, OSError) as e:
+        log.warning("Preview generation failed for video %s: %s", video_id, e)
+        return False
+
+    v.poster_path = poster_path
+    v.poster_url = _sibling_url(v.video_url, poster_name)
+    v.preview_path = preview_path
+    v.preview_url = _sibling_url(v.video_url, preview_name)
+    with span("db_commit"):
+        db.session.commit()
+    return True
+
+
+def _pool(app):
+    state = app.extensions.get("previews")
+    if state is None:
+        with _LOCK:
+            state = app.extensions.get("previews")
+            if state is None:
+                workers = app.config["PREVIEW_WORKERS"]
+                state = app.extensions["previews"] = (
+                    ThreadPoolExecutor(max_workers=workers, thread_name_prefix="previews"),
+                    threading.BoundedSemaphore(app.config["PREVIEW_QUEUE_MAX"]),
+                )
+    return state
+
+
+def _job(app, video_id, slots):
+    try:
+        with app.app_context():
+            generate(video_id)
+    except Exception:
+        log.exception("Preview job for video %s crashed", video_id)
+    finally:
+        slots.release()
+
+
+def submit(video_id):
+    """
+    Queue preview generation. Returns False without queueing when ffmpeg is
+    missing or PREVIEW_QUEUE_MAX jobs are already pending; `flask previews
+    backfill` picks those up later.
+    """
+    if not ffmpeg():
+        return False
+    app = current_app._get_current_object()
+    pool, slots = _pool(app)
+    if not slots.acquire(blocking=False):
+        log.warning("Preview queue full, skipping video %s", video_id)
+        return False
+    pool.submit(_job, app, video_id, slots)
+    return True
+
+
+cli = AppGroup("previews", help="Video poster frames and animated previews.")
+
+
+@cli.command("backfill")
+def backfill():
+    """Generate previews for completed videos that don't have one."""
+    if not ffmpeg():
+        raise SystemExit("ffmpeg not found; set FFMPEG_BINARY or install it")
+    ids = [vid for (vid,) in db.session.query(Video.id).filter(
+        Video.status == "completed", Video.file_path.isnot(None), Video.poster_path.is_(None))]
+    done = sum(generate(vid) for vid in ids)
+    click.echo(f"{done}/{len(ids)} videos updated")
+
+
+def init_app(app):
+    app.config.setdefault("PREVIEW_WORKERS", 2)
+    app.config.setdefault("PREVIEW_QUEUE_MAX", 100)
+    app.config.setdefault("FFMPEG_BINARY", os.environ.get("FFMPEG_BINARY"))
+    app.cli.add_command(cli)
@@ -0,0 +1,381 @@
+"""
+Structured-output schemas for the GPT-5 persona and script stages.
+
+Each stage sends its JSON schema as `text.format` (strict mode), so the
+response is a single JSON document. It is decoded once and loaded into a
+typed model here; the model is what gets stored (persona_json /
+script_json) and rendered back to text for the prompts downstream
+(persona_txt -> script prompt, script_txt -> Sora prompt).
+
+The fused stage asks for both at once ({"persona": ..., "script": ...})
+and fills the Persona and Script rows from the one response. Long-form
+scripts (LongAdScript) are split into scenes, one Sora clip each. The
+persona stage can also describe the product (ProductVisual), so scripts
+are written without sending the image again.
+"""
+import json
+from dataclasses import dataclass, field, fields
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _obj(properties):
+    """A strict-mode object schema: every property required, nothing extra."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+_STR = {"type": "string"}
+_STR_LIST = {"type": "array", "items": _STR}
+
+
+def _load(cls, data, path):
+    """Build dataclass cls from a decoded JSON object, checking names and types."""
+    if not isinstance(data, dict):
+        raise SchemaError(f"{path}: expected an object")
+    values = {}
+    for f in fields(cls):
+        if f.name not in data:
+            raise SchemaError(f"{path}.{f.name}: missing")
+        value = data[f.name]
+        sub = f.metadata.get("model")
+        if sub is not None and f.metadata.get("many"):
+            if not isinstance(value, list):
+                raise SchemaError(f"{path}.{f.name}: expected a list")
+            value = [_load(sub, v, f"{path}.{f.name}[{i}]") for i, v in enumerate(value)]
+        elif sub is not None:
+            value = _load(sub, value, f"{path}.{f.name}")
+        elif f.type is list:
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise SchemaError(f"{path}.{f.name}: expected a list of strings")
+        elif f.type is int:
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise SchemaError(f"{path}.{f.name}: expected an integer")
+        elif not isinstance(value, str):
+            raise SchemaError(f"{path}.{f.name}: expected a string")
+        values[f.name] = value
+    return cls(**values)
+
+
+def _nested(model, many=False):
+    return field(metadata={"model": model, "many": many})
+
+
+# Persona
+# ------------------------------------------------------------------------------
+
+@dataclass
+class CoreIdentity:
+    name: str
+    age: int
+    gender: str
+    ethnicity: str
+    location: str
+    occupation: str
+
+
+@dataclass
+class Appearance:
+    general: str
+    hair: str
+    clothing: str
+    signature_details: str
+
+
+@dataclass
+class Personality:
+    traits: list
+    demeanor: str
+    communication_style: str
+
+
+@dataclass
+class Lifestyle:
+    hobbies: str
+    values: str
+    pain_points: str
+    home_environment: str
+
+
+@dataclass
+class PersonaProfile:
+    core_identity: CoreIdentity = _nested(CoreIdentity)
+    appearance: Appearance = _nested(Appearance)
+    personality: Personality = _nested(Personality)
+    lifestyle: Lifestyle = _nested(Lifestyle)
+    credibility: str
+
+    def to_text(self):
+        c, a, p, l = self.core_identity, self.appearance, self.personality, self.lifestyle
+        return "\n".join([
+            "I. Core Identity",
+            f"Name: {c.name}", f"Age: {c.age}", f"Sex/Gender: {c.gender}", f"Ethnicity: {c.ethnicity}",
+            f"Location: {c.location}", f"Occupation: {c.occupation}",
+            "", "II. Physical Appearance & Personal Style",
+            f"General Appearance: {a.general}", f"Hair: {a.hair}",
+            f"Clothing Aesthetic: {a.clothing}", f"Signature Details: {a.signature_details}",
+            "", "III. Personality & Communication",
+            f"Key Personality Traits: {', '.join(p.traits)}", f"Demeanor & Energy Level: {p.demeanor}",
+            f"Communication Style: {p.communication_style}",
+            "", "IV. Lifestyle & Worldview",
+            f"Hobbies & Interests: {l.hobbies}", f"Values & Priorities: {l.values}",
+            f"Daily Frustrations / Pain Points: {l.pain_points}", f"Home Environment: {l.home_environment}",
+            "", "V. Persona Justification",
+            f"Core Credibility: {self.credibility}",
+        ])
+
+    def summary(self):
+        """The few fields the API returns alongside the text."""
+        c = self.core_identity
+        return {"name": c.name, "age": c.age, "occupation": c.occupation, "location": c.location}
+
+
+PERSONA_SCHEMA = _obj({
+    "core_identity": _obj({
+        "name": _STR, "age": {"type": "integer"}, "gender": _STR,
+        "ethnicity": _STR, "location": _STR, "occupation": _STR,
+    }),
+    "appearance": _obj({"general": _STR, "hair": _STR, "clothing": _STR, "signature_details": _STR}),
+    "personality": _obj({"traits": _STR_LIST, "demeanor": _STR, "communication_style": _STR}),
+    "lifestyle": _obj({"hobbies": _STR, "values": _STR, "pain_points": _STR, "home_environment": _STR}),
+    "credibility": _STR,
+})
+
+
+# Product
+# ------------------------------------------------------------------------------
+# What the product looks like, written once by the persona stage (which has
+# the image anyway) so the script stage can run on text alone.
+
+@dataclass
+class ProductVisual:
+    category: str
+    colors: list
+    materials: str
+    shape_and_size: str
+    packaging: str
+    label_text: str
+    distinctive_details: str
+
+    def to_text(self):
+        return "\n".join([
+            f"Category: {self.category}", f"Colors: {', '.join(self.colors)}", f"Materials: {self.materials}",
+            f"Shape & size: {self.shape_and_size}", f"Packaging: {self.packaging}",
+            f"Visible text / branding: {self.label_text}", f"Distinctive details: {self.distinctive_details}",
+        ])
+
+
+PRODUCT_VISUAL_SCHEMA = _obj({
+    "category": _STR, "colors": _STR_LIST, "materials": _STR, "shape_and_size": _STR,
+    "packaging": _STR, "label_text": _STR, "distinctive_details": _STR,
+})
+
+
+@dataclass
+class PersonaWithProduct:
+    persona: PersonaProfile = _nested(PersonaProfile)
+    product: ProductVisual = _nested(ProductVisual)
+
+
+PERSONA_PRODUCT_SCHEMA = _obj({"persona": PERSONA_SCHEMA, "product": PRODUCT_VISUAL_SCHEMA})
+
+
+def parse_persona(output):
+    """
+    (profile, persona_json, product_json) from a persona stage output, with
+    or without the product description; product_json is None without it.
+    """
+    try:
+        data = json.loads(output)
+        if isinstance(data, dict) and "persona" in data:
+            both = _load(PersonaWithProduct, data, "PersonaWithProduct")
+            return both.persona, data["persona"], data["product"]
+        return _load(PersonaProfile, data, "PersonaProfile"), data, None
+    except (ValueError, SchemaError):
+        return None, {"raw": output}, None
+
+
+# Script
+# ------------------------------------------------------------------------------
+
+@dataclass
+class DialogueLine:
+    start: str
+    end: str
+    line: str
+
+
+@dataclass
+class Shot:
+    second: str
+    camera: str
+    action: str
+
+
+@dataclass
+class Technical:
+    orientation: str
+    filming_method: str
+    dominant_hand: str
+    location: str
+    lighting: str
+    audio: str
+
+
+@dataclass
+class AdScript:
+    title: str
+    energy: str
+    dialogue: list = _nested(DialogueLine, many=True)
+    shots: list = _nested(Shot, many=True)
+    technical: Technical = _nested(Technical)
+
+    def to_text(self):
+        lines = [f"SCRIPT: {self.title}", f"The energy: {self.energy}", ""]
+        lines += _take_lines(self.dialogue, self.shots)
+        return "\n".join(lines + [""] + _technical_lines(self.technical))
+
+
+def _take_lines(dialogue, shots):
+    lines = ["Dialogue"] + [f"{d.start}-{d.end}: \"{d.line}\"" for d in dialogue]
+    lines += ["", "Shot-by-Shot Breakdown (One Continuous Take)", "", "Second | Camera / Frame | Action & Details"]
+    return lines + [f"{s.second} | {s.camera} | {s.action}" for s in shots]
+
+
+def _technical_lines(t):
+    return ["Technical Details", f"Orientation: {t.orientation}", f"Filming method: {t.filming_method}",
+            f"Dominant hand: {t.dominant_hand}", f"Location: {t.location}", f"Lighting: {t.lighting}",
+            f"Audio: {t.audio}"]
+
+
+_DIALOGUE = {"type": "array", "items": _obj({"start": _STR, "end": _STR, "line": _STR})}
+_SHOTS = {"type": "array", "items": _obj({"second": _STR, "camera": _STR, "action": _STR})}
+_TECHNICAL = _obj({
+    "orientation": _STR, "filming_method": _STR, "dominant_hand": _STR,
+    "location": _STR, "lighting": _STR, "audio": _STR,
+})
+
+SCRIPT_SCHEMA = _obj({
+    "title": _STR,
+    "energy": _STR,
+    "dialogue": _DIALOGUE,
+    "shots": _SHOTS,
+    "technical": _TECHNICAL,
+})
+
+
+# Long-form script
+# ------------------------------------------------------------------------------
+# Ads longer than one Sora clip are written as scenes of at most one clip
+# each. Every scene is rendered as its own clip and the clips are joined
+# with hard cuts, so a scene is one continuous take like a short script.
+
+@dataclass
+class Scene:
+    dialogue: list = _nested(DialogueLine, many=True)
+    shots: list = _nested(Shot, many=True)
+
+
+@dataclass
+class LongAdScript:
+    title: str
+    energy: str
+    scenes: list = _nested(Scene, many=True)
+    technical: Technical = _nested(Technical)
+
+    def to_text(self):
+        lines = [f"SCRIPT: {self.title}", f"The energy: {self.energy}"]
+        for i, scene in enumerate(self.scenes, 1):
+            lines += ["", f"SCENE {i} OF {len(self.scenes)}", ""] + _take_lines(scene.dialogue, scene.shots)
+        return "\n".join(lines + [""] + _technical_lines(self.technical))
+
+    def segment_prompts(self):
+        """One Sora prompt per scene, each carrying the shared look so the clips cut together."""
+        prompts = []
+        for i, scene in enumerate(self.scenes, 1):
+            lines = [f"SCRIPT: {self.title} (scene {i} of {len(self.scenes)})", f"The energy: {self.energy}", ""]
+            lines += _take_lines(scene.dialogue, scene.shots)
+            lines += ["", *_technical_lines(self.technical), "",
+                      "Continuity: the same creator, outfit, location and lighting as every other scene "
+                      "of this video; the clip starts and ends mid-moment so the cuts feel natural."]
+            prompts.append("\n".join(lines))
+        return prompts
+
+
+LONG_SCRIPT_SCHEMA = _obj({
+    "title": _STR,
+    "energy": _STR,
+    "scenes": {"type": "array", "items": _obj({"dialogue": _DIALOGUE, "shots": _SHOTS})},
+    "technical": _TECHNICAL,
+})
+
+
+# Fused persona + script
+# ------------------------------------------------------------------------------
+
+@dataclass
+class PersonaScript:
+    persona: PersonaProfile = _nested(PersonaProfile)
+    script: AdScript = _nested(AdScript)
+
+
+PERSONA_SCRIPT_SCHEMA = _obj({"persona": PERSONA_SCHEMA, "script": SCRIPT_SCHEMA})
+
+
+@dataclass
+class PersonaProductScript:
+    persona: PersonaProfile = _nested(PersonaProfile)
+    product: ProductVisual = _nested(ProductVisual)
+    script: AdScript = _nested(AdScript)
+
+
+PERSONA_PRODUCT_SCRIPT_SCHEMA = _obj({
+    "persona": PERSONA_SCHEMA, "product": PRODUCT_VISUAL_SCHEMA, "script": SCRIPT_SCHEMA})
+
+
+def parse_persona_script(output):
+    """
+    (fused, data, product_json) from a fused stage output, like
+    parse_persona(); product_json is None without the product description.
+    """
+    try:
+        data = json.loads(output)
+        if isinstance(data, dict) and "product" in data:
+            return _load(PersonaProductScript, data, "PersonaProductScript"), data, data["product"]
+        return _load(PersonaScript, data, "PersonaScript"), data, None
+    except (ValueError, SchemaError):
+        return None, {"raw": output}, None
+
+
+def text_format(name, schema):
+    """The Responses API `text.format` for a strict JSON schema."""
+    return {"type": "json_schema", "name": name, "schema": schema, "strict": True}
+
+
+def parse(cls, output):
+    """
+    Decode a structured output once into cls. Returns (model, dict); on
+    invalid JSON or a schema mismatch returns (None, {"raw": output}) so the
+    text is still kept.
+    """
+    try:
+        data = json.loads(output)
+        return _load(cls, data, cls.__name__), data
+    except (ValueError, SchemaError):
+        return None, {"raw": output}
+
+
+def load(cls, data):
+    """Model from a stored JSON column, or None for legacy/raw rows."""
+    if not data or "raw" in data:
+        return None
+    try:
+        return _load(cls, data, cls.__name__)
+    except SchemaError:
+        return None
@@ -1,27 +1,27 @@
-from flask import Flask, request, jsonify, send_from_directory, url_for
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_from_directory, url_for
+from flask.cli import AppGroup
 from flask_cors import CORS
-from openai import OpenAI
+import click
 import time
 import os
 import uuid
 from werkzeug.utils import secure_filename
 import base64, mimetypes
-from PIL import Image
+import hashlib
+import hmac
 import io
-import re
 from threading import Thread, Lock
-import time
 import json
-from celery.result import AsyncResult
-from urllib.parse import urlparse
-
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+import logging
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 
 from flask_login import (
-    UserMixin,
-    login_user,
-    LoginManager,
     login_user,
     logout_user,
     login_required,
@@ -29,94 +29,206 @@ from flask_login import (
 )
 
 
-from extensions import db, migrate   # <-- import from extensions
+from extensions import db, migrate, limiter, login_manager   # <-- import from extensions
+import batches
+import blobs
+import idempotency
+import imaging
+import locks
+import metrics
+import openai_files
+import persona_index
+import policy
+import previews
+import schemas
+import speculative
+import storage
+import zipstream
+from metrics import span, upstream
+from models import User, Persona, Script, Video, VideoSegment, Image, Project, Project_images, Batch, gen_id
+
+log = logging.getLogger(__name__)
 
 JOBS = {}  # job_id -> {"status": "queued|processing|completed|failed", "video_url": None, "message": "", "script": "", "error": None}
 JOBS_LOCK = Lock()
 
-app = Flask(__name__)
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "secret-key-change-me")
-CORS(app)  # Enable CORS for frontend access
+bp = Blueprint("sora", __name__)
 
-limiter = Limiter(get_remote_address, app=app, default_limits=["60/minute"])
-
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'   # swap to Postgres later
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Configuration
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+VIDEO_FOLDER = os.environ.get('VIDEO_FOLDER', 'videos')
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 
-db.init_app(app)
-migrate.init_app(app, db)
 
+def create_app(config=None, openai_client=None):
+    """
+    Application factory. Nothing here talks to OpenAI or touches the disk:
+    the client is built on first use (see get_client) and the upload/video
+    folders are created on first write.
+    """
+    app = Flask(__name__)
+    app.request_class = blobs.UploadRequest   # uploads are hashed while they are spooled
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "secret-key-change-me")
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')   # swap to Postgres later
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['VIDEO_FOLDER'] = VIDEO_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['PERSONA_REUSE_THRESHOLD'] = float(os.environ.get('PERSONA_REUSE_THRESHOLD', 0.8))
+    app.config['PERSONA_INDEX_MAX_USERS'] = int(os.environ.get('PERSONA_INDEX_MAX_USERS', 500))   # per process
+    app.config['BULK_IMPORT_MAX_BYTES'] = 512 * 1024 * 1024  # whole batch or zip, uncompressed
+    app.config['BULK_IMPORT_MAX_ITEMS'] = 1000
+    app.config['BULK_IMPORT_WORKERS'] = int(os.environ.get('BULK_IMPORT_WORKERS', os.cpu_count() or 2))
+    # Signed job-completion webhooks; when set, status polling becomes a slow fallback
+    app.config['OPENAI_WEBHOOK_SECRET'] = os.environ.get('OPENAI_WEBHOOK_SECRET')
+    app.config['STATUS_POLL_INTERVAL'] = float(os.environ.get(
+        'STATUS_POLL_INTERVAL', '30' if app.config['OPENAI_WEBHOOK_SECRET'] else '0'))
+    # With worker.py deployed, set INLINE_DOWNLOADS=0 so web requests never fetch videos
+    app.config['INLINE_DOWNLOADS'] = os.environ.get('INLINE_DOWNLOADS', '1').lower() not in ('0', 'false', 'no')
+    app.config['DOWNLOAD_LEASE_SECONDS'] = int(os.environ.get('DOWNLOAD_LEASE_SECONDS', 300))
+    # Personas also describe the product, and scripts are written from that text instead of the image
+    app.config['TEXT_ONLY_SCRIPTS'] = os.environ.get('TEXT_ONLY_SCRIPTS', '1').lower() not in ('0', 'false', 'no')
+    if config:
+        app.config.update(config)
+
+    CORS(app)  # Enable CORS for frontend access
+    limiter.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    metrics.init_app(app)
+    locks.init_app(app)
+    idempotency.init_app(app)
+    policy.init_app(app)
+    speculative.init_app(app)
+    openai_files.init_app(app)
+    previews.init_app(app)
+    storage.init_app(app)
+    batches.init_app(app)
+    app.cli.add_command(batch_cli)
+    app.register_blueprint(bp)
+
+    if openai_client is not None:
+        app.extensions["openai_client"] = openai_client
+    return app
+
+
+_CLIENT_LOCK = Lock()
+
+def get_client():
+    """Return the app's OpenAI client, constructing it on first use."""
+    client = current_app.extensions.get("openai_client")
+    if client is None:
+        with _CLIENT_LOCK:
+            client = current_app.extensions.get("openai_client")
+            if client is None:
+                api_key = os.getenv('OPENAI_API_KEY')
+                if not api_key:
+                    raise ValueError("Please set the OPENAI_API_KEY environment variable")
+                from openai import OpenAI   # heavy import, deferred until the first upstream call
+                client = current_app.extensions["openai_client"] = OpenAI(api_key=api_key)
+    return client
+
+
+_POOL_LOCK = Lock()
+
+def get_import_pool():
+    """The app's process pool for bulk image imports, started on first use."""
+    pool = current_app.extensions.get("import_pool")
+    if pool is None:
+        with _POOL_LOCK:
+            pool = current_app.extensions.get("import_pool")
+            if pool is None:
+                # spawn: forking a threaded server can copy held locks into the children
+                pool = current_app.extensions["import_pool"] = ProcessPoolExecutor(
+                    max_workers=current_app.config['BULK_IMPORT_WORKERS'],
+                    mp_context=multiprocessing.get_context("spawn"))
+    return pool
+
+
+def folder(key):
+    """Path of a configured storage folder, created on first use."""
+    path = current_app.config[key]
+    os.makedirs(path, exist_ok=True)
+    return path
 
-login_manager = LoginManager()
-login_manager.init_app(app)
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(user_id)
 
 
-from models import User, Persona, Script, Video, Image, Project, Project_images  # noqa: E402,F4
-
-
-# Configuration
-UPLOAD_FOLDER = 'uploads'
-VIDEO_FOLDER = 'videos'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
-
-# Create necessary directories
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(VIDEO_FOLDER, exist_ok=True)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['VIDEO_FOLDER'] = VIDEO_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+def _job_state_samples():
+    samples = []
+    for kind, model in (("persona", Persona), ("script", Script), ("video", Video), ("segment", VideoSegment)):
+        rows = db.session.query(model.status, db.func.count()).group_by(model.status).all()
+        samples.extend(((kind, status), count) for status, count in rows)
+    return samples
 
-# Initialize OpenAI client
-api_key = os.getenv('OPENAI_API_KEY')
-if not api_key:
-    raise ValueError("Please set the OPENAI_API_KEY environment variable")
-client = OpenAI(api_key=api_key)
+metrics.add_gauge("ugc_jobs", "Jobs by kind and status.", ("kind", "status"), _job_state_samples)
 
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def image_path_to_data_url(image_path: str) -> str:
-    # Convert unsupported input (like WEBP) to JPEG for GPT-5
-    mime = mimetypes.guess_type(image_path)[0] or "image/jpeg"
-    if mime == "image/webp":
-        img = Image.open(image_path).convert("RGB")
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=90)
-        buf.seek(0)
-        raw = buf.read()
-        mime = "image/jpeg"
-    else:
-        with open(image_path, "rb") as f:
-            raw = f.read()
-    b64 = base64.b64encode(raw).decode("utf-8")
+    with span("image_encode"):
+        # Convert unsupported input (like WEBP) to JPEG for GPT-5
+        mime = mimetypes.guess_type(image_path)[0] or "image/jpeg"
+        if mime == "image/webp":
+            from PIL import Image as PILImage   # only needed when transcoding
+            img = PILImage.open(image_path).convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=90)
+            buf.seek(0)
+            raw = buf.read()
+            mime = "image/jpeg"
+        else:
+            with open(image_path, "rb") as f:
+                raw = f.read()
+        b64 = base64.b64encode(raw).decode("utf-8")
     return f"data:{mime};base64,{b64}"
 
 
 
+def _run_in_app_context(app, fn, *args):
+    with app.app_context():
+        fn(*args)
+
 def _update_job(job_id, **kwargs):
     with JOBS_LOCK:
         if job_id in JOBS:
             JOBS[job_id].update(kwargs)
 
 #  -----------------------------------------------------------------------------
-@app.route('/uploads/<filename>')
+@bp.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Blobs are named by their content hash, so they never change
+    max_age = 365 * 24 * 3600 if filename.startswith(("blobs/", "thumbs/")) else None
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, max_age=max_age)
+
+def _image_json(img, status=201, duplicate=False):
+    return jsonify({
+        'success': True,
+        'image_id': img.id,
+        'url': img.url,
+        'duplicate': duplicate
+    }), status
 
 @limiter.limit("30/minute")
-@app.route('/api/save-img', methods=['POST'])
+@bp.route('/api/save-img', methods=['POST'])
 @login_required
 def save_img():
     try:
         if 'image' not in request.files:
+            # Clients may send just the sha256 first and skip re-uploading known bytes
+            digest = request.form.get('sha256', '').lower()
+            if digest:
+                existing = Image.query.filter_by(user_id=current_user.id, sha256=digest).first()
+                if existing:
+                    return _image_json(existing, 200, duplicate=True)
+                return jsonify({'success': False, 'error': 'Unknown image hash, upload the file'}), 404
             return jsonify({'error': 'No image file provided'}), 400
-        print("received image file")
 
         image_file = request.files['image']
         
@@ -126,40 +238,49 @@ def save_img():
         if not allowed_file(image_file.filename):
             return jsonify({'error': 'Invalid file type. Allowed types: png, jpg, jpeg, webp'}), 400
         
-        # print("valid file types")
 
-        filename = secure_filename(image_file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        image_file.save(image_path)
-        
-        # print("saved image")
-        
-        # image_data_url= image_path_to_data_url(image_path)
-        public_url = url_for('serve_upload', filename=unique_filename, _external=True)
+        # The body was hashed while it was spooled; check the header without decoding
+        spool = blobs.spool_from(image_file.stream, folder('UPLOAD_FOLDER'))
+        ext = blobs.sniff_image_type(spool.head)
+        if ext is None:
+            return jsonify({'error': 'File is not a valid PNG, JPEG or WEBP image'}), 400
+        digest = spool.hash.hexdigest()
+
+        # Same bytes from the same user: hand back the existing image
+        existing = Image.query.filter_by(user_id=current_user.id, sha256=digest).first()
+        if existing:
+            spool.discard()
+            return _image_json(existing, 200, duplicate=True)
+
+        with span("disk_write"):
+            image_path, name = blobs.store(spool, folder('UPLOAD_FOLDER'), ext)
+        public_url = url_for('.serve_upload', filename=name, _external=True)
         
         # Create DB row
         img = Image(
             user_id = current_user.id,
             url = public_url,
-            path = image_path
+            path = image_path,
+            sha256 = digest,
+            size = spool.size
         )
         
         try:
             db.session.add(img)
-            db.session.commit()
+            with span("db_commit"):
+                db.session.commit()
+        except IntegrityError:
+            # A concurrent upload of the same bytes won the insert
+            db.session.rollback()
+            existing = Image.query.filter_by(user_id=current_user.id, sha256=digest).first_or_404()
+            return _image_json(existing, 200, duplicate=True)
         except Exception as e:
             db.session.rollback()
-            # Clean up the file if you want
-            # os.remove(image_path)
+            # The blob may be shared with other rows, so it stays on disk
             return jsonify({'error': str(e)}), 500
 
         # Return the handle you’ll reuse later
-        return jsonify({
-            'success': True,
-            'image_id': img.id,
-            'url': img.url
-        }), 201
+        return _image_json(img)
         
 
     except Exception as e:
@@ -168,17 +289,15 @@ def save_img():
             'error': str(e)
         }), 500
 
-@app.route('/api/add-project-img', methods=['POST'])
+@bp.route('/api/add-project-img', methods=['POST'])
 @login_required        
 def add_img_to_project():
     try:
         if 'image_id' not in request.form:
             return jsonify({'error': 'No image_id provided'}), 400
-        print("received image_id")
         
         if 'project_id' not in request.form:
             return jsonify({'error': 'No project_id provided'}), 400
-        print("received project_id")
         
         image_id = request.form['image_id']
         project_id = request.form['project_id']
@@ -188,7 +307,8 @@ def add_img_to_project():
             image_id = image_id
         )
         db.session.add(project_image_row)
-        db.session.commit()  # get project_image_row.id
+        with span("db_commit"):
+            db.session.commit()  # get project_image_row.id
         
         return jsonify({
             "success": True,
@@ -202,17 +322,173 @@ def add_img_to_project():
             'error': str(e)
         }), 500
         
-@app.route('/api/project', methods=['POST'])
+def _bulk_sources(upload_root):
+    """
+    Yield (filename, spool or None, error) for every image in the request:
+    the `images` multipart files and the members of any `archive` zip.
+    """
+    for image_file in request.files.getlist('images'):
+        yield image_file.filename, blobs.spool_from(image_file.stream, upload_root), None
+
+    budget = current_app.config['BULK_IMPORT_MAX_BYTES']
+    for archive in request.files.getlist('archive'):
+        with zipfile.ZipFile(archive.stream) as zf:
+            for info in zf.infolist():
+                name = info.filename
+                if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('.'):
+                    continue
+                # Sizes come from the zip directory, so check them before inflating anything
+                if info.file_size > current_app.config['MAX_CONTENT_LENGTH']:
+                    yield name, None, 'File too large'
+                    continue
+                budget -= info.file_size
+                if budget < 0:
+                    yield name, None, 'Archive exceeds the bulk import size limit'
+                    continue
+                with zf.open(info) as member:
+                    yield name, blobs.spool_from(member, upload_root), None
+
+@limiter.limit("5/minute")
+@bp.route('/api/bulk-import', methods=['POST'])
+@login_required
+def bulk_import():
+    """
+    Import many images at once, from multipart `images` files and/or a zip
+    `archive`, optionally attaching them all to `project_id`.
+
+    Images are hashed while they are spooled, deduplicated against the
+    user's existing images and the rest of the batch, then decoded,
+    transcoded and thumbnailed in a process pool. All Image and
+    Project_images rows go in with one executemany each, in one transaction.
+    The response has one result per input file, in order.
+    """
+    request.max_content_length = current_app.config['BULK_IMPORT_MAX_BYTES']
+    upload_root = folder('UPLOAD_FOLDER')
+
+    project_id = request.form.get('project_id')
+    if project_id and not Project.query.filter_by(id=project_id, user_id=current_user.id).first():
+        return jsonify({'success': False, 'error': 'Project not found'}), 404
+
+    # 1. Spool and sniff every item
+    results, items = [], []
+    try:
+        with span("form_validation"):
+            for filename, spool, error in _bulk_sources(upload_root):
+                result = {'filename': filename}
+                results.append(result)
+                if len(results) > current_app.config['BULK_IMPORT_MAX_ITEMS']:
+                    return jsonify({'success': False, 'error': 'Too many images in one import'}), 400
+                ext = blobs.sniff_image_type(spool.head) if spool else None
+                if error or not allowed_file(filename) or ext is None:
+                    result.update(status='error', error=error or 'Not a PNG, JPEG or WEBP image')
+                    if spool:
+                        spool.discard()
+                    continue
+                spool.file.flush()
+                items.append((result, spool, ext))
+    except zipfile.BadZipFile:
+        return jsonify({'success': False, 'error': 'Invalid zip archive'}), 400
+    if not results:
+        return jsonify({'success': False, 'error': 'No images provided'}), 400
+
+    # 2. Drop what the user already has, or what appears earlier in the batch
+    digests = {spool.hash.hexdigest() for _, spool, _ in items}
+    known = {img.sha256: img for img in
+             Image.query.filter(Image.user_id == current_user.id, Image.sha256.in_(digests))}
+    todo, first_seen = [], {}
+    for result, spool, ext in items:
+        digest = spool.hash.hexdigest()
+        if digest in known or digest in first_seen:
+            result.update(status='duplicate', sha256=digest)
+            spool.discard()
+        else:
+            first_seen[digest] = result
+            todo.append((result, spool, ext))
+
+    # 3. Decode, transcode and thumbnail; small batches aren't worth the IPC
+    args = ([spool.path for _, spool, _ in todo], [spool.hash.hexdigest() for _, spool, _ in todo],
+            [ext for _, _, ext in todo], repeat(upload_root))
+    with span("image_process"):
+        if len(todo) > 2 and current_app.config['BULK_IMPORT_WORKERS'] > 1:
+            processed = list(get_import_pool().map(imaging.process_image, *args, chunksize=4))
+        else:
+            processed = list(map(imaging.process_image, *args))
+
+    # Transcoding changes the hash, so those can still turn out to be duplicates
+    transcoded = {out['sha256'] for out in processed if out['ok']} - digests
+    if transcoded:
+        known.update((img.sha256, img) for img in
+                     Image.query.filter(Image.user_id == current_user.id, Image.sha256.in_(transcoded)))
+
+    # 4. One transaction, one executemany per table
+    now = datetime.utcnow()
+    rows = []
+    for (result, _, _), out in zip(todo, processed):
+        if not out['ok']:
+            result.update(status='error', error=out['error'])
+        elif out['sha256'] in known or out['sha256'] in first_seen and first_seen[out['sha256']] is not result:
+            result.update(status='duplicate', sha256=out['sha256'])
+        else:
+            first_seen[out['sha256']] = result
+            row = {
+                'id': gen_id(),
+                'user_id': current_user.id,
+                'url': url_for('.serve_upload', filename=out['name'], _external=True),
+                'path': out['path'],
+                'thumb_url': url_for('.serve_upload', filename=out['thumb_name'], _external=True),
+                'sha256': out['sha256'],
+                'size': out['size'],
+                'created_at': now,
+            }
+            rows.append(row)
+            result.update(status='imported', image_id=row['id'], url=row['url'],
+                          thumb_url=row['thumb_url'], sha256=out['sha256'])
+
+    for result in results:
+        if result.get('status') == 'duplicate':
+            img = known.get(result['sha256'])
+            if img is None:
+                img_result = first_seen[result['sha256']]
+                result.update(image_id=img_result.get('image_id'), url=img_result.get('url'),
+                              thumb_url=img_result.get('thumb_url'))
+            else:
+                result.update(image_id=img.id, url=img.url, thumb_url=img.thumb_url)
+
+    try:
+        if rows:
+            db.session.execute(insert(Image), rows)
+        if project_id:
+            image_ids = {r['image_id'] for r in results if r.get('image_id')}
+            linked = {link.image_id for link in Project_images.query.filter(
+                Project_images.project_id == project_id, Project_images.image_id.in_(image_ids))}
+            links = [{'project_id': project_id, 'image_id': i} for i in sorted(image_ids - linked)]
+            if links:
+                db.session.execute(insert(Project_images), links)
+        with span("db_commit"):
+            db.session.commit()
+    except IntegrityError:
+        # A concurrent upload inserted one of the same images first
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'Conflicting concurrent import, retry'}), 409
+
+    counts = {status: sum(r.get('status') == status for r in results)
+              for status in ('imported', 'duplicate', 'error')}
+    return jsonify({
+        'success': True,
+        'project_id': project_id,
+        **counts,
+        'results': results
+    }), 201
+
+@bp.route('/api/project', methods=['POST'])
 @login_required
 def project():
     try:
         if 'name' not in request.form:
             return jsonify({'error': 'No project name provided'}), 400
-        print("received project name")
         
         if 'description' not in request.form:
             return jsonify({'error': 'No product description provided'}), 400
-        print("received description")
         
         name = request.form['name']
         description = request.form['description']
@@ -224,7 +500,8 @@ def project():
         )
         
         db.session.add(project_row)
-        db.session.commit()  # get project_row.id
+        with span("db_commit"):
+            db.session.commit()  # get project_row.id
         
         return jsonify({
             "success": True,
@@ -238,53 +515,169 @@ def project():
             'success': False,
             'error': str(e)
         }), 500
+
+def _file_entry(name, path):
+    try:
+        return zipstream.Entry(name, path=path)
+    except (FileNotFoundError, TypeError):
+        return None   # evicted, or never written
+
+def _export_archive(project_row):
+    """A project's images, finished videos and a manifest.json describing them, as a StoredZip."""
+    personas = Persona.query.filter_by(project_id=project_row.id).order_by(Persona.created_at, Persona.id).all()
+    scripts = (Script.query
+               .filter(Script.project_id == project_row.id,
+                       db.or_(Script.speculative.is_(False), Script.claimed_at.isnot(None)))   # not unclaimed guesses
+               .order_by(Script.created_at, Script.id).all())
+    videos = Video.query.filter_by(project_id=project_row.id).order_by(Video.created_at, Video.id).all()
+    image_ids = ({p.image_id for p in personas}
+                 | {link.image_id for link in Project_images.query.filter_by(project_id=project_row.id)})
+
+    entries, names = [], {}
+    for img in Image.query.filter(Image.id.in_(image_ids)).order_by(Image.id):
+        entry = _file_entry(f"images/{img.id}{os.path.splitext(img.path)[1]}", img.path)
+        if entry is not None:
+            entries.append(entry)
+            names[img.id] = entry.name.decode()
+    for v in videos:
+        entry = _file_entry(f"videos/{v.id}.mp4", v.file_path) if v.status == "completed" else None
+        if entry is not None:
+            entries.append(entry)
+            names[v.id] = entry.name.decode()
+
+    manifest = {
+        "project": {"id": project_row.id, "name": project_row.name, "description": project_row.description,
+                    "created_at": project_row.created_at},
+        "personas": [{"id": p.id, "status": p.status, "product_name": p.product_name, "description": p.description,
+                      "person_description": p.person_description, "image": names.get(p.image_id),
+                      "profile": p.persona_json if p.status == "completed" else None,
+                      "product": p.product_visual if p.status == "completed" else None,
+                      "text": p.persona_txt if p.status == "completed" else None} for p in personas],
+        "scripts": [{"id": s.id, "persona_id": s.persona_id, "tone": s.tone, "status": s.status,
+                     "script": s.script_json if s.status == "completed" else None,
+                     "text": s.script_txt if s.status == "completed" else None} for s in scripts],
+        "videos": [{"id": v.id, "script_id": v.script_id, "status": v.status, "file": names.get(v.id),
+                    "created_at": v.created_at, "completed_at": v.completed_at} for v in videos],
+    }
+    data = json.dumps(manifest, indent=2, sort_keys=True, default=str).encode()
+    created = (project_row.created_at - datetime(1970, 1, 1)).total_seconds()
+    return zipstream.StoredZip([zipstream.Entry("manifest.json", data=data, mtime=created)] + entries)
+
+@limiter.limit("10/minute")
+@bp.route('/api/project/<project_id>/export', methods=['GET'])
+@login_required
+def export_project(project_id):
+    """
+    Download a project as one ZIP (manifest.json, images/, videos/), streamed
+    from the files as it goes out. Range requests resume an interrupted
+    download; If-Range with the ETag restarts it if the project changed.
+    """
+    project_row = Project.query.filter_by(id=project_id, user_id=current_user.id).first()
+    if project_row is None:
+        return jsonify({'success': False, 'error': 'Project not found'}), 404
+
+    archive = _export_archive(project_row)
+    etag = archive.etag
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Content-Disposition": f'attachment; filename="{secure_filename(project_row.name) or "project"}.zip"',
+    }
+    start, stop, status = 0, archive.size, 200
+    # A Range is honoured for one range of this exact archive; otherwise the whole thing is sent
+    if (request.range is not None and len(request.range.ranges) == 1
+            and request.if_range.date is None and request.if_range.etag in (None, etag)):
+        byte_range = request.range.range_for_length(archive.size)
+        if byte_range is None:
+            return Response(status=416, headers={"Content-Range": f"bytes */{archive.size}"})
+        start, stop = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{archive.size}"
+    headers["Content-Length"] = str(stop - start)
+    return Response(archive.stream(start, stop), status=status, headers=headers,
+                    mimetype="application/zip", direct_passthrough=True)
         
 @limiter.limit("10/minute")
-@app.route('/api/persona', methods=['POST'])
+@bp.route('/api/persona', methods=['POST'])
 @login_required
+@idempotency.idempotent
 def persona(): 
     try: 
         # data = request.form if request.form else request.get_json(force=True, silent=True) or {}
 
-        if 'description' not in request.form:
-            return jsonify({'error': 'No product description provided'}), 400
-        print("received description")
-        
-        if 'product_name' not in request.form:
-            return jsonify({'error': 'No product name provided'}), 400
-        print("received product name")
-        
-        if 'person_description' not in request.form:
-            return jsonify({'error': 'No person description provided'}), 400
-        print("received person description")
-        
-        if 'image_id' not in request.form:
-            return jsonify({'error': 'No image_id provided'}), 400
-        print("received image_id")
-        
-        # if 'user_id' not in request.form:
-        #     return jsonify({'error': 'No user_id provided'}), 400
-        # print("received user_id")
-        
-        if 'project_id' not in request.form: # user_id findable through project_id
-            return jsonify({'error': 'No project_id provided'}), 400
-        print("received project_id")
-        
-        # Required fields
-        description = request.form['description']
-        product_name = request.form['product_name']
-        person_desc = request.form['person_description']
-        image_id = request.form["image_id"]
-        # user_id = request.form["user_id"]
-        project_id = request.form["project_id"]
-        
-        if not product_name or not description or not person_desc:
-            return jsonify({'error': 'Product Name, Description, and Person Description are required'}), 400
+        with span("form_validation"):
+            if 'description' not in request.form:
+                return jsonify({'error': 'No product description provided'}), 400
+
+            if 'product_name' not in request.form:
+                return jsonify({'error': 'No product name provided'}), 400
+
+            if 'person_description' not in request.form:
+                return jsonify({'error': 'No person description provided'}), 400
+
+            if 'image_id' not in request.form:
+                return jsonify({'error': 'No image_id provided'}), 400
+
+            # if 'user_id' not in request.form:
+            #     return jsonify({'error': 'No user_id provided'}), 400
+
+            if 'project_id' not in request.form: # user_id findable through project_id
+                return jsonify({'error': 'No project_id provided'}), 400
+
+            # Required fields
+            description = request.form['description']
+            product_name = request.form['product_name']
+            person_desc = request.form['person_description']
+            image_id = request.form["image_id"]
+            # user_id = request.form["user_id"]
+            project_id = request.form["project_id"]
+
+            if not product_name or not description or not person_desc:
+                return jsonify({'error': 'Product Name, Description, and Person Description are required'}), 400
         
         # Resolve image URL: prefer image_id lookup, else accept image_url directly
         img = Image.query.get(image_id)
         if not img:
             return jsonify({'error': 'Image not found'}), 404
+
+        # Fork an existing persona (explicitly, or the closest match with reuse=auto)
+        # instead of paying for another high-effort generation
+        source, similarity = None, None
+        if request.form.get('source_persona_id'):
+            source = _owned_persona(request.form['source_persona_id'])
+            if source is None or source.status != "completed":
+                return jsonify({'error': 'Source persona not found'}), 404
+        elif request.form.get('reuse') == 'auto':
+            hits = persona_index.get_index().search(
+                current_user.id, persona_index.input_text(product_name, description, person_desc), k=1)
+            if hits and hits[0][1] >= current_app.config['PERSONA_REUSE_THRESHOLD']:
+                source, similarity = db.session.get(Persona, hits[0][0]), hits[0][1]
+
+        if source is not None:
+            forked = Persona(
+                product_name = product_name,
+                description  = description,
+                person_description = person_desc,
+                image_id    = image_id,
+                project_id  = project_id,
+                persona_json = source.persona_json,
+                persona_txt = source.persona_txt,
+                product_visual = source.product_visual if source.image_id == image_id else None,
+                source_persona_id = source.id,
+                status       = "completed"
+            )
+            db.session.add(forked)
+            with span("db_commit"):
+                db.session.commit()
+            persona_index.add(forked)
+            return jsonify({
+                "success": True,
+                "persona_id": forked.id,
+                "project_id": forked.project_id,
+                "source_persona_id": source.id,
+                "similarity": similarity,
+                "status": forked.status
+            }), 201
         
         # Quick validation of URL
         # try:
@@ -292,35 +685,58 @@ def persona():
         # except Exception:
         #     return jsonify({'error': 'Invalid image_url'}), 400
         
+        # Batch rows are "pending" from the first commit, so no sweep sees them processing without a job
+        batched = request.form.get('mode') == 'batch'
         persona_row = Persona(
             # user_id      = user_id,
             product_name = product_name,
             description  = description,
+            person_description = person_desc,
             image_id    = image_id,
             project_id  = project_id,
             persona_json = {},                 # will fill when job completes
-            status       = "processing"        # or "queued"
+            status       = "pending" if batched else "processing"   # or "queued"
         )
         db.session.add(persona_row)
-        db.session.commit()  # get persona_row.id
-        
-        prompt = generate_persona_prompt(product_name, description, person_desc)
-        
-        # turn into data URL for OpenAI (works from localhost)
-        print(img.path)
-        image_data_url = image_path_to_data_url(img.path)  # <-- This is the slow part
-        
-        job_id, job_status = enqueue_chatGPT_background(
+        with span("db_commit"):
+            db.session.commit()  # get persona_row.id
+        
+        prompt, schema_name, schema = persona_request(product_name, description, person_desc)
+        
+        inputs = persona_index.input_text(product_name, description, person_desc)
+        if similarity is None:
+            hits = persona_index.get_index().search(current_user.id, inputs, k=1)
+            similarity = hits[0][1] if hits else 0.0
+        decision = policy.choose("persona", input_chars=len(inputs), user=current_user,
+                                 cache_hit=similarity >= policy.CACHE_HIT_SIMILARITY)
+        _record_decision(persona_row, decision)
+
+        if batched:
+            # Sent with the next `flask batch run`, at batch pricing
+            with span("db_commit"):
+                db.session.commit()
+            return jsonify({
+                "success": True,
+                "persona_id": persona_row.id,
+                "project_id": persona_row.project_id,
+                "status": persona_row.status
+            }), 202
+        
+        job_id, job_status = enqueue_for_image(
+            img,
             prompt=prompt,
-            image_url=image_data_url,
-            verbosity="high",
-            effort="high"
+            model=decision.model,
+            verbosity=decision.verbosity,
+            effort=decision.effort,
+            schema_name=schema_name,
+            schema=schema
         )
 
         # Save the OpenAI job id on the Persona
         persona_row.openai_job_id = job_id
         persona_row.status = "queued" if job_status == "queued" else "processing"
-        db.session.commit()
+        with span("db_commit"):
+            db.session.commit()
 
         return jsonify({
             "success": True,
@@ -338,18 +754,69 @@ def persona():
         }), 500
 
         
+def _owned_persona(persona_id):
+    """The persona if it belongs to one of the current user's projects, else None."""
+    return (Persona.query.join(Project, Project.id == Persona.project_id)
+            .filter(Persona.id == persona_id, Project.user_id == current_user.id).first())
+
+@bp.route('/api/persona/similar', methods=['GET'])
+@login_required
+def similar_personas():
+    """
+    Top-k of the user's completed personas closest to the given
+    product_name / description / person_description. Pass a hit's id as
+    source_persona_id to POST /api/persona to fork it instead of generating.
+    """
+    query = persona_index.input_text(request.args.get('product_name'),
+                                     request.args.get('description'),
+                                     request.args.get('person_description'))
+    if not query:
+        return jsonify({'error': 'Provide product_name, description or person_description'}), 400
+    k = min(max(request.args.get('k', 5, type=int), 1), 50)
+
+    with span("persona_search"):
+        hits = persona_index.get_index().search(current_user.id, query, k=k)
+    rows = {p.id: p for p in Persona.query.filter(Persona.id.in_([h[0] for h in hits]))}
+    return jsonify({
+        'success': True,
+        'results': [{
+            'persona_id': pid,
+            'score': round(score, 4),
+            'project_id': rows[pid].project_id,
+            'product_name': rows[pid].product_name,
+            'person_description': rows[pid].person_description,
+            'persona_txt': rows[pid].persona_txt
+        } for pid, score in hits if pid in rows]
+    }), 200
+
+def _persona_status_json(persona):
+    # Only the text and a few profile fields; the full profile stays in persona_json
+    done = persona.status == "completed"
+    profile = schemas.load(schemas.PersonaProfile, persona.persona_json) if done else None
+    return jsonify({
+        "status": persona.status,
+        "persona": persona.persona_txt if done else None,
+        "profile": profile.summary() if profile else None
+    }), 200
+
+def _script_status_json(s):
+    done = s.status == "completed"
+    ad_script = schemas.load(schemas.AdScript, s.script_json) if done else None
+    return jsonify({
+        "status": s.status,
+        "script": s.script_txt if done else None,
+        "dialogue": [d.line for d in ad_script.dialogue] if ad_script else None
+    }), 200
+
 @limiter.limit("60/minute")
-@app.route('/api/persona/<persona_id>/status', methods=['GET'])
+@bp.route('/api/persona/<persona_id>/status', methods=['GET'])
 @login_required
 def persona_status(persona_id):
     persona = Persona.query.get_or_404(persona_id)
 
     # If already done or failed, return immediately from DB
-    if persona.status in ("completed", "failed"):
-        return jsonify({
-            "status": persona.status,
-            "persona": persona.persona_txt
-        }), 200
+    if persona.status in TERMINAL_STATUSES:
+        return _persona_status_json(persona)
 
     # If no job started yet
     if not persona.openai_job_id:
@@ -359,51 +826,134 @@ def persona_status(persona_id):
         }), 200
 
     try:
-        # Poll OpenAI to check if the job has completed
-        resp = client.responses.retrieve(persona.openai_job_id)
-        persona.status = resp.status  # "queued" | "in_progress" | "completed" | "failed"
+        # Poll OpenAI to check if the job has completed (throttled when webhooks are on)
+        if poll_due("persona", persona.id):
+            with upstream(persona.model or "gpt-5", "responses.retrieve"):
+                resp = get_client().responses.retrieve(persona.openai_job_id)
+            apply_persona_response(persona, resp)
 
-        # If it's done, extract the output
-        if resp.status == "completed":
-            output = getattr(resp, "output_text", "").strip()
-            try:
-                persona.persona_json = json.loads(output)
-                persona.persona_txt = json.loads(output).get("raw", "")
-            except Exception:
-                persona.persona_json = {"raw": output}
-                persona.persona_txt = output
-            persona.status = "completed"
+    except Exception as e:
+        # Network/API error — don't crash, just return current DB state
+        log.warning("Error retrieving job %s: %s", persona.openai_job_id, e)
+
+    # Final response to frontend
+    return _persona_status_json(persona)
+
+@limiter.limit("10/minute")
+@bp.route('/api/persona-script', methods=['POST'])
+@login_required
+@idempotency.idempotent
+def persona_script():
+    """
+    Persona and script from one GPT-5 call: takes the /api/persona fields
+    plus tone, creates both rows on the same job and returns both ids. Poll
+    either status endpoint; the script is ready when the persona is.
+    """
+    try:
+        with span("form_validation"):
+            for field in ('description', 'product_name', 'person_description', 'image_id', 'project_id', 'tone'):
+                if field not in request.form:
+                    return jsonify({'error': f'No {field} provided'}), 400
+
+            description = request.form['description']
+            product_name = request.form['product_name']
+            person_desc = request.form['person_description']
+            image_id = request.form['image_id']
+            project_id = request.form['project_id']
+            tone = request.form['tone']
+
+            if not product_name or not description or not person_desc:
+                return jsonify({'error': 'Product Name, Description, and Person Description are required'}), 400
+
+        img = Image.query.get(image_id)
+        if not img:
+            return jsonify({'error': 'Image not found'}), 404
+
+        persona_row = Persona(
+            product_name = product_name,
+            description  = description,
+            person_description = person_desc,
+            image_id    = image_id,
+            project_id  = project_id,
+            persona_json = {},
+            status       = "processing",
+            fused        = True
+        )
+        db.session.add(persona_row)
+        db.session.flush()  # get persona_row.id
+        script_row = Script(
+            persona_id  = persona_row.id,
+            project_id = project_id,
+            tone        = tone,
+            status      = "processing",
+            script_txt = "",
+            fused       = True
+        )
+        db.session.add(script_row)
+        with span("db_commit"):
             db.session.commit()
 
-        elif resp.status == "failed":
-            persona.status = "failed"
+        prompt, schema_name, schema = persona_script_request(product_name, description, person_desc, tone)
+
+        inputs = persona_index.input_text(product_name, description, person_desc)
+        decision = policy.choose("fused", input_chars=len(inputs), user=current_user)
+        _record_decision(persona_row, decision)
+        _record_decision(script_row, decision)
+
+        job_id, job_status = enqueue_for_image(
+            img,
+            prompt=prompt,
+            model=decision.model,
+            verbosity=decision.verbosity,
+            effort=decision.effort,
+            schema_name=schema_name,
+            schema=schema
+        )
+
+        # Both rows carry the job id; the Persona is the one the webhook finds first
+        persona_row.openai_job_id = script_row.openai_job_id = job_id
+        persona_row.status = script_row.status = "queued" if job_status == "queued" else "processing"
+        with span("db_commit"):
             db.session.commit()
 
-    except Exception as e:
-        # Network/API error — don't crash, just return current DB state
-        print(f"Error retrieving job {persona.openai_job_id}: {e}")
+        return jsonify({
+            "success": True,
+            "persona_id": persona_row.id,
+            "script_id": script_row.id,
+            "project_id": persona_row.project_id,
+            "openai_job_id": job_id,
+            "status": persona_row.status
+        }), 202
 
-    # Final response to frontend
-    return jsonify({
-        "status": persona.status,
-        "persona": persona.persona_json if persona.status == "completed" else None
-    }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @limiter.limit("10/minute")
-@app.route('/api/script', methods=['POST'])
+@bp.route('/api/script', methods=['POST'])
 @login_required
+@idempotency.idempotent
 def script(): 
     try: 
-        if 'persona_id' not in request.form:
-            return jsonify({'error': 'No persona_id provided'}), 400
-        print("received persona_id")
-        
-        if 'tone' not in request.form:
-            return jsonify({'error': 'No tone provided'}), 400
-        print("received tone")
-        
-        persona_id = request.form['persona_id']
-        tone = request.form['tone']
+        with span("form_validation"):
+            if 'persona_id' not in request.form:
+                return jsonify({'error': 'No persona_id provided'}), 400
+
+            if 'tone' not in request.form:
+                return jsonify({'error': 'No tone provided'}), 400
+
+            persona_id = request.form['persona_id']
+            tone = request.form['tone']
+
+            # Longer ads are written as scenes of one Sora clip each
+            seconds = request.form.get('seconds', SEGMENT_SECONDS)
+            if not str(seconds).isdigit() or int(seconds) < 1:
+                return jsonify({'error': 'seconds must be a positive integer'}), 400
+            segments = -(-int(seconds) // SEGMENT_SECONDS)
+            if segments > MAX_SEGMENTS:
+                return jsonify({'error': f'seconds must be at most {MAX_SEGMENTS * SEGMENT_SECONDS}'}), 400
         
         persona = Persona.query.get(persona_id)
         if not persona:
@@ -412,29 +962,65 @@ def script():
         img = Image.query.get(persona.image_id)
         if not img:
             return jsonify({'error': 'Image not found'}), 404
-        
+
+        # A script already queued for this persona and tone when the persona completed
+        if speculative.enabled() and segments == 1 and request.form.get('mode') != 'batch':
+            claimed = speculative.claim(persona.id, tone)
+            if claimed is not None:
+                return jsonify({
+                    "success": True,
+                    "script_id": claimed.id,
+                    "openai_job_id": claimed.openai_job_id,
+                    "status": claimed.status,
+                    "speculative": True
+                }), 202
+        
+        # Batch rows are "pending" from the first commit, so no sweep sees them processing without a job
+        batched = request.form.get('mode') == 'batch'
         script_row = Script(
             persona_id  = persona.id,
             project_id = persona.project_id,
             tone        = tone,
-            status      = "processing",        # or "queued"
-            script_txt = ""
+            status      = "pending" if batched else "processing",   # or "queued"
+            script_txt = "",
+            segments    = segments if segments > 1 else None
         )
         db.session.add(script_row)
-        db.session.commit()  # get script_row.id
-        
-        prompt = generate_ad_script_prompt(persona.product_name, persona.description, persona.persona_txt, tone)
-        
-        image_data_url = image_path_to_data_url(img.path)  # <-- This is the slow part
-        
-        job_id, job_status = enqueue_chatGPT_background(
+        with span("db_commit"):
+            db.session.commit()  # get script_row.id
+        
+        prompt = generate_ad_script_prompt(persona.product_name, persona.description, persona.persona_txt, tone,
+                                           scenes=segments)
+        schema_name, schema, _ = script_format(script_row.segments)
+        
+        decision = policy.choose("script", input_chars=len(persona.description or ""), user=current_user)
+        _record_decision(script_row, decision)
+
+        if batched:
+            # Compiled into a batch once its persona has completed
+            with span("db_commit"):
+                db.session.commit()
+            return jsonify({
+                "success": True,
+                "script_id": script_row.id,
+                "status": script_row.status
+            }), 202
+
+        job_id, job_status = enqueue_script(
+            persona,
+            img,
             prompt=prompt,
-            image_url=image_data_url
+            model=decision.model,
+            verbosity=decision.verbosity,
+            effort=decision.effort,
+            schema_name=schema_name,
+            schema=schema
         )
         
         script_row.openai_job_id = job_id
         script_row.status = "queued" if job_status == "queued" else "processing"
-        db.session.commit()
+        with span("db_commit"):
+            db.session.commit()
         
         return jsonify({
             "success": True,
@@ -450,17 +1036,14 @@ def script():
         }), 500
      
 @limiter.limit("60/minute")   
-@app.route('/api/script/<script_id>/status', methods=['GET'])
+@bp.route('/api/script/<script_id>/status', methods=['GET'])
 @login_required
 def script_status(script_id):
     s = Script.query.get_or_404(script_id)
 
     # If already done or failed, return immediately from DB
-    if s.status in ("completed", "failed"):
-        return jsonify({
-            "status": s.status,
-            "script": s.script_txt
-        }), 200
+    if s.status in TERMINAL_STATUSES:
+        return _script_status_json(s)
 
     # If no job started yet
     if not s.openai_job_id:
@@ -470,50 +1053,39 @@ def script_status(script_id):
         }), 200
 
     try:
-        # Poll OpenAI to check if the job has completed
-        resp = client.responses.retrieve(s.openai_job_id)
-        s.status = resp.status  # "queued" | "in_progress" | "completed" | "failed"
-
-        # If it's done, extract the output
-        if resp.status == "completed":
-            output = getattr(resp, "output_text", "").strip()
-            try:
-                s.script_json = json.loads(output)
-                s.script_txt = json.loads(output).get("raw", "")
-            except Exception:
-                s.script_json = {"raw": output}
-                s.script_txt = output
-            s.status = "completed"
-            db.session.commit()
-
-        elif resp.status == "failed":
-            s.status = "failed"
-            db.session.commit()
+        # Poll OpenAI to check if the job has completed (throttled when webhooks are on)
+        if poll_due("script", s.id):
+            with upstream(s.model or "gpt-5", "responses.retrieve"):
+                resp = get_client().responses.retrieve(s.openai_job_id)
+            apply_script_response(s, resp)
 
     except Exception as e:
         # Network/API error — don't crash, just return current DB state
-        print(f"Error retrieving job {s.openai_job_id}: {e}")
+        log.warning("Error retrieving job %s: %s", s.openai_job_id, e)
 
     # Final response to frontend
-    return jsonify({
-        "status": s.status,
-        "script": s.script_json if s.status == "completed" else None
-    }), 200
+    return _script_status_json(s)
 
 @limiter.limit("10/minute")
-@app.route('/api/video', methods=['POST'])
+@bp.route('/api/video', methods=['POST'])
 @login_required
+@idempotency.idempotent
 def video(): 
     try:
-        if 'script_id' not in request.form:
-            return jsonify({'error': 'No script_id provided'}), 400
-        
-        script_id = request.form['script_id']
+        with span("form_validation"):
+            if 'script_id' not in request.form:
+                return jsonify({'error': 'No script_id provided'}), 400
+
+            script_id = request.form['script_id']
         
         script = Script.query.get(script_id)
 
         p = Persona.query.get_or_404(script.persona_id)
         img = Image.query.get(p.image_id)
+
+        long_script = schemas.load(schemas.LongAdScript, script.script_json) if script.segments else None
+        if long_script is not None and long_script.scenes and not previews.ffmpeg():
+            return jsonify({'success': False, 'error': 'Long-form videos need ffmpeg to stitch their segments'}), 400
         
         video_row = Video(
             script_id = script.id,
@@ -521,7 +1093,17 @@ def video():
             project_id = script.project_id
         )
         db.session.add(video_row)
-        db.session.commit()  # get video_row.id
+        with span("db_commit"):
+            db.session.commit()  # get video_row.id
+
+        if long_script is not None and long_script.scenes:
+            submit_segments(video_row, long_script.segment_prompts()[:MAX_SEGMENTS], img.path)
+            return jsonify({
+                "success": True,
+                "video_id": video_row.id,
+                "segments": video_row.segments,
+                "status": video_row.status
+            }), 202
         
         prompt = script.script_txt
         
@@ -529,7 +1111,8 @@ def video():
         
         video_row.openai_job_id = job_id
         video_row.status = "queued" if job_status == "queued" else "processing"
-        db.session.commit()
+        with span("db_commit"):
+            db.session.commit()
         
         return jsonify({
             "success": True,
@@ -545,100 +1128,141 @@ def video():
         }), 500
         
 @limiter.limit("60/minute")       
-@app.route('/api/video/<video_id>/status', methods=['GET'])
+@bp.route('/api/video/<video_id>/status', methods=['GET'])
 @login_required
 def video_status(video_id):
     
     v = Video.query.get_or_404(video_id)
     
-       # If already done or failed, return immediately from DB
-    if v.status in ("completed", "failed"):
+       # If already done, failed or expired, return immediately from DB
+    if v.status in TERMINAL_STATUSES:
         return jsonify({
             "status": v.status,
-            "video_url": v.video_url
+            "video_url": v.video_url,
+            "poster_url": v.poster_url,
+            "preview_url": v.preview_url
         }), 200
 
     # If no job started yet
-    if not v.openai_job_id:
+    if not v.openai_job_id and not v.segments:
         return jsonify({
             "status": v.status,
             "message": "No OpenAI job assigned yet."
         }), 200
         
-    try:
-        # Poll OpenAI to check if the job has completed
-        print(v.openai_job_id)
-        resp = client.videos.retrieve(v.openai_job_id)
-        v.status = resp.status  # "queued" | "in_progress" | "completed" | "failed"
-
-        
-        # If it's done, extract the output
-        if resp.status == "completed":
-            content = client.videos.download_content(v.openai_job_id)
-            
-            if hasattr(content, "read") and callable(content.read):
-                try:
-                    raw = content.read()
-                except TypeError:
-                    raw = content.read
-            elif hasattr(content, "content"):
-                raw = content.content
-            elif isinstance(content, (bytes, bytearray)):
-                raw = content
-            else:
-                raw = bytes(content)
-            
-            video_filename = f"{uuid.uuid4()}.mp4"
-            video_path = os.path.join(app.config['VIDEO_FOLDER'], video_filename)
-            with open(video_path, 'wb') as f:
-                f.write(raw)
-                
-            video_url = url_for('serve_video', filename=video_filename, _external=True)
-            
-            v.file_path = video_path
-            v.video_url = video_url
-            v.status = "completed"
-            db.session.commit()
+    # Another request, a webhook delivery or a worker is already downloading it
+    if v.status == "downloading" and lease_live(v):
+        return jsonify({
+            "status": v.status,
+            "video_url": None
+        }), 200
 
-        elif resp.status == "failed":
-            v.status = "failed"
-            db.session.commit()
+    try:
+        # Poll OpenAI to check if the job has completed (throttled when webhooks are on)
+        if v.segments:
+            refresh_segments(v)
+        elif poll_due("video", v.id):
+            with upstream("sora-2", "videos.retrieve"):
+                resp = get_client().videos.retrieve(v.openai_job_id)
+            apply_video_response(v, resp)
 
     except Exception as e:
         # Network/API error — don't crash, just return current DB state
-        print(f"Error retrieving job {v.openai_job_id}: {e}")
+        log.warning("Error retrieving job %s: %s", v.openai_job_id, e)
         
     # Final response to frontend
-    return jsonify({
+    body = {
         "status": v.status,
-        "video_url": video_url if v.status == "completed" else None
-    }), 200
+        "video_url": v.video_url if v.status == "completed" else None
+    }
+    if v.segments:
+        body["segments"] = v.segments
+        body["segments_completed"] = sum(1 for part in v.parts if part.status == "completed")
+    return jsonify(body), 200
     
 
-def enqueue_chatGPT_background(prompt: str, image_url: str, verbosity="medium", effort="medium"):
+def enqueue_chatGPT_background(prompt: str, image_url: str, verbosity="medium", effort="medium",
+                               schema_name=None, schema=None, model="gpt-5", file_id=None):
     """
     Runs a GPT-5 Vision request in background mode and returns (job_id, status).
+    The image is either image_url (a data URL) or an uploaded file_id.
+    With a schema the output is constrained to that JSON schema (structured outputs).
     """
-    resp = client.responses.create(
-        model="gpt-5",
-        input=[{
+    body = response_body(prompt, image_url, verbosity, effort, schema_name, schema, model, file_id)
+    with upstream(model, "responses.create"):
+        resp = get_client().responses.create(
+            **body,
+            background=True,
+            store=True
+        )
+    return resp.id, getattr(resp, "status", "queued")
+
+def response_body(prompt, image_url, verbosity="medium", effort="medium",
+                  schema_name=None, schema=None, model="gpt-5", file_id=None):
+    """The responses.create arguments shared by background jobs and batch lines; text only without an image."""
+    content = []
+    if file_id:
+        content.append({"type": "input_image", "detail": "auto", "file_id": file_id})
+    elif image_url:
+        content.append({"type": "input_image", "detail": "auto", "image_url": image_url})
+    content.append({"type": "input_text",  "text": prompt})
+    text = {"verbosity": verbosity}
+    if schema is not None:
+        text["format"] = schemas.text_format(schema_name, schema)
+    return {
+        "model": model,
+        "input": [{
             "role": "user",
-            "content": [
-                {"type": "input_image", "image_url": image_url, "detail": "auto"},
-                {"type": "input_text",  "text": prompt}
-            ]
+            "content": content
         }],
-        text={"verbosity": verbosity},
-        reasoning={"effort": effort},
-        background=True,
-        store=True
-    )
-    return resp.id, getattr(resp, "status", "queued")
+        "text": text,
+        "reasoning": {"effort": effort},
+    }
 
-def enqueue_sora_background(prompt, image_path):
+def enqueue_for_image(img, prompt, **kwargs):
+    """
+    enqueue_chatGPT_background for an Image row: sent by Files API id when
+    one is available, else (or if the API rejects the id) as a data URL.
+    """
+    file_id = openai_files.file_id_for(img, get_client())
+    if file_id:
+        try:
+            return enqueue_chatGPT_background(prompt, None, file_id=file_id, **kwargs)
+        except Exception as e:
+            if getattr(e, "status_code", None) not in (400, 404):
+                raise
+            log.warning("File %s rejected for image %s, sending it inline: %s", file_id, img.id, e)
+            openai_files.forget(img)
+    # turn into data URL for OpenAI (works from localhost)
+    image_data_url = image_path_to_data_url(img.path)  # <-- This is the slow part
+    return enqueue_chatGPT_background(prompt, image_data_url, **kwargs)
+
+def product_visual_for(persona):
+    """The persona's description of the product, or None to send the image (disabled, legacy or raw rows)."""
+    if not current_app.config.get("TEXT_ONLY_SCRIPTS", True):
+        return None
+    return schemas.load(schemas.ProductVisual, persona.product_visual)
+
+def product_visual_prompt(visual):
+    return ("\n\nTHE PRODUCT AS IT LOOKS\n"
+            "The product photo is not attached; this is what it shows. Stay consistent with it.\n\n"
+            + visual.to_text())
+
+def enqueue_script(persona, img, prompt, **kwargs):
+    """
+    Start a script job. With the persona's product description it runs on
+    text alone, without sending the image again; otherwise it is sent with
+    the image like the persona was.
+    """
+    visual = product_visual_for(persona)
+    if visual is None:
+        return enqueue_for_image(img, prompt, **kwargs)
+    return enqueue_chatGPT_background(prompt + product_visual_prompt(visual), None, **kwargs)
+
+def enqueue_sora_background(prompt, image_path, client=None):
     
-    with open(image_path, 'rb') as image_file:
-        response = client.videos.create(
+    with open(image_path, 'rb') as image_file, upstream("sora-2", "videos.create"):
+        response = (client or get_client()).videos.create(
             model="sora-2",
             prompt=prompt,
             input_reference=image_file,
@@ -649,10 +1273,879 @@ def enqueue_sora_background(prompt, image_path):
         )
     return response.id, getattr(response, "status", "queued")
 
+# Job completion
+# ------------------------------------------------------------------------------
+# Shared by the status endpoints (polling) and the webhook receiver so both
+# apply an upstream result the same way. Rows already in a terminal state are
+# left alone, which makes repeated polls and webhook deliveries harmless.
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")   # expired: file evicted by storage
+# Waiting on an upstream job; an IN list can use the status indexes. "incomplete" is
+# only there to close out rows stored before upstream_status() mapped it to "failed"
+ACTIVE_STATUSES = ("queued", "processing", "in_progress", "incomplete")
+# incomplete: a response cut short (token limit, content filter); cancelled: not by us, or the row would be too
+UPSTREAM_FAILED = ("failed", "incomplete", "cancelled")
+
+_LAST_POLL = {}   # (kind, row id) -> time.monotonic() of the last upstream retrieve
+_LAST_POLL_LOCK = Lock()
+
+def poll_due(kind, row_id, interval=None):
+    """
+    Whether a status request may hit OpenAI for this row. With webhooks
+    configured, STATUS_POLL_INTERVAL turns polling into a slow fallback.
+    """
+    if interval is None:
+        interval = current_app.config.get("STATUS_POLL_INTERVAL", 0)
+    if not interval:
+        return True
+    now = time.monotonic()
+    with _LAST_POLL_LOCK:
+        if now - _LAST_POLL.get((kind, row_id), float("-inf")) < interval:
+            return False
+        if len(_LAST_POLL) > 100000:
+            _LAST_POLL.clear()
+        _LAST_POLL[(kind, row_id)] = now
+    return True
+
+def upstream_status(resp):
+    """A Responses API status as stored on a row: one that can't complete any more is "failed"."""
+    return "failed" if resp.status in UPSTREAM_FAILED else resp.status
+
+def _record_decision(row, decision):
+    """Store the policy's choice on a Persona/Script for later analysis."""
+    row.model = decision.model
+    row.reasoning_effort = decision.effort
+    row.verbosity = decision.verbosity
+    row.policy_reason = decision.reason
+
+def apply_persona_response(persona, resp):
+    if persona.fused:
+        return apply_fused_response(persona, Script.query.filter_by(persona_id=persona.id, fused=True).first(), resp)
+    if persona.status in TERMINAL_STATUSES:
+        return
+    status = persona.status = upstream_status(resp)  # "queued" | "in_progress" | "completed" | "failed"
+
+    # If it's done, extract the output
+    if status == "completed":
+        output = getattr(resp, "output_text", "").strip()
+        with span("parse_output"):
+            profile, persona.persona_json, persona.product_visual = schemas.parse_persona(output)
+        persona.persona_txt = profile.to_text() if profile else output
+        persona.status = "completed"
+        persona.completed_at = datetime.utcnow()
+        with span("db_commit"):
+            db.session.commit()
+        persona_index.add(persona)
+        if speculative.enabled() and persona.batch_id is None:
+            speculative.submit(speculate_scripts, persona.id)
+
+    elif status == "failed":
+        persona.status = "failed"
+        persona.completed_at = datetime.utcnow()
+        with span("db_commit"):
+            db.session.commit()
+
+def speculate_scripts(persona_id):
+    """
+    Queue speculative scripts for a completed persona, one per tone its
+    owner uses most that it has no script for yet (see speculative.py).
+    """
+    persona = db.session.get(Persona, persona_id)
+    project = persona and db.session.get(Project, persona.project_id)
+    img = persona and db.session.get(Image, persona.image_id)
+    if persona is None or persona.status != "completed" or project is None or img is None:
+        return []
+    # Conditional, so a persona completed by a poll and a webhook at once is only speculated on once
+    if not Persona.query.filter(Persona.id == persona.id, Persona.speculated_at.is_(None)).update(
+            # updated_at kept: persona_index would otherwise re-read an unchanged persona
+            {"speculated_at": datetime.utcnow(), "updated_at": Persona.updated_at}, synchronize_session=False):
+        db.session.rollback()
+        return []
+    db.session.commit()
+    have = {speculative.normalize(tone) for (tone,) in
+            db.session.query(Script.tone).filter(Script.persona_id == persona.id)}
+    user = db.session.get(User, project.user_id)
+    rows = []
+    for tone in speculative.likely_tones(project.user_id, exclude=have):
+        s = Script(persona_id=persona.id, project_id=persona.project_id, tone=tone,
+                   status="processing", script_txt="", speculative=True)
+        _record_decision(s, policy.choose("script", input_chars=len(persona.description or ""), user=user))
+        db.session.add(s)
+        db.session.commit()
+        try:
+            s.openai_job_id, job_status = enqueue_script(
+                persona, img,
+                prompt=generate_ad_script_prompt(persona.product_name, persona.description,
+                                                 persona.persona_txt, tone),
+                model=s.model, verbosity=s.verbosity, effort=s.reasoning_effort,
+                schema_name="ad_script", schema=schemas.SCRIPT_SCHEMA)
+            s.status = "queued" if job_status == "queued" else "processing"
+            speculative.OUTCOMES.inc("generated")
+        except Exception as e:
+            log.warning("Speculative %s script for persona %s failed: %s", tone, persona.id, e)
+            s.status = "failed"
+        db.session.commit()
+        rows.append(s)
+    return rows
+
+def apply_script_response(s, resp):
+    if s.fused:
+        return apply_fused_response(db.session.get(Persona, s.persona_id), s, resp)
+    if s.status in TERMINAL_STATUSES:
+        return
+    status = s.status = upstream_status(resp)  # "queued" | "in_progress" | "completed" | "failed"
+
+    # If it's done, extract the output
+    if status == "completed":
+        output = getattr(resp, "output_text", "").strip()
+        with span("parse_output"):
+            ad_script, s.script_json = schemas.parse(script_format(s.segments)[2], output)
+        s.script_txt = ad_script.to_text() if ad_script else output
+        s.status = "completed"
+        s.completed_at = datetime.utcnow()
+        with span("db_commit"):
+            db.session.commit()
+
+    elif status == "failed":
+        s.status = "failed"
+        s.completed_at = datetime.utcnow()
+        with span("db_commit"):
+            db.session.commit()
+
+def apply_fused_response(persona, s, resp):
+    """Complete the Persona and Script of a fused job from its single response."""
+    rows = [r for r in (persona, s) if r is not None and r.status not in TERMINAL_STATUSES]
+    if not rows:
+        return
+    status = upstream_status(resp)
+    for row in rows:
+        row.status = status
+
+    if status == "completed":
+        output = getattr(resp, "output_text", "").strip()
+        with span("parse_output"):
+            fused, data, visual = schemas.parse_persona_script(output)
+        now = datetime.utcnow()
+        if persona in rows:
+            persona.persona_json = data["persona"] if fused else data
+            persona.product_visual = visual
+            persona.persona_txt = fused.persona.to_text() if fused else output
+            persona.completed_at = now
+        if s in rows:
+            s.script_json = data["script"] if fused else data
+            s.script_txt = fused.script.to_text() if fused else output
+            s.completed_at = now
+        with span("db_commit"):
+            db.session.commit()
+        if persona in rows:
+            persona_index.add(persona)
+
+    elif status == "failed":
+        for row in rows:
+            row.completed_at = datetime.utcnow()
+        with span("db_commit"):
+            db.session.commit()
+
+def lease_owner():
+    """Identifies this process in Video.lease_owner."""
+    return locks.holder()
+
+def lease_live(v):
+    return v.lease_expires_at is not None and v.lease_expires_at > datetime.utcnow()
+
+def apply_video_response(v, resp):
+    if v.status in TERMINAL_STATUSES or (v.status == "downloading" and lease_live(v)):
+        return
+    if resp.status == "completed":
+        if not current_app.config.get("INLINE_DOWNLOADS", True):
+            return  # left for worker.py's download loop
+        download_video(v)
+    elif resp.status == "failed":
+        v.status = "failed"
+        v.error = str(getattr(resp, "error", None) or "") or None
+        with span("db_commit"):
+            db.session.commit()
+    else:
+        v.status = resp.status  # "queued" | "in_progress"
+
+def _claim(model, row):
+    """Conditionally mark a Video or VideoSegment "downloading" under a lease; False if someone else holds it."""
+    now = datetime.utcnow()
+    claimed = model.query.filter(
+        model.id == row.id,
+        model.status.notin_(TERMINAL_STATUSES),
+        db.or_(model.status != "downloading", model.lease_expires_at.is_(None), model.lease_expires_at < now),
+    ).update({
+        "status": "downloading",
+        "lease_owner": lease_owner(),
+        "lease_expires_at": now + timedelta(seconds=current_app.config.get("DOWNLOAD_LEASE_SECONDS", 300)),
+    }, synchronize_session=False)
+    with span("db_commit"):
+        db.session.commit()
+    if not claimed:
+        db.session.refresh(row)
+    return bool(claimed)
+
+def _unclaim(model, row):
+    db.session.rollback()
+    model.query.filter(model.id == row.id, model.status == "downloading").update(
+        {"status": "in_progress", "lease_owner": None, "lease_expires_at": None}, synchronize_session=False)
+    db.session.commit()
+
+def _fetch_video(job_id, path):
+    """Write a finished render to path; returns its size in bytes."""
+    with upstream("sora-2", "videos.download_content"):
+        content = get_client().videos.download_content(job_id)
+
+        if hasattr(content, "read") and callable(content.read):
+            try:
+                raw = content.read()
+            except TypeError:
+                raw = content.read
+        elif hasattr(content, "content"):
+            raw = content.content
+        elif isinstance(content, (bytes, bytearray)):
+            raw = content
+        else:
+            raw = bytes(content)
+
+    with span("disk_write"), open(path, 'wb') as f:
+        f.write(raw)
+    return len(raw)
+
+def download_video(v):
+    """
+    Download a finished render into VIDEO_FOLDER and complete the row.
+
+    The row is first claimed with a conditional UPDATE to "downloading", so
+    when a poll and a webhook race only one of them fetches the file. The
+    claim is a lease: if its holder dies, it can be taken over once
+    lease_expires_at has passed. Returns False if someone else holds it.
+    """
+    if not _claim(Video, v):
+        return False
+
+    try:
+        video_filename = f"{uuid.uuid4()}.mp4"
+        video_path = os.path.join(folder('VIDEO_FOLDER'), video_filename)
+        size = _fetch_video(v.openai_job_id, video_path)
+    except Exception:
+        # Release the claim so the next poll or delivery retries the download
+        _unclaim(Video, v)
+        raise
+
+    # Conditional, so a video cancelled during the download stays cancelled
+    completed = Video.query.filter(Video.id == v.id, Video.status == "downloading").update({
+        "file_path": video_path,
+        "size": size,
+        "video_url": url_for('.serve_video', filename=video_filename, _external=True),
+        "status": "completed",
+        "completed_at": datetime.utcnow(),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    }, synchronize_session=False)
+    with span("db_commit"):
+        db.session.commit()
+    db.session.refresh(v)
+    if not completed:
+        os.remove(video_path)
+        return False
+
+    # Poster frame and animated preview are made off the request path
+    previews.submit(v.id)
+    return True
+
+# Long-form videos
+# ------------------------------------------------------------------------------
+# A long-form script is rendered as one Sora clip per scene (VideoSegment).
+# All clips are submitted at once, so a 36-second ad takes about as long as
+# one 12-second clip. Each clip gets the product image as its reference:
+# the last frame of a scene only exists once that scene has rendered, which
+# would make the renders serial again. Segments are polled, downloaded and
+# leased like single videos; once all of them are on disk the Video itself
+# is claimed and the clips are joined with ffmpeg's concat demuxer (stream
+# copy, no re-encode). One failed segment fails the video and cancels the
+# rest.
+
+SEGMENT_SECONDS = 12    # one Sora clip
+MAX_SEGMENTS = 5
+SEGMENT_FOLDER = "segments"   # under VIDEO_FOLDER, deleted once stitched
+
+def submit_segments(v, prompts, image_path):
+    """Create a VideoSegment per prompt and start all of their renders concurrently."""
+    parts = [VideoSegment(video_id=v.id, position=i, status="queued") for i in range(len(prompts))]
+    db.session.add_all(parts)
+    v.segments = len(parts)
+    v.status = "in_progress"
+    with span("db_commit"):
+        db.session.commit()
+
+    client = get_client()
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        futures = [pool.submit(enqueue_sora_background, prompt, image_path, client) for prompt in prompts]
+    for part, future in zip(parts, futures):
+        try:
+            part.openai_job_id, job_status = future.result()
+            part.status = "queued" if job_status == "queued" else "in_progress"
+        except Exception as e:
+            part.status, part.error = "failed", str(e)
+    with span("db_commit"):
+        db.session.commit()
+    settle_segments(v)   # fails the video, and cancels what did start, if any submit failed
+
+def apply_segment_response(part, resp):
+    if part.status in TERMINAL_STATUSES or (part.status == "downloading" and lease_live(part)):
+        return
+    if resp.status == "completed":
+        if not current_app.config.get("INLINE_DOWNLOADS", True):
+            return  # left for worker.py's download loop
+        download_segment(part)
+    elif resp.status == "failed":
+        part.status = "failed"
+        part.error = str(getattr(resp, "error", None) or "") or None
+        part.completed_at = datetime.utcnow()
+        with span("db_commit"):
+            db.session.commit()
+    else:
+        part.status = resp.status  # "queued" | "in_progress"
+        return
+    settle_segments(db.session.get(Video, part.video_id))
+
+def download_segment(part):
+    """Download a finished segment render into VIDEO_FOLDER/segments; False if someone else holds it."""
+    if not _claim(VideoSegment, part):
+        return False
+    try:
+        path = os.path.join(folder('VIDEO_FOLDER'), SEGMENT_FOLDER, f"{uuid.uuid4()}.mp4")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _fetch_video(part.openai_job_id, path)
+    except Exception:
+        _unclaim(VideoSegment, part)
+        raise
+
+    completed = VideoSegment.query.filter(VideoSegment.id == part.id, VideoSegment.status == "downloading").update({
+        "file_path": path,
+        "status": "completed",
+        "completed_at": datetime.utcnow(),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    }, synchronize_session=False)
+    with span("db_commit"):
+        db.session.commit()
+    db.session.refresh(part)
+    if not completed:
+        os.remove(path)
+        return False
+    return True
+
+def refresh_segments(v, interval=None):
+    """Poll the unfinished segments of v (throttled like single videos), then stitch or fail it."""
+    for part in v.parts:
+        if part.status in TERMINAL_STATUSES:
+            continue
+        if part.status == "downloading":
+            if not lease_live(part):
+                download_segment(part)   # its downloader died; the render is known to be finished
+            continue
+        if poll_due("segment", part.id, interval):
+            with upstream("sora-2", "videos.retrieve"):
+                resp = get_client().videos.retrieve(part.openai_job_id)
+            apply_segment_response(part, resp)
+    settle_segments(v)
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _discard_segments(parts):
+    for part in parts:
+        if part.file_path:
+            _remove_file(part.file_path)
+            part.file_path = None
+    db.session.commit()
+
+def _fail_video(v, error):
+    Video.query.filter(Video.id == v.id, Video.status.notin_(TERMINAL_STATUSES)).update(
+        {"status": "failed", "error": error, "completed_at": datetime.utcnow(),
+         "lease_owner": None, "lease_expires_at": None}, synchronize_session=False)
+    with span("db_commit"):
+        db.session.commit()
+    db.session.refresh(v)
+
+def settle_segments(v):
+    """Stitch v once every segment is downloaded; fail it once one has failed."""
+    db.session.refresh(v)
+    parts = VideoSegment.query.filter_by(video_id=v.id).order_by(VideoSegment.position).all()
+    if v.status in TERMINAL_STATUSES:
+        _discard_segments(parts)   # clips that finished after a cancel or a failure
+        return
+    failed = [part for part in parts if part.status in ("failed", "cancelled", "expired")]
+    if failed:
+        _fail_video(v, f"Segment {failed[0].position + 1} of {len(parts)} {failed[0].status}"
+                       + (f": {failed[0].error}" if failed[0].error else ""))
+        cancel_rows([part for part in parts if part.status not in TERMINAL_STATUSES])
+        _discard_segments(parts)
+    elif parts and all(part.status == "completed" for part in parts):
+        stitch_video(v, parts)
+
+def stitch_video(v, parts=None):
+    """Concatenate the downloaded segments of v into its MP4 and complete it."""
+    if not _claim(Video, v):
+        return False
+    if parts is None:
+        parts = VideoSegment.query.filter_by(video_id=v.id).order_by(VideoSegment.position).all()
+
+    video_filename = f"{uuid.uuid4()}.mp4"
+    video_path = os.path.join(folder('VIDEO_FOLDER'), video_filename)
+    binary = previews.ffmpeg()
+    try:
+        if not binary:
+            raise RuntimeError("ffmpeg is not available")
+        with span("video_stitch"):
+            previews.concat(binary, [part.file_path for part in parts], video_path)
+        size = os.path.getsize(video_path)
+    except Exception as e:
+        # Same clips, same result on a retry: fail rather than loop
+        log.warning("Stitching video %s failed: %s", v.id, e)
+        _remove_file(video_path)
+        _fail_video(v, f"Stitching failed: {getattr(e, 'stderr', None) or e}")
+        _discard_segments(parts)
+        return False
+
+    completed = Video.query.filter(Video.id == v.id, Video.status == "downloading").update({
+        "file_path": video_path,
+        "size": size,
+        "video_url": url_for('.serve_video', filename=video_filename, _external=True),
+        "status": "completed",
+        "completed_at": datetime.utcnow(),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    }, synchronize_session=False)
+    with span("db_commit"):
+        db.session.commit()
+    db.session.refresh(v)
+    _discard_segments(parts)
+    if not completed:
+        os.remove(video_path)
+        return False
+    previews.submit(v.id)
+    return True
+
+# Cancellation
+# ------------------------------------------------------------------------------
+# A cancelled row is terminal like any other, so polls, webhooks, batch
+# results and worker downloads all skip it. Its upstream job is cancelled
+# (responses) or deleted (videos) to give the capacity back.
+
+def _cancel_upstream(row):
+    if isinstance(row, Video) and row.segments:
+        cancel_rows(_unfinished(VideoSegment, VideoSegment.video_id == row.id))
+        _discard_segments(row.parts)
+        return
+    if not row.openai_job_id or getattr(row, "batch_id", None):
+        return   # requests in a batch can only be cancelled with the whole batch
+    try:
+        if isinstance(row, (Video, VideoSegment)):
+            with upstream("sora-2", "videos.delete"):
+                get_client().videos.delete(row.openai_job_id)
+        else:
+            with upstream(row.model or "gpt-5", "responses.cancel"):
+                get_client().responses.cancel(row.openai_job_id)
+    except Exception as e:
+        # Already finished or gone upstream; the row is cancelled either way
+        log.warning("Cancelling job %s upstream failed: %s", row.openai_job_id, e)
+
+def cancel_rows(rows, cancelled_jobs=()):
+    """
+    Cancel the unfinished rows among rows and their upstream jobs, except
+    jobs in cancelled_jobs (cancelled already); returns the rows cancelled.
+    """
+    cancelled = []
+    for row in rows:
+        model = type(row)
+        # Conditional, so a row that finishes meanwhile keeps its result
+        if model.query.filter(model.id == row.id, model.status.notin_(TERMINAL_STATUSES)).update(
+                {"status": "cancelled"}, synchronize_session=False):
+            cancelled.append(row)
+    with span("db_commit"):
+        db.session.commit()
+
+    job_ids = set(cancelled_jobs)
+    for row in cancelled:
+        db.session.refresh(row)
+        if row.openai_job_id is None or row.openai_job_id not in job_ids:   # a fused persona and script share one job
+            job_ids.add(row.openai_job_id)
+            _cancel_upstream(row)
+    return cancelled
+
+def _owned(model, row_id):
+    """A persona, script or video in one of the current user's projects, else None."""
+    return (model.query.join(Project, Project.id == model.project_id)
+            .filter(model.id == row_id, Project.user_id == current_user.id).first())
+
+def _unfinished(model, *criteria):
+    return model.query.filter(model.status.notin_(TERMINAL_STATUSES), *criteria).all()
+
+def _cancel_json(row, cancelled):
+    if row is not None and row.status != "cancelled":
+        return jsonify({'success': False, 'error': f'Already {row.status}', 'status': row.status}), 409
+    counts = {"personas": 0, "scripts": 0, "videos": 0}
+    for r in cancelled:
+        counts[r.__tablename__] += 1
+    return jsonify({'success': True, 'status': "cancelled", 'cancelled': counts}), 200
+
+@limiter.limit("30/minute")
+@bp.route('/api/persona/<persona_id>/cancel', methods=['POST'])
+@login_required
+def cancel_persona(persona_id):
+    """Cancel a persona and the scripts waiting on it."""
+    persona = _owned(Persona, persona_id)
+    if persona is None:
+        return jsonify({'success': False, 'error': 'Persona not found'}), 404
+    if persona.status in TERMINAL_STATUSES:
+        return _cancel_json(persona, [])
+    cancelled = cancel_rows([persona])
+    # Scripts of a persona that finished meanwhile are the user's to cancel one by one
+    if cancelled:
+        cancelled += cancel_rows(_unfinished(Script, Script.persona_id == persona.id), {persona.openai_job_id})
+    return _cancel_json(persona, cancelled)
+
+@limiter.limit("30/minute")
+@bp.route('/api/script/<script_id>/cancel', methods=['POST'])
+@login_required
+def cancel_script(script_id):
+    s = _owned(Script, script_id)
+    if s is None:
+        return jsonify({'success': False, 'error': 'Script not found'}), 404
+    if s.status in TERMINAL_STATUSES:
+        return _cancel_json(s, [])
+    cancelled = cancel_rows([s])
+    if cancelled and s.fused:
+        # Its persona comes from the same job, which was just cancelled
+        cancelled += cancel_rows(_unfinished(Persona, Persona.id == s.persona_id), {s.openai_job_id})
+    return _cancel_json(s, cancelled)
+
+@limiter.limit("30/minute")
+@bp.route('/api/video/<video_id>/cancel', methods=['POST'])
+@login_required
+def cancel_video(video_id):
+    """Cancel a render; a download already under way is discarded."""
+    v = _owned(Video, video_id)
+    if v is None:
+        return jsonify({'success': False, 'error': 'Video not found'}), 404
+    return _cancel_json(v, cancel_rows([v]))
+
+@limiter.limit("10/minute")
+@bp.route('/api/project/<project_id>/cancel', methods=['POST'])
+@login_required
+def cancel_project(project_id):
+    """Cancel every unfinished persona, script and video in a project."""
+    project_row = Project.query.filter_by(id=project_id, user_id=current_user.id).first()
+    if project_row is None:
+        return jsonify({'success': False, 'error': 'Project not found'}), 404
+    rows = [row for model in (Persona, Script, Video) for row in _unfinished(model, model.project_id == project_id)]
+    return _cancel_json(None, cancel_rows(rows))
+
+# Webhooks
+# ------------------------------------------------------------------------------
+
+def verify_webhook(body, headers, secret, tolerance=300):
+    """
+    Check a Standard Webhooks signature as sent by OpenAI: base64
+    HMAC-SHA256 of "{webhook-id}.{webhook-timestamp}.{body}", keyed with the
+    base64 part of the "whsec_..." secret.
+    """
+    msg_id = headers.get("webhook-id")
+    timestamp = headers.get("webhook-timestamp")
+    signatures = headers.get("webhook-signature", "")
+    if not msg_id or not timestamp or not signatures:
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance:
+            return False
+    except ValueError:
+        return False
+
+    key = base64.b64decode(secret[len("whsec_"):]) if secret.startswith("whsec_") else secret.encode()
+    digest = hmac.new(key, f"{msg_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    expected = base64.b64encode(digest).decode()
+    return any(
+        hmac.compare_digest(expected, sig.split(",", 1)[1])
+        for sig in signatures.split()
+        if sig.startswith("v1,")
+    )
+
+@limiter.exempt
+@bp.route('/api/webhooks/openai', methods=['POST'])
+def openai_webhook():
+    """
+    Receives response.*, video.* and batch.* job events. The event only
+    carries the job id, so the row is looked up through its openai_job_id
+    index and the result fetched once, then applied with the same code the
+    status endpoints use. A non-2xx reply makes OpenAI redeliver.
+    """
+    secret = current_app.config.get("OPENAI_WEBHOOK_SECRET")
+    if not secret:
+        return jsonify({'error': 'Webhooks are not configured'}), 404
+
+    body = request.get_data()
+    if not verify_webhook(body, request.headers, secret):
+        return jsonify({'error': 'Invalid signature'}), 401
+
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return jsonify({'error': 'Invalid JSON'}), 400
+
+    event_type = event.get("type", "")
+    job_id = (event.get("data") or {}).get("id")
+    if not job_id:
+        return jsonify({'error': 'No job id in event'}), 400
+
+    try:
+        if event_type.startswith("response."):
+            row = (Persona.query.filter_by(openai_job_id=job_id).first()
+                   or Script.query.filter_by(openai_job_id=job_id).first())
+            if row is None or row.status in TERMINAL_STATUSES:
+                return jsonify({'success': True, 'ignored': True}), 200
+            with upstream(row.model or "gpt-5", "responses.retrieve"):
+                resp = get_client().responses.retrieve(job_id)
+            # Failures go through the apply helpers too, so both rows of a fused job are closed
+            if isinstance(row, Persona):
+                apply_persona_response(row, resp)
+            else:
+                apply_script_response(row, resp)
+
+        elif event_type.startswith("video."):
+            row = (Video.query.filter_by(openai_job_id=job_id).first()
+                   or VideoSegment.query.filter_by(openai_job_id=job_id).first())
+            if row is None or row.status in TERMINAL_STATUSES:
+                return jsonify({'success': True, 'ignored': True}), 200
+            with upstream("sora-2", "videos.retrieve"):
+                resp = get_client().videos.retrieve(job_id)
+            if isinstance(row, Video):
+                apply_video_response(row, resp)
+            else:
+                apply_segment_response(row, resp)
+
+        elif event_type.startswith("batch."):
+            row = Batch.query.filter_by(openai_batch_id=job_id).first()
+            if row is None or row.status in batches.TERMINAL:
+                return jsonify({'success': True, 'ignored': True}), 200
+            collect_batch(row)
+
+        else:
+            return jsonify({'success': True, 'ignored': True}), 200
+
+    except Exception as e:
+        log.warning("Error handling webhook %s for job %s: %s", event_type, job_id, e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'status': row.status}), 200
+
+# Bulk mode (OpenAI Batch API, see batches.py)
+# ------------------------------------------------------------------------------
+
+batch_cli = AppGroup("batch", help="Send pending personas/scripts through the OpenAI Batch API.")
+
+def _batch_line(row):
+    """Batch request line for a pending Persona or Script row."""
+    if isinstance(row, Persona):
+        persona, kind = row, "persona"
+        prompt, schema_name, schema = persona_request(row.product_name, row.description, row.person_description or "")
+    else:
+        persona, kind = row.persona, "script"
+        prompt = generate_ad_script_prompt(persona.product_name, persona.description, persona.persona_txt, row.tone,
+                                           scenes=row.segments or 1)
+        schema_name, schema, _ = script_format(row.segments)
+    img = db.session.get(Image, persona.image_id)
+    if img is None:
+        return None
+    visual = product_visual_for(persona) if kind == "script" else None
+    if visual is not None:
+        prompt += product_visual_prompt(visual)
+        file_id, image_url = None, None
+    else:
+        file_id = openai_files.file_id_for(img, get_client())
+        image_url = None if file_id else image_path_to_data_url(img.path)
+    body = response_body(prompt, image_url,
+                         verbosity=row.verbosity or "medium", effort=row.reasoning_effort or "medium",
+                         schema_name=schema_name, schema=schema, model=row.model or "gpt-5", file_id=file_id)
+    return batches.request_line(f"{kind}:{row.id}", body)
+
+def compile_batches():
+    """Group pending personas, and scripts whose persona is done, into compiled batches."""
+    # Two nodes compiling at once would put the same rows in two batches
+    with locks.hold("batch:compile") as token:
+        if token is None:
+            return []
+        return _compile_batches()
+
+def _compile_batches():
+    # A script can't be written for a persona that failed
+    for s in (Script.query.join(Persona, Persona.id == Script.persona_id)
+              .filter(Script.status == "pending", Persona.status.in_(("failed", "expired")))):
+        s.status = "failed"
+    rows = (Persona.query.filter(Persona.status == "pending").order_by(Persona.created_at).all()
+            + Script.query.join(Persona, Persona.id == Script.persona_id)
+              .filter(Script.status == "pending", Persona.status == "completed")
+              .order_by(Script.created_at).all())
+
+    size = current_app.config["BATCH_MAX_REQUESTS"]
+    compiled = []
+    for i in range(0, len(rows), size):
+        batch = Batch()
+        db.session.add(batch)
+        db.session.flush()  # get batch.id
+        lines = []
+        for row in rows[i:i + size]:
+            line = _batch_line(row)
+            if line is None:
+                row.status = "failed"
+                continue
+            lines.append(line)
+            row.batch_id = batch.id
+            row.status = "batched"
+        batches.write(batch, lines, current_app.config["BATCH_FOLDER"])
+        db.session.commit()
+        compiled.append(batch)
+    db.session.commit()
+    return compiled
+
+def apply_batch_result(custom_id, body, error):
+    kind, _, row_id = custom_id.partition(":")
+    row = db.session.get(Persona if kind == "persona" else Script, row_id)
+    if row is None or row.status in TERMINAL_STATUSES:
+        return
+    if body is not None:
+        resp = batches.as_response(body)
+        row.openai_job_id = resp.id
+        if resp.status in ("completed", "failed"):
+            (apply_persona_response if kind == "persona" else apply_script_response)(row, resp)
+            return
+    log.warning("Batch request %s failed: %s", custom_id, error or body.get("status"))
+    row.status = "failed"
+    row.completed_at = datetime.utcnow()
+    db.session.commit()
+
+def submit_batch(batch):
+    """Upload and create one compiled batch; False if it was not submitted here."""
+    with locks.hold(f"batch:{batch.id}") as token:
+        if token is None:
+            return False
+        db.session.refresh(batch)
+        if batch.status != "compiled":
+            return False
+        client = get_client()
+        # The upload can outlast the lock; only the current holder creates the batch
+        batches.upload(client, batch)
+        if not locks.check(f"batch:{batch.id}", token):
+            db.session.rollback()
+            return False
+        batches.create(client, batch)
+        db.session.commit()
+        return True
+
+def collect_batch(batch):
+    """Refresh one submitted batch and, once it is over, apply its results."""
+    # Webhooks, cron and workers on any node may collect the same batch
+    with locks.hold(f"batch:{batch.id}") as token:
+        if token is None:
+            return False
+        db.session.refresh(batch)
+        if batch.status in batches.TERMINAL:
+            return False
+        return _collect_batch(batch, locks.keeper(f"batch:{batch.id}", token))
+
+def _collect_batch(batch, alive):
+    if not batches.refresh(get_client(), batch):
+        db.session.commit()
+        return False
+    # Results are committed as they are applied; until the last one is, the batch stays
+    # open so a collector that takes over after this one lost the lock starts again
+    status, batch.status = batch.status, "finalizing"
+    for custom_id, body, error in batches.results(get_client(), batch):
+        if not alive():
+            db.session.rollback()
+            return False
+        apply_batch_result(custom_id, body, error)
+    if not alive():
+        db.session.rollback()
+        return False
+    batch.status = status
+    # Rows the batch never got to: expired/cancelled ones go back in the queue
+    requeue = status in ("expired", "cancelled")
+    for model in (Persona, Script):
+        model.query.filter(model.batch_id == batch.id, model.status == "batched").update(
+            {"status": "pending", "batch_id": None} if requeue else
+            {"status": "failed", "completed_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return True
+
+@batch_cli.command("compile")
+def batch_compile_command():
+    """Write pending requests to BATCH_FOLDER/<batch id>.jsonl."""
+    compiled = compile_batches()
+    for b in compiled:
+        click.echo(f"batch {b.id}: {b.request_count} requests -> {b.path}")
+    click.echo(f"{len(compiled)} batches compiled")
+
+@batch_cli.command("submit")
+def batch_submit_command():
+    """Upload compiled batches and create them upstream."""
+    for b in Batch.query.filter(Batch.status == "compiled", Batch.request_count > 0).all():
+        try:
+            if not submit_batch(b):
+                continue
+        except Exception as e:
+            click.echo(f"batch {b.id}: submit failed: {e}")
+            continue
+        click.echo(f"batch {b.id}: submitted as {b.openai_batch_id} ({b.status})")
+
+@batch_cli.command("collect")
+def batch_collect_command():
+    """Apply the results of finished batches."""
+    for b in Batch.query.filter(Batch.status.in_(batches.OPEN), Batch.openai_batch_id.isnot(None)).all():
+        done = collect_batch(b)
+        click.echo(f"batch {b.id}: {b.status}" + (f" ({b.completed_count} ok, {b.failed_count} failed)" if done else ""))
+
+@batch_cli.command("cancel")
+@click.argument("batch_id")
+def batch_cancel_command(batch_id):
+    """Cancel a batch and the requests in it."""
+    b = db.session.get(Batch, batch_id)
+    if b is None:
+        raise click.ClickException(f"no batch {batch_id}")
+    with locks.hold(f"batch:{b.id}") as token:
+        if token is None:
+            raise click.ClickException(f"batch {b.id} is being submitted or collected, try again")
+        db.session.refresh(b)
+        if b.status in batches.TERMINAL:
+            raise click.ClickException(f"batch {b.id} is already {b.status}")
+        if b.openai_batch_id:
+            batches.cancel(get_client(), b)
+        else:
+            b.status = "cancelled"
+            b.completed_at = datetime.utcnow()
+        db.session.commit()
+    # Results that still arrive are ignored, and nothing goes back in the queue
+    rows = [row for model in (Persona, Script) for row in _unfinished(model, model.batch_id == b.id)]
+    click.echo(f"batch {b.id}: {b.status}, {len(cancel_rows(rows))} requests cancelled")
+
+@batch_cli.command("run")
+@click.pass_context
+def batch_run_command(ctx):
+    """Collect, compile and submit in one go, for cron."""
+    ctx.invoke(batch_collect_command)
+    ctx.invoke(batch_compile_command)
+    ctx.invoke(batch_submit_command)
+
 # Login
 # ------------------------------------------------------------------------------
 
-@app.route("/auth/dev-login", methods=["POST"])
+@bp.route("/auth/dev-login", methods=["POST"])
 def dev_login():
     try:
         # Validate input (same pattern as your script/persona endpoints)
@@ -681,7 +2174,8 @@ def dev_login():
             'success': True,
             'user_id': user.id,
             'email': user.email,
-            'credits': user.credits
+            'credits': user.credits,
+            'plan': user.plan
         }), 200
 
     except Exception as e:
@@ -690,7 +2184,7 @@ def dev_login():
             'error': str(e)
         }), 500
         
-@app.route("/auth/logout", methods=["POST"])
+@bp.route("/auth/logout", methods=["POST"])
 @login_required
 def logout():
     try:
@@ -700,7 +2194,7 @@ def logout():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route("/api/me", methods=["GET"])
+@bp.route("/api/me", methods=["GET"])
 @login_required
 def me():
     return jsonify({
@@ -708,6 +2202,7 @@ def me():
         "id": current_user.id,
         "email": current_user.email,
         "credits": current_user.credits,
+        "plan": current_user.plan,
     }), 200
 
 
@@ -722,13 +2217,13 @@ def _process_video_job(job_id, image_path, image_data_url, product_name, descrip
         persona_prompt = generate_persona_prompt(product_name, description, person_description)
         gpt_response = chatGPT(persona_prompt, image_data_url, verbosity="high", effort="high")
         persona = getattr(gpt_response, "output_text", "")
-        print("Persona Created")
+        log.debug("Persona Created")
         
         _update_job(job_id, status="processing", message="Generating script...")
         ad_script_prompt = generate_ad_script_prompt(product_name, description, persona, tone)#the prompt that generates the ad script.
         gpt_response1 = chatGPT(ad_script_prompt, image_data_url)
         ad_script = getattr(gpt_response1, "output_text", "")
-        print("Final Sora Prompt Created")
+        log.debug("Final Sora Prompt Created")
         
         _update_job(job_id, status="processing", message="Generating video with Sora...")
         
@@ -740,11 +2235,11 @@ def _process_video_job(job_id, image_path, image_data_url, product_name, descrip
         
         # _update_job(job_id, status="processing", message="Saving video...")
         # video_filename = f"{uuid.uuid4()}.mp4"
-        # video_path = os.path.join(app.config['VIDEO_FOLDER'], video_filename)
+        # video_path = os.path.join(folder('VIDEO_FOLDER'), video_filename)
         # with open(video_path, 'wb') as f:
         #     f.write(video_data)
 
-        # video_url = url_for('serve_video', filename=video_filename, _external=True)
+        # video_url = url_for('.serve_video', filename=video_filename, _external=True)
         
         video_url = "video generation commented out for testing"
         time.sleep(20)
@@ -761,7 +2256,7 @@ def generate_video_with_image(image_path, prompt):
     # Open and upload the image to OpenAI
     with open(image_path, 'rb') as image_file:
         # Create video with image input
-        response = client.videos.create(
+        response = get_client().videos.create(
             model="sora-2",
             prompt=prompt,
             input_reference=image_file,
@@ -774,7 +2269,7 @@ def generate_video_with_image(image_path, prompt):
     
     # Poll for video completion
     while True:
-        video_status = client.videos.retrieve(video_id)
+        video_status = get_client().videos.retrieve(video_id)
         
         if video_status.status == "completed":
             break
@@ -783,7 +2278,7 @@ def generate_video_with_image(image_path, prompt):
         time.sleep(10)
     
     # Download video content
-    content = client.videos.download_content(video_id)
+    content = get_client().videos.download_content(video_id)
     
     # Extract bytes safely
     if hasattr(content, "read") and callable(content.read):
@@ -802,7 +2297,7 @@ def generate_video_with_image(image_path, prompt):
 
 ##OLD - NOT USED ANYMORE
 def chatGPT(prompt, image_data_url, verbosity="medium", effort="medium"): #BLOCKING
-    response = client.responses.create(
+    response = get_client().responses.create(
         model="gpt-5",
         input=[
             {
@@ -836,13 +2331,54 @@ def generate_persona_prompt(name, description, person_description):
     
     prompt = template.replace("{PRODUCT NAME}", name_str).replace("{PRODUCT DESCRIPTION}", desc_str).replace("{PERSON DESCRIPTION}", person_description)
     
-    print("Persona Prompt Created")
+    log.debug("Persona Prompt Created")
     return prompt
 
-def generate_ad_script_prompt(name, description, persona, tone):
+LONG_FORM_PROMPT = """
+
+LONG-FORM FORMAT (replaces the single 12-second clip above)
+
+Write this ad as {SCENES} consecutive scenes of 12 seconds each ({SECONDS} seconds in total), in order, in `scenes`.
+Each scene is its own single continuous take that follows every rule above: its timestamps run from 0:00 to 0:12 and it has its own dialogue and shots.
+The scenes are joined with hard cuts. Keep the same creator, outfit, location and lighting in every scene.
+The first scene opens mid-thought, the middle scenes move the story on (the problem, the product in use, the result) and the last scene closes the ad.
+The title, energy and technical details are shared by all scenes.
+"""
+
+PRODUCT_VISUAL_PROMPT = """
+
+PRODUCT DESCRIPTION (in addition to the persona)
+
+Also describe the product exactly as it appears in the image, in `product`: its category, main colors, materials, shape and approximate size, packaging, any visible text or branding (copied as written, or "none"), and the details that make it recognisable.
+Be factual and compact: only what can be seen, one short phrase per field. A script writer who never sees the image will rely on it.
+"""
+
+def persona_request(name, description, person_description):
+    """(prompt, schema name, JSON schema) of a persona job; with TEXT_ONLY_SCRIPTS it also describes the product."""
+    prompt = generate_persona_prompt(name, description, person_description)
+    if not current_app.config.get("TEXT_ONLY_SCRIPTS", True):
+        return prompt, "persona", schemas.PERSONA_SCHEMA
+    return prompt + PRODUCT_VISUAL_PROMPT, "persona_product", schemas.PERSONA_PRODUCT_SCHEMA
+
+def persona_script_request(name, description, person_description, tone):
+    """(prompt, schema name, JSON schema) of a fused job; with TEXT_ONLY_SCRIPTS step 1 also describes the product."""
+    if not current_app.config.get("TEXT_ONLY_SCRIPTS", True):
+        prompt = generate_persona_script_prompt(name, description, person_description, tone)
+        return prompt, "persona_script", schemas.PERSONA_SCRIPT_SCHEMA
+    prompt = generate_persona_script_prompt(name, description, person_description, tone, product=True)
+    return prompt, "persona_product_script", schemas.PERSONA_PRODUCT_SCRIPT_SCHEMA
+
+def script_format(segments):
+    """(schema name, JSON schema, model class) of a script with that many segments."""
+    if segments and segments > 1:
+        return "long_ad_script", schemas.LONG_SCRIPT_SCHEMA, schemas.LongAdScript
+    return "ad_script", schemas.SCRIPT_SCHEMA, schemas.AdScript
+
+def generate_ad_script_prompt(name, description, persona, tone, scenes=1):
     """
     Load ad_script_prompt.txt (next to this file), replace placeholders and return the result.
-    Replaces exact tokens: {PERSONA}, {PRODUCT NAME} and {PRODUCT DESCRIPTION}.
+    Replaces exact tokens: {PERSONA} / {CREATOR PROFILE}, {PRODUCT NAME}, {PRODUCT DESCRIPTION} and {TONE}.
+    With scenes > 1 the script is asked for as that many 12-second scenes.
     """
     path = os.path.join(os.path.dirname(__file__), "ad_script_prompt.txt")
     try:
@@ -859,17 +2395,38 @@ def generate_ad_script_prompt(name, description, persona, tone):
     prompt = (
         template
         .replace("{PERSONA}", persona_str)
+        .replace("{CREATOR PROFILE}", persona_str)
         .replace("{PRODUCT NAME}", name_str)
         .replace("{PRODUCT DESCRIPTION}", desc_str)
         .replace("{TONE}", tone)
     )
+    if scenes > 1:
+        prompt += LONG_FORM_PROMPT.replace("{SCENES}", str(scenes)).replace("{SECONDS}", str(scenes * SEGMENT_SECONDS))
 
-    print("AD Script Prompt Created")
+    log.debug("AD Script Prompt Created")
     return prompt
 
+def generate_persona_script_prompt(name, description, person_description, tone, product=False):
+    """
+    Both templates as one two-step prompt for the fused stage: the persona
+    first, then a script written for that persona. With product, step 1
+    also describes the product (PRODUCT_VISUAL_PROMPT).
+    """
+    persona_part = generate_persona_prompt(name, description, person_description)
+    if product:
+        persona_part += PRODUCT_VISUAL_PROMPT
+    script_part = generate_ad_script_prompt(
+        name, description, "The persona you created in step 1 (the `persona` object of your answer).", tone)
+    return (
+        "Complete two steps and answer with a single JSON object: `persona`" + (" and `product`" if product else "") +
+        " for step 1, `script` for step 2.\n\n"
+        "STEP 1: CREATOR PERSONA\n\n" + persona_part +
+        "\n\nSTEP 2: AD SCRIPT\n\n" + script_part
+    )
+
 
 ##OLD - NOT USED ANYMORE
-@app.route('/api/generate-video', methods=['POST'])
+@bp.route('/api/generate-video', methods=['POST'])
 def generate_video():
     """
     Endpoint to generate video from image and description
@@ -880,23 +2437,18 @@ def generate_video():
         # Validate request
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
-        print("received image file")
         
         if 'description' not in request.form:
             return jsonify({'error': 'No product description provided'}), 400
-        print("received description")
         
         if 'product_name' not in request.form:
             return jsonify({'error': 'No product name provided'}), 400
-        print("received product name")
         
         if 'person_description' not in request.form:
             return jsonify({'error': 'No person description provided'}), 400
-        print("received person description")
         
         if 'tone' not in request.form:
             return jsonify({'error': 'No tone provided'}), 400
-        print("received tone")
         
         image_file = request.files['image']
         description = request.form['description']
@@ -910,18 +2462,18 @@ def generate_video():
         if not allowed_file(image_file.filename):
             return jsonify({'error': 'Invalid file type. Allowed types: png, jpg, jpeg, webp'}), 400
         
-        print("valid file types")
+        log.debug("valid file types")
 
         # Save uploaded image
         filename = secure_filename(image_file.filename)
         unique_filename = f"{uuid.uuid4()}_{filename}"
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        image_path = os.path.join(folder('UPLOAD_FOLDER'), unique_filename)
         image_file.save(image_path)
         
-        print("saved image")
+        log.debug("saved image")
         
         image_data_url= image_path_to_data_url(image_path)
-        print("converted image to data url")
+        log.debug("converted image to data url")
         
         # --- NEW: queue a background job and return job_id immediately ---
         job_id = str(uuid.uuid4())
@@ -935,7 +2487,7 @@ def generate_video():
             }
 
         # Launch background worker
-        t = Thread(target=_process_video_job, args=(job_id, image_path, image_data_url, product_name, description, person_description, tone), daemon=True)
+        t = Thread(target=_run_in_app_context, args=(current_app._get_current_object(), _process_video_job, job_id, image_path, image_data_url, product_name, description, person_description, tone), daemon=True)
         t.start()
 
         # Respond fast (no long post)
@@ -952,23 +2504,33 @@ def generate_video():
         }), 500
 
 
-@app.route('/videos/<filename>')
+@bp.route('/videos/<path:filename>')
 def serve_video(filename):
-    """Serve generated video files"""
-    return send_from_directory(app.config['VIDEO_FOLDER'], filename)
+    """Serve generated video files, posters and previews"""
+    # Posters and previews are named after their (uuid-named) video and never rewritten
+    if filename.startswith((previews.POSTER_DIR + "/", previews.PREVIEW_DIR + "/")):
+        return send_from_directory(current_app.config['VIDEO_FOLDER'], filename, max_age=365 * 24 * 3600)
+
+    # Videos demoted by the storage manager are served from the cold folder
+    root = current_app.config['VIDEO_FOLDER']
+    cold = current_app.config.get('STORAGE_COLD_FOLDER')
+    if cold and not os.path.exists(os.path.join(root, filename)):
+        root = cold
+    storage.touch(os.path.join(root, filename))
+    return send_from_directory(root, filename)
 
 
-@app.route('/api/health', methods=['GET'])
+@bp.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy'}), 200
 
-@app.route('/', methods=['GET'])
+@bp.route('/', methods=['GET'])
 def home():
     """Home endpoint"""
     return jsonify({'home': 'we out here'}), 200
 
-@app.route('/api/job/<job_id>', methods=['GET'])
+@bp.route('/api/job/<job_id>', methods=['GET'])
 def job_status(job_id):
     with JOBS_LOCK:
         data = JOBS.get(job_id)
@@ -1000,6 +2562,6 @@ def job_status(job_id):
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
     
     
\ No newline at end of file
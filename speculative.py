@@ -0,0 +1,211 @@
+"""
+Speculative scripts: start the likely next script before it is asked for.
+
+Users nearly always request a script as soon as their persona is done, and
+mostly with one of a few tones. With SPECULATIVE_SCRIPTS=1, a persona that
+completes gets scripts queued right away for the user's most used tones
+(likely_tones), stored as Script rows with speculative=True. A matching
+/api/script call (same persona and tone) claims one of those instead of
+starting a new job, so the GPT-5 wait has already passed or is under way.
+
+Rows nobody claims within SPECULATIVE_TTL are marked "expired" by sweep(),
+and those still running have their upstream job cancelled so they stop
+costing; each one is a GPT-5 call that was paid for and not used. That waste is
+counted in ugc_speculative_scripts_total{outcome="expired"} and reported,
+with the hit rate, by:
+
+    flask speculative stats
+    flask speculative expire    # expire stale rows now instead of on the next sweep
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+import metrics
+from extensions import db
+from models import Project, Script
+
+log = logging.getLogger(__name__)
+
+HISTORY = 50            # most recent scripts of a user that count towards their tones
+MIN_USES = 2            # a tone used once is not a habit
+SWEEP_INTERVAL = 600    # seconds between expiry sweeps, per process
+
+OUTCOMES = metrics.add_counter(
+    "ugc_speculative_scripts_total", "Speculative scripts by outcome.", ("outcome",))
+
+_LOCK = threading.Lock()
+_LAST_SWEEP = [0.0]
+_SWEEP_LOCK = threading.Lock()
+
+
+def enabled():
+    return current_app.config["SPECULATIVE_SCRIPTS"]
+
+
+def normalize(tone):
+    return (tone or "").strip().lower()
+
+
+def tones_query(user_id):
+    """Tones of the user's HISTORY latest scripts that were asked for (not unclaimed speculation)."""
+    # Sorted per user: scripts only reach a user through projects, so no index orders them by user
+    return (db.session.query(Script.tone)
+            .join(Project, Project.id == Script.project_id)
+            .filter(Project.user_id == user_id, Script.tone.isnot(None),
+                    db.or_(Script.speculative.is_(False), Script.claimed_at.isnot(None)))
+            .order_by(Script.created_at.desc())
+            .limit(HISTORY))
+
+
+def claim_query(persona_id, cutoff):
+    """Unclaimed speculative scripts of a persona younger than cutoff that may still complete."""
+    return (Script.query
+            .filter(Script.persona_id == persona_id, Script.speculative.is_(True),
+                    Script.claimed_at.is_(None), Script.created_at >= cutoff,
+                    Script.status.notin_(("failed", "cancelled", "expired")))
+            .order_by(Script.created_at))
+
+
+def expire_query(cutoff):
+    """Unclaimed speculative scripts older than cutoff that aren't closed yet."""
+    return Script.query.filter(
+        Script.speculative.is_(True), Script.claimed_at.is_(None), Script.created_at < cutoff,
+        Script.status.notin_(("failed", "cancelled", "expired")))
+
+
+def likely_tones(user_id, exclude=()):
+    """The user's most used script tones, most used first (at most SPECULATIVE_MAX_TONES)."""
+    counts = Counter(normalize(tone) for (tone,) in tones_query(user_id))
+    tones = [tone for tone, n in counts.most_common() if n >= MIN_USES and tone and tone not in exclude]
+    return tones[:current_app.config["SPECULATIVE_MAX_TONES"]]
+
+
+def claim(persona_id, tone):
+    """Take an unclaimed, still useful speculative script for persona and tone; None if there is none."""
+    sweep()
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["SPECULATIVE_TTL"])
+    for s in claim_query(persona_id, cutoff).all():
+        if normalize(s.tone) != normalize(tone):
+            continue
+        # Conditional, so two requests racing for the same row can't both get it
+        if Script.query.filter(Script.id == s.id, Script.claimed_at.is_(None)).update(
+                {"claimed_at": datetime.utcnow()}, synchronize_session=False):
+            db.session.commit()
+            db.session.refresh(s)
+            OUTCOMES.inc("claimed")
+            return s
+    return None
+
+
+def expire():
+    """
+    Mark unclaimed speculative scripts older than SPECULATIVE_TTL "expired"
+    and cancel the upstream jobs of those still running; returns how many.
+    """
+    import sora   # sora imports this module
+
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["SPECULATIVE_TTL"])
+    expired = []
+    for s in expire_query(cutoff).all():
+        # Conditional, so a row claimed meanwhile is left to its user
+        if Script.query.filter(Script.id == s.id, Script.claimed_at.is_(None)).update(
+                {"status": "expired"}, synchronize_session=False):
+            expired.append((s, s.status))
+    db.session.commit()
+    for s, status in expired:
+        if status != "completed":
+            sora._cancel_upstream(s)
+    if expired:
+        OUTCOMES.inc("expired", amount=len(expired))
+    return len(expired)
+
+
+def sweep():
+    now = time.monotonic()
+    with _SWEEP_LOCK:
+        if now - _LAST_SWEEP[0] < SWEEP_INTERVAL:
+            return
+        _LAST_SWEEP[0] = now
+    expire()
+
+
+def _pool(app):
+    pool = app.extensions.get("speculative")
+    if pool is None:
+        with _LOCK:
+            pool = app.extensions.get("speculative")
+            if pool is None:
+                pool = app.extensions["speculative"] = ThreadPoolExecutor(
+                    max_workers=app.config["SPECULATIVE_WORKERS"], thread_name_prefix="speculative")
+    return pool
+
+
+def _job(app, fn, persona_id):
+    try:
+        with app.app_context():
+            fn(persona_id)
+    except Exception:
+        log.exception("Speculative scripts for persona %s failed", persona_id)
+
+
+def submit(fn, persona_id):
+    """Run fn(persona_id), which queues the speculative scripts, off the request path."""
+    app = current_app._get_current_object()
+    _pool(app).submit(_job, app, fn, persona_id)
+
+
+def stats():
+    """{outcome: rows} over all speculative scripts, with the hit rate among settled ones."""
+    rows = (db.session.query(Script.claimed_at.isnot(None), Script.status, db.func.count())
+            .filter(Script.speculative.is_(True))
+            .group_by(Script.claimed_at.isnot(None), Script.status).all())
+    out = {"generated": 0, "claimed": 0, "expired": 0, "failed": 0, "open": 0}
+    for claimed, status, count in rows:
+        out["generated"] += count
+        if claimed:
+            out["claimed"] += count
+        elif status == "expired":
+            out["expired"] += count
+        elif status in ("failed", "cancelled"):
+            out["failed"] += count
+        else:
+            out["open"] += count
+    settled = out["claimed"] + out["expired"]
+    out["hit_rate"] = out["claimed"] / settled if settled else None
+    return out
+
+
+cli = AppGroup("speculative", help="Speculative scripts queued when a persona completes.")
+
+
+@cli.command("stats")
+def stats_command():
+    """Generated, claimed and wasted speculative scripts."""
+    s = stats()
+    hit = f"{s['hit_rate']:.0%}" if s["hit_rate"] is not None else "n/a"
+    click.echo(f"{s['generated']} generated: {s['claimed']} claimed, {s['expired']} expired unused (wasted), "
+               f"{s['failed']} failed, {s['open']} waiting; hit rate {hit}")
+
+
+@cli.command("expire")
+def expire_command():
+    """Expire unclaimed speculative scripts past SPECULATIVE_TTL."""
+    click.echo(f"{expire()} speculative scripts expired")
+
+
+def init_app(app):
+    env = os.environ.get
+    app.config.setdefault("SPECULATIVE_SCRIPTS", env("SPECULATIVE_SCRIPTS", "0").lower() not in ("0", "false", "no"))
+    app.config.setdefault("SPECULATIVE_MAX_TONES", int(env("SPECULATIVE_MAX_TONES", 2)))
+    app.config.setdefault("SPECULATIVE_TTL", int(env("SPECULATIVE_TTL", 3600)))   # seconds
+    app.config.setdefault("SPECULATIVE_WORKERS", 2)
+    app.cli.add_command(cli)
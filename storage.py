@@ -0,0 +1,341 @@
+"""
+Disk retention for UPLOAD_FOLDER and VIDEO_FOLDER.
+
+    flask storage scan                  # refresh the index, print usage
+    flask storage orphans [--fix]       # files with no row, rows with no file
+    flask storage enforce [--dry-run]   # age limit and quotas
+    flask storage run                   # all of the above, for cron
+
+Scans are incremental: each folder keeps a .storage-index.json of its
+directories, and a directory is only re-listed when its mtime changed.
+Files here are write-once (content-addressed blobs, uuid-named videos), so
+an unchanged directory mtime means unchanged contents.
+
+Enforcement only touches completed videos, least recently served first.
+With STORAGE_COLD_FOLDER set they are demoted (moved there and still
+served); otherwise they are deleted and the row becomes "expired". Images
+count towards quotas but are never evicted, since personas reference them
+and blobs are shared between rows.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+import locks
+from extensions import db
+from imaging import thumb_name
+from models import Image, Project, Video, VideoSegment
+
+
+INDEX_FILE = ".storage-index.json"
+TOUCH_INTERVAL = 3600   # seconds between last_accessed_at writes per video
+QUERY_CHUNK = 500       # ids per IN (...)
+
+_LAST_TOUCH = {}
+_LAST_TOUCH_LOCK = threading.Lock()
+
+
+class DirIndex:
+    """Cached listing of a folder tree, re-listing only directories whose mtime changed."""
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, INDEX_FILE)
+        try:
+            with open(self.path) as f:
+                self.dirs = json.load(f)
+        except (OSError, ValueError):
+            self.dirs = {}   # rel dir -> {"mtime": ns, "files": {name: [size, mtime]}, "dirs": [names]}
+
+    def scan(self):
+        """Refresh the index; returns (directories listed, directories reused)."""
+        # Create the index file up front so writing it below doesn't bump the root's mtime
+        open(self.path, "a").close()
+        seen, listed, reused = {}, 0, 0
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            try:
+                mtime = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            entry = self.dirs.get(rel)
+            if entry is not None and entry["mtime"] == mtime:
+                reused += 1
+            else:
+                entry = {"mtime": mtime, "files": {}, "dirs": []}
+                with os.scandir(os.path.join(self.root, rel)) as it:
+                    for e in it:
+                        if e.name == INDEX_FILE or e.name.startswith(".tmp-"):
+                            continue
+                        if e.is_dir(follow_symlinks=False):
+                            entry["dirs"].append(e.name)
+                        elif e.is_file(follow_symlinks=False):
+                            st = e.stat()
+                            entry["files"][e.name] = [st.st_size, st.st_mtime]
+                listed += 1
+            seen[rel] = entry
+            stack.extend(os.path.join(rel, d) for d in entry["dirs"])
+
+        self.dirs = seen
+        # Rewritten in place: a rename would change the root's mtime again. A
+        # torn write only costs a full rescan next time.
+        with open(self.path, "w") as f:
+            json.dump(seen, f)
+        return listed, reused
+
+    def files(self):
+        """(absolute path, size, mtime) of every indexed file."""
+        root = os.path.abspath(self.root)
+        for rel, entry in self.dirs.items():
+            for name, (size, mtime) in entry["files"].items():
+                yield os.path.join(root, rel, name), size, mtime
+
+
+def _roots():
+    cfg = current_app.config
+    return [r for r in (cfg["UPLOAD_FOLDER"], cfg["VIDEO_FOLDER"], cfg.get("STORAGE_COLD_FOLDER"))
+            if r and os.path.isdir(r)]
+
+
+def scan():
+    """Refresh every folder's index; returns {abs path: size}."""
+    files = {}
+    for root in _roots():
+        idx = DirIndex(root)
+        idx.scan()
+        files.update((path, size) for path, size, _ in idx.files())
+    return files
+
+
+def _abs(path):
+    return os.path.abspath(path) if path else None
+
+
+def referenced_paths():
+    """Absolute paths of every file some row points at."""
+    refs = set()
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    for path, digest, thumb_url in db.session.query(Image.path, Image.sha256, Image.thumb_url):
+        refs.add(_abs(path))
+        if digest and thumb_url:
+            refs.add(_abs(os.path.join(upload_root, thumb_name(digest))))
+    for row in db.session.query(Video.file_path, Video.poster_path, Video.preview_path):
+        refs.update(_abs(p) for p in row if p)
+    for (path,) in db.session.query(VideoSegment.file_path).filter(VideoSegment.file_path.isnot(None)):
+        refs.add(_abs(path))
+    return refs
+
+
+def find_orphans():
+    """
+    (files with no row, images with no file, completed videos with no file).
+    Files younger than STORAGE_ORPHAN_GRACE are skipped: they may belong to
+    an upload or download whose row is not committed yet.
+    """
+    cutoff = time.time() - current_app.config["STORAGE_ORPHAN_GRACE"]
+    roots = [os.path.abspath(r) for r in _roots()]
+    on_disk = {}
+    for root in roots:
+        idx = DirIndex(root)
+        idx.scan()
+        on_disk.update((path, mtime) for path, _, mtime in idx.files())
+
+    refs = referenced_paths()
+    files = sorted(p for p, mtime in on_disk.items() if p not in refs and mtime < cutoff)
+    images = [img for img in Image.query.all() if _abs(img.path) not in on_disk]
+    videos = [v for v in Video.query.filter(Video.status == "completed").all()
+              if not v.file_path or _abs(v.file_path) not in on_disk]
+    return files, images, videos
+
+
+def _video_size(v, sizes):
+    if v.size is not None:
+        return v.size
+    return sizes.get(_abs(v.file_path), 0)
+
+
+def _is_cold(v):
+    cold = current_app.config.get("STORAGE_COLD_FOLDER")
+    return bool(cold and v.file_path and _abs(v.file_path).startswith(os.path.abspath(cold) + os.sep))
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def evict(v):
+    """Demote v to the cold folder if there is one, else delete its files and expire it."""
+    cold = current_app.config.get("STORAGE_COLD_FOLDER")
+    if cold:
+        os.makedirs(cold, exist_ok=True)
+        target = os.path.join(cold, os.path.basename(v.file_path))
+        shutil.move(v.file_path, target)
+        v.file_path = target
+        return "demoted"
+    for path in (v.file_path, v.poster_path, v.preview_path):
+        _remove(path)
+    v.status = "expired"
+    v.file_path = v.video_url = None
+    v.poster_path = v.poster_url = v.preview_path = v.preview_url = None
+    return "expired"
+
+
+def stored_query():
+    """Completed videos with a file, with their owner: what evictions choose from."""
+    return (db.session.query(Video, Project.user_id)
+            .join(Project, Project.id == Video.project_id)
+            .filter(Video.status == "completed", Video.file_path.isnot(None)))
+
+
+def image_bytes_query(user_ids):
+    """Bytes of images per user, for the given users only."""
+    return (db.session.query(Image.user_id, db.func.sum(Image.size))
+            .filter(Image.user_id.in_(user_ids)).group_by(Image.user_id))
+
+
+def plan_evictions(sizes):
+    """Videos to evict, in order, for the age limit and the per-user/project quotas."""
+    cfg = current_app.config
+    rows = stored_query().all()
+    hot = [(v, user_id) for v, user_id in rows if not _is_cold(v)]
+    # Least recently served first
+    hot.sort(key=lambda r: r[0].last_accessed_at or r[0].completed_at or r[0].created_at)
+
+    chosen, chosen_ids = [], set()
+
+    def choose(v):
+        chosen.append(v)
+        chosen_ids.add(v.id)
+
+    if cfg["STORAGE_VIDEO_MAX_AGE_DAYS"]:
+        cutoff = datetime.utcnow() - timedelta(days=cfg["STORAGE_VIDEO_MAX_AGE_DAYS"])
+        for v, _ in hot:
+            if (v.last_accessed_at or v.completed_at or v.created_at) < cutoff:
+                choose(v)
+
+    for quota, key, extra in (
+        (cfg["STORAGE_USER_QUOTA_BYTES"], lambda r: r[1], lambda: _image_bytes_by_user({u for _, u in hot})),
+        (cfg["STORAGE_PROJECT_QUOTA_BYTES"], lambda r: r[0].project_id, lambda: {}),
+    ):
+        if not quota:
+            continue
+        usage = extra()
+        for v, user_id in hot:
+            if v.id not in chosen_ids:
+                k = key((v, user_id))
+                usage[k] = usage.get(k, 0) + _video_size(v, sizes)
+        for v, user_id in hot:
+            k = key((v, user_id))
+            # Keys are only counted for videos not already chosen by age
+            if v.id not in chosen_ids and usage[k] > quota:
+                choose(v)
+                usage[k] -= _video_size(v, sizes)
+    return chosen
+
+
+def _image_bytes_by_user(user_ids):
+    # Only owners of stored videos can be over quota; per user, so it reads ix_images_user_created
+    # instead of aggregating every image
+    user_ids = [u for u in user_ids if u is not None]
+    totals = {}
+    for i in range(0, len(user_ids), QUERY_CHUNK):
+        totals.update((user_id, total or 0) for user_id, total in image_bytes_query(user_ids[i:i + QUERY_CHUNK]))
+    return totals
+
+
+def touch(file_path):
+    """Record that a video file was served, at most once per TOUCH_INTERVAL."""
+    now = time.monotonic()
+    with _LAST_TOUCH_LOCK:
+        if now - _LAST_TOUCH.get(file_path, float("-inf")) < TOUCH_INTERVAL:
+            return
+        if len(_LAST_TOUCH) > 100000:
+            _LAST_TOUCH.clear()
+        _LAST_TOUCH[file_path] = now
+    Video.query.filter(Video.file_path == file_path).update(
+        {"last_accessed_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+
+cli = AppGroup("storage", help="Disk usage, orphans and retention for uploads and videos.")
+
+
+@cli.command("scan")
+def scan_command():
+    """Refresh the incremental index and print usage per folder."""
+    for root in _roots():
+        idx = DirIndex(root)
+        listed, reused = idx.scan()
+        total = sum(size for _, size, _ in idx.files())
+        click.echo(f"{root}: {total / 1e6:.1f} MB in {sum(1 for _ in idx.files())} files "
+                   f"({listed} dirs listed, {reused} unchanged)")
+
+
+@cli.command("orphans")
+@click.option("--fix", is_flag=True, help="Delete orphan files and expire videos whose file is gone.")
+def orphans_command(fix):
+    """Report files with no row and rows with no file."""
+    files, images, videos = find_orphans()
+    for path in files:
+        click.echo(f"file without row: {path}")
+    for img in images:
+        click.echo(f"image {img.id} missing file {img.path}")
+    for v in videos:
+        click.echo(f"video {v.id} missing file {v.file_path}")
+    if fix:
+        for path in files:
+            _remove(path)
+        for v in videos:
+            evict(v)
+        db.session.commit()
+    click.echo(f"{len(files)} orphan files, {len(images)} images and {len(videos)} videos without files"
+               + (" (fixed files and videos)" if fix else ""))
+
+
+@cli.command("enforce")
+@click.option("--dry-run", is_flag=True, help="Only print what would be evicted.")
+def enforce_command(dry_run):
+    """Apply STORAGE_VIDEO_MAX_AGE_DAYS and the per-user/project quotas."""
+    chosen = plan_evictions(scan())
+    for v in chosen:
+        action = "would evict" if dry_run else evict(v)
+        click.echo(f"{action}: video {v.id} ({v.file_path})")
+        if not dry_run:
+            db.session.commit()
+    click.echo(f"{len(chosen)} videos {'to evict' if dry_run else 'evicted'}")
+
+
+@cli.command("run")
+@click.pass_context
+def run_command(ctx):
+    """Scan, fix orphans and enforce retention in one go."""
+    # Cron may fire this on every host; one run at a time is enough
+    with locks.hold("storage:run", ttl=3600) as token:
+        if token is None:
+            click.echo("storage run already in progress elsewhere, skipping")
+            return
+        ctx.invoke(scan_command)
+        ctx.invoke(orphans_command, fix=True)
+        ctx.invoke(enforce_command, dry_run=False)
+
+
+def init_app(app):
+    env = os.environ.get
+    app.config.setdefault("STORAGE_USER_QUOTA_BYTES", int(env("STORAGE_USER_QUOTA_BYTES", 0)))
+    app.config.setdefault("STORAGE_PROJECT_QUOTA_BYTES", int(env("STORAGE_PROJECT_QUOTA_BYTES", 0)))
+    app.config.setdefault("STORAGE_VIDEO_MAX_AGE_DAYS", float(env("STORAGE_VIDEO_MAX_AGE_DAYS", 0)))
+    app.config.setdefault("STORAGE_COLD_FOLDER", env("STORAGE_COLD_FOLDER"))
+    app.config.setdefault("STORAGE_ORPHAN_GRACE", int(env("STORAGE_ORPHAN_GRACE", 3600)))
+    app.cli.add_command(cli)
@@ -0,0 +1,53 @@
+"""
+Fixtures for the tests: the app on a scratch SQLite database, seeded like one
+that has been running for a while, with the in-process fake OpenAI.
+"""
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bench  # noqa: E402
+import worker  # noqa: E402
+from extensions import db  # noqa: E402
+from fake_openai import FakeOpenAI  # noqa: E402
+from models import Persona, Project, Script  # noqa: E402
+
+SEED_VIDEOS = 2000
+
+
+def _seed_extra():
+    """Rows the generic seed lacks: policy decisions and speculative scripts, claimable and stale."""
+    now = datetime.utcnow()
+    db.session.query(Script).filter(Script.status.in_(("completed", "failed"))).update(
+        {"model": "gpt-5", "reasoning_effort": "low", "verbosity": "medium"}, synchronize_session=False)
+    db.session.query(Persona).filter(Persona.status.in_(("completed", "failed"))).update(
+        {"model": "gpt-5", "reasoning_effort": "medium", "verbosity": "medium"}, synchronize_session=False)
+    persona = Persona.query.filter_by(status="completed").first()
+    for i in range(10):
+        db.session.add(Script(persona_id=persona.id, project_id=persona.project_id, tone="casual",
+                              status="completed", script_txt="", speculative=True,
+                              created_at=now - timedelta(hours=2 * (i % 2))))
+    db.session.commit()
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    app = bench.build_app(str(tmp_path_factory.mktemp("app")),
+                          openai_client=FakeOpenAI(job_seconds=0.05, video_seconds=0.1),
+                          FFMPEG_BINARY=shutil.which("false") or "/bin/false")
+    worker._configure(app)
+    bench.seed_rows(app, SEED_VIDEOS)
+    with app.app_context():
+        _seed_extra()
+        yield app
+
+
+@pytest.fixture
+def user_id(app):
+    """A seeded user that owns projects, personas and scripts."""
+    return db.session.query(Project.user_id).join(Persona, Persona.project_id == Project.id).first()[0]
@@ -0,0 +1,15 @@
+"""The benchmark's own arithmetic."""
+import pytest
+
+import bench
+
+
+@pytest.mark.parametrize("n, p, expected", [
+    (10, 50, 5), (100, 95, 95), (100, 99, 99), (20, 95, 19), (20, 100, 20), (1, 99, 1), (10, 0, 1),
+])
+def test_percentile_nearest_rank(n, p, expected):
+    assert bench._percentile(list(range(1, n + 1)), p) == expected
+
+
+def test_percentile_empty():
+    assert bench._percentile([], 95) == 0.0
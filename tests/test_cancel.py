@@ -0,0 +1,46 @@
+"""
+Cancelling a persona: its waiting scripts go with it, unless the persona
+itself had already finished.
+"""
+import pytest
+
+from extensions import db
+from models import Persona, Project, Script, User
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    assert client.post("/auth/dev-login", data={"email": "cancel@example.com"}).status_code == 200
+    return client
+
+
+def _persona_with_script(persona_status):
+    user = User.query.filter_by(email="cancel@example.com").one()
+    project = Project(user_id=user.id, name="cancel")
+    db.session.add(project)
+    db.session.flush()
+    persona = Persona(project_id=project.id, image_id="none", product_name="p", description="d",
+                      persona_json={}, status=persona_status)
+    db.session.add(persona)
+    db.session.flush()
+    script = Script(persona_id=persona.id, project_id=project.id, tone="casual", status="processing")
+    db.session.add(script)
+    db.session.commit()
+    return persona.id, script.id
+
+
+def test_cancel_finished_persona_leaves_scripts(client):
+    persona_id, script_id = _persona_with_script("completed")
+    r = client.post(f"/api/persona/{persona_id}/cancel")
+    assert r.status_code == 409
+    assert r.get_json()["status"] == "completed"
+    assert db.session.get(Script, script_id).status == "processing"
+
+
+def test_cancel_persona_cascades_to_scripts(client):
+    persona_id, script_id = _persona_with_script("processing")
+    r = client.post(f"/api/persona/{persona_id}/cancel")
+    assert r.status_code == 200
+    assert r.get_json()["cancelled"] == {"personas": 1, "scripts": 1, "videos": 0}
+    assert db.session.get(Script, script_id).status == "cancelled"
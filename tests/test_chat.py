@@ -0,0 +1,54 @@
+"""Chat history stays whole user/assistant pairs, whatever happens to a turn."""
+import pytest
+
+import chat_server
+from fake_openai import FakeOpenAI
+
+
+class _Broken:
+    """A stream that fails after its first chunk."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __iter__(self):
+        for i, chunk in enumerate(self._stream):
+            if i == 1:
+                raise RuntimeError("upstream reset")
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+@pytest.fixture
+def chat():
+    fake = FakeOpenAI(job_seconds=0)
+    app = chat_server.create_app(openai_client=fake)
+    return app.test_client(), fake
+
+
+def _session(client, message="Write a hook", **extra):
+    r = client.post("/chat", json={"message": message, **extra})
+    return r.get_json()["session_id"]
+
+
+def test_failed_stream_is_not_recorded(chat, monkeypatch):
+    client, fake = chat
+    session_id = _session(client)
+    create = fake.chat.completions.create
+    monkeypatch.setattr(fake.chat.completions, "create", lambda **kw: _Broken(create(**kw)))
+    body = client.post("/chat", json={"message": "Shorter", "session_id": session_id, "stream": True}).get_data(
+        as_text=True)
+    assert "event: error" in body
+    conv = chat_server.SESSIONS[session_id]
+    assert [m["role"] for m in conv.history] == ["user", "assistant"]
+
+
+def test_stale_turn_is_not_recorded():
+    conv = chat_server.Conversation("s")
+    revision = conv.revision
+    assert conv.record("first", "reply", None, revision)
+    assert not conv.record("raced", "reply", None, revision)
+    assert not conv.record("empty", "", None, conv.revision)
+    assert [m["content"] for m in conv.history] == ["first", "reply"]
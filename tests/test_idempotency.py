@@ -0,0 +1,50 @@
+"""Idempotency-Key: a failed request gives its key back only if it wrote nothing."""
+import io
+
+import pytest
+
+import bench
+import persona_index
+from models import Persona
+
+
+@pytest.fixture
+def form(app):
+    client = app.test_client()
+    client.post("/auth/dev-login", data={"email": "idempotency@example.com"})
+    project_id = client.post("/api/project", data={"name": "idempotency", "description": "d"}).get_json()["project_id"]
+    image_id = client.post("/api/save-img", data={"image": (io.BytesIO(bench._make_image(16)), "product.jpg")},
+                           content_type="multipart/form-data").get_json()["image_id"]
+    return client, {"description": "A bottle", "product_name": "Bottle", "person_description": "Hiker",
+                    "image_id": image_id, "project_id": project_id}
+
+
+def test_failure_after_commit_is_replayed(app, form):
+    client, data = form
+    fake = app.extensions["openai_client"]
+    before = Persona.query.count()
+    fake.error_rate = 1.0   # the row is committed, then the upstream call fails
+    try:
+        first = client.post("/api/persona", data=data, headers={"Idempotency-Key": "after-commit"})
+    finally:
+        fake.error_rate = 0.0
+    retry = client.post("/api/persona", data=data, headers={"Idempotency-Key": "after-commit"})
+    assert first.status_code == retry.status_code == 500
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert Persona.query.count() == before + 1
+
+
+def test_failure_before_any_write_releases_key(app, form, monkeypatch):
+    client, data = form
+    data = {**data, "reuse": "auto"}
+
+    def broken():
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(persona_index, "get_index", broken)
+    first = client.post("/api/persona", data=data, headers={"Idempotency-Key": "no-write"})
+    monkeypatch.undo()
+    retry = client.post("/api/persona", data=data, headers={"Idempotency-Key": "no-write"})
+    assert first.status_code == 500
+    assert retry.status_code == 202
+    assert "Idempotent-Replayed" not in retry.headers
@@ -0,0 +1,35 @@
+"""Lock leases held through long work, and once-only claims that need no lock."""
+import time
+
+import locks
+import sora
+from extensions import db
+from models import Image, Lock, Persona
+
+
+def test_keeper_renews_until_lost(app):
+    token = locks.acquire("test:keeper", ttl=60)
+    alive = locks.keeper("test:keeper", token, ttl=0.03)
+    time.sleep(0.02)
+    assert alive()
+    # Expired and taken over by someone else
+    Lock.query.filter_by(name="test:keeper").update({"expires_at": None})
+    db.session.commit()
+    assert locks.acquire("test:keeper") == token + 1
+    assert alive()          # not due for renewal yet
+    time.sleep(0.02)
+    assert not alive()
+
+
+def test_speculation_claims_persona_once(app):
+    seeded = Persona.query.filter_by(status="completed").first()
+    image = db.session.get(Image, seeded.image_id)
+    persona = Persona(project_id=seeded.project_id, image_id=image.id, product_name="p", description="d",
+                      persona_json={}, persona_txt="t", status="completed")
+    db.session.add(persona)
+    db.session.commit()
+    first = sora.speculate_scripts(persona.id)
+    assert first
+    assert sora.speculate_scripts(persona.id) == []
+    assert db.session.get(Persona, persona.id).speculated_at is not None
+    assert not Lock.query.filter(Lock.name.like("speculate:%")).count()
@@ -0,0 +1,210 @@
+"""
+Query plans of the sweeps and lookups the app and worker run, on a seeded
+SQLite database without ANALYZE (as a deployed app.db is).
+
+A plan fails on:
+  - a full scan of a table (SCAN <table>, with or without an index),
+  - an index whose only constraint is `col IS NULL` (batch_id, claimed_at:
+    NULL on nearly every row, so it narrows nothing),
+  - a temp B-tree in a listing, i.e. an ORDER BY the index doesn't serve.
+
+test_builder_plans pins the index each query builder must use, so a
+change that makes SQLite pick a worse one fails too. The other tests run
+the real functions (and one full request flow) and plan every statement
+they send, so queries written inline are covered as well.
+"""
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import bench
+import persona_index
+import policy
+import speculative
+import storage
+import worker
+from extensions import db
+from models import Persona, Script
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+_NULL_ONLY = re.compile(r"USING (?:COVERING )?INDEX \w+ \((\w+)=\?\)")
+_INDEX = re.compile(r"INDEX (\w+)")
+
+
+def plan(sql, params=()):
+    rows = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[-1] for row in rows]
+
+
+def compiled(query):
+    """(sql, params) of an ORM query as SQLite receives it."""
+    c = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True})
+    return c.string, tuple(c.params[name] for name in c.positiontup)
+
+
+def problems(sql, steps, listing=True):
+    found = []
+    for step in steps:
+        scan = _SCAN.match(step)
+        if scan and scan.group(1) in db.metadata.tables:
+            found.append(f"full scan: {step}")
+        null_only = _NULL_ONLY.search(step)
+        if null_only and re.search(rf"\b{null_only.group(1)} IS NULL", sql):
+            found.append(f"low-selectivity index: {step}")
+        if listing and step.startswith("USE TEMP B-TREE"):
+            found.append(f"sort: {step}")
+    return found
+
+
+@contextmanager
+def statements():
+    """Collect the distinct (sql, params) of every SELECT/UPDATE/DELETE run inside the block."""
+    seen = {}
+
+    def record(conn, cursor, sql, params, context, executemany):
+        if not executemany and sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            seen.setdefault(sql, tuple(params or ()))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def assert_plans(seen, listing=True):
+    assert seen, "nothing was queried"
+    failures = []
+    for sql, params in seen.items():
+        steps = plan(sql, params)
+        failures += [f"{p}\n    {sql}" for p in problems(sql, steps, listing)]
+    assert not failures, "\n".join(failures)
+
+
+NOW = datetime.utcnow()
+
+# (name, query builder, index (or indexes, if equally good) the main table must be read through, is a listing)
+BUILDERS = [
+    ("reconcile personas", lambda: worker.reconcile_query(Persona, "queued"), "ix_personas_status_created", True),
+    ("reconcile scripts", lambda: worker.reconcile_query(Script, "in_progress"), "ix_scripts_status_created", True),
+    ("download sweep", lambda: worker.downloads_query("in_progress", NOW), "ix_videos_status_created", True),
+    ("preview sweep", worker.previews_query, "ix_videos_status_poster_completed", True),
+    ("policy persona stats", lambda: policy.stats_query(Persona, "completed", False),
+     "ix_personas_status_created", True),
+    ("policy fused stats", lambda: policy.stats_query(Script, "failed", True), "ix_scripts_status_created", True),
+    ("speculative claim", lambda: speculative.claim_query("x", NOW), "ix_scripts_persona_created", True),
+    ("speculative expiry", lambda: speculative.expire_query(NOW), "ix_scripts_speculative_claimed", True),
+    # Sorted by design: scripts reach a user only through projects, so the sort covers one user's rows
+    ("user tones", lambda: speculative.tones_query("x"), "ix_scripts_project_created", False),
+    # The storage sweep's whole input by design: every stored video, unordered, so any
+    # index leading with status serves it (which one SQLite takes follows creation order)
+    ("stored videos", storage.stored_query, ("ix_videos_status_created", "ix_videos_status_poster_completed"), True),
+    ("image bytes", lambda: storage.image_bytes_query(["x", "y"]), "ix_images_user_created", True),
+    ("persona index rows", lambda: persona_index.completed_query("x").with_entities(Persona.id, Persona.updated_at),
+     "ix_personas_project_status_updated", True),
+    ("persona index watermark", lambda: persona_index.watermark_query("x"),
+     "ix_personas_project_status_updated", True),
+]
+
+
+@pytest.mark.parametrize("name, build, index, listing", BUILDERS, ids=[b[0] for b in BUILDERS])
+def test_builder_plans(app, name, build, index, listing):
+    sql, params = compiled(build())
+    steps = plan(sql, params)
+    assert not problems(sql, steps, listing), steps
+    used = {m for step in steps for m in _INDEX.findall(step)}
+    expected = {index} if isinstance(index, str) else set(index)
+    assert used & expected, f"expected {' or '.join(sorted(expected))}, plan: {steps}"
+
+
+def test_worker_sweeps(app, tmp_path):
+    app.config["BATCH_FOLDER"] = str(tmp_path)
+    stop = threading.Event()
+    with statements() as seen:
+        worker.reconcile(stop)
+        worker.downloads(stop)
+        worker.postprocess(stop)
+        worker.submit(stop)
+    assert_plans(seen)
+
+
+def test_policy_stats(app):
+    policy._STATS.clear()
+    with statements() as seen:
+        for stage in ("persona", "script", "fused"):
+            policy.stats(stage)
+    assert_plans(seen)
+
+
+def test_speculative(app, user_id):
+    persona = Persona.query.filter_by(status="completed").first()
+    speculative._LAST_SWEEP[0] = 0.0
+    with statements() as seen:
+        speculative.claim(persona.id, "casual")
+        speculative.expire()
+    assert_plans(seen)
+    with statements() as seen:
+        speculative.likely_tones(user_id)
+    assert_plans(seen, listing=False)
+
+
+def test_plan_evictions(app):
+    app.config.update(STORAGE_USER_QUOTA_BYTES=1, STORAGE_PROJECT_QUOTA_BYTES=1, STORAGE_VIDEO_MAX_AGE_DAYS=1)
+    try:
+        with statements() as seen:
+            assert storage.plan_evictions({})
+    finally:
+        app.config.update(STORAGE_USER_QUOTA_BYTES=0, STORAGE_PROJECT_QUOTA_BYTES=0, STORAGE_VIDEO_MAX_AGE_DAYS=0)
+    assert_plans(seen)
+
+
+def test_persona_search(app, user_id):
+    index = persona_index.PersonaIndex()
+    with statements() as seen:
+        index.search(user_id, "bench bottle")
+    assert_plans(seen)
+
+
+def test_request_flow(app):
+    """Every statement of a persona -> script -> video flow through the API."""
+    with statements() as seen:
+        outcome = bench.run_user(app, bench.Recorder(), 0, 1, bench._make_image(16), 0.02, 30)
+    assert outcome == ["completed"]
+    assert_plans(seen)
+
+
+def test_batch_flow(app, tmp_path):
+    """The same flow with mode=batch, while `flask batch run` runs in a loop as cron would."""
+    app.config["BATCH_FOLDER"] = str(tmp_path)
+    stop = threading.Event()
+    with statements() as seen:
+        runner = threading.Thread(target=bench.run_batches, args=(app, stop, 0.05), daemon=True)
+        runner.start()
+        try:
+            outcome = bench.run_user(app, bench.Recorder(), 1, 1, bench._make_image(16), 0.02, 30, mode="batch")
+        finally:
+            stop.set()
+            runner.join()
+    assert outcome == ["completed"]
+    assert_plans(seen)
+
+
+def test_webhooks(app):
+    """Signed completion events for the flow's jobs, looked up by job id."""
+    fake = app.extensions["openai_client"]
+    app.config["OPENAI_WEBHOOK_SECRET"] = bench.WEBHOOK_SECRET
+    client = app.test_client()
+    try:
+        bench.run_user(app, bench.Recorder(), 2, 1, bench._make_image(16), 0.02, 30)
+        with statements() as seen:
+            for event in fake.due_events():
+                body, headers = fake.sign_event(event, bench.WEBHOOK_SECRET)
+                assert client.post("/api/webhooks/openai", data=body, headers=headers).status_code == 200
+    finally:
+        app.config["OPENAI_WEBHOOK_SECRET"] = None
+    assert_plans(seen)
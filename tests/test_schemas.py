@@ -0,0 +1,38 @@
+"""Structured output parsing: one JSON decode per output, with or without the product."""
+import json
+
+import pytest
+
+import schemas
+from fake_openai import DEFAULT_STRUCTURED
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    loads = json.loads
+    monkeypatch.setattr(schemas.json, "loads", lambda s, *a, **kw: calls.append(s) or loads(s, *a, **kw))
+    return calls
+
+
+@pytest.mark.parametrize("name, product", [("persona", False), ("persona_product", True)])
+def test_parse_persona(decodes, name, product):
+    output = json.dumps(DEFAULT_STRUCTURED[name])
+    profile, data, product_json = schemas.parse_persona(output)
+    assert isinstance(profile, schemas.PersonaProfile)
+    assert (product_json is not None) == product
+    assert len(decodes) == 1
+
+
+@pytest.mark.parametrize("name, product", [("persona_script", False), ("persona_product_script", True)])
+def test_parse_persona_script(decodes, name, product):
+    output = json.dumps(DEFAULT_STRUCTURED[name])
+    fused, data, product_json = schemas.parse_persona_script(output)
+    assert isinstance(fused.script, schemas.AdScript)
+    assert (product_json is not None) == product
+    assert len(decodes) == 1
+
+
+def test_parse_invalid_keeps_raw(decodes):
+    assert schemas.parse_persona("not json") == (None, {"raw": "not json"}, None)
+    assert schemas.parse_persona_script('{"persona": {}}') == (None, {"raw": '{"persona": {}}'}, None)
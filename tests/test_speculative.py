@@ -0,0 +1,33 @@
+"""Expiring unclaimed speculative scripts."""
+from datetime import datetime, timedelta
+
+import speculative
+from extensions import db
+from models import Persona, Script
+
+
+def _stale(persona, job_id, status, claimed=False):
+    s = Script(persona_id=persona.id, project_id=persona.project_id, tone="casual", status=status,
+               script_txt="", speculative=True, openai_job_id=job_id,
+               claimed_at=datetime.utcnow() if claimed else None,
+               created_at=datetime.utcnow() - timedelta(hours=2))
+    db.session.add(s)
+    db.session.commit()
+    return s.id
+
+
+def test_expire_cancels_running_jobs(app):
+    fake = app.extensions["openai_client"]
+    persona = Persona.query.filter_by(status="completed").first()
+    running = fake._new_job("response", 3600)
+    done = fake._new_job("response", 0)
+    running_id = _stale(persona, running["id"], "processing")
+    done_id = _stale(persona, done["id"], "completed")
+    claimed_id = _stale(persona, fake._new_job("response", 3600)["id"], "processing", claimed=True)
+
+    assert speculative.expire() >= 2
+    assert db.session.get(Script, running_id).status == "expired"
+    assert running.get("cancelled")
+    assert db.session.get(Script, done_id).status == "expired"
+    assert not done.get("cancelled")
+    assert db.session.get(Script, claimed_id).status == "processing"
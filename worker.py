@@ -0,0 +1,365 @@
+"""
+Background worker for the sora.py app. It runs next to the web tier and
+shares only the database and the storage folders with it.
+
+    python worker.py                                   # one process per loop
+    python worker.py --loops downloads=4,reconcile     # scale video I/O on its own
+    python worker.py --once                            # a single pass of each loop
+
+Loops:
+  reconcile    polls unfinished persona/script jobs, so rows complete even
+               when webhooks are lost and clients stop polling, and expires
+               unclaimed speculative scripts
+  downloads    polls unfinished videos and downloads finished renders (and
+               stitches long-form segments), and takes over downloads whose
+               holder died (expired lease)
+  submit       Batch API dispatch: collect, compile and submit
+  postprocess  poster frames and previews for videos that have none
+
+Each loop runs in its own spawned process with its own app, DB pool and
+OpenAI client; a process that dies is restarted. reconcile, submit and
+postprocess are singletons across every host: they run where they hold the
+"worker:<loop>" lock (see locks.py) and other copies stand by, taking over
+once the holder's lock expires. downloads scales out, one video lease at a
+time. SIGTERM or SIGINT stops
+every loop after the item in hand, leases still held are released, and the
+parent kills whatever hasn't exited after --drain-timeout. Run the web tier
+with INLINE_DOWNLOADS=0 so that only workers fetch videos.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+import batches
+import locks
+import previews
+import sora
+import speculative
+from extensions import db
+from metrics import upstream
+from models import Batch, Persona, Script, Video, VideoSegment
+
+log = logging.getLogger("worker")
+
+LOOPS = {}          # name -> (function(stop) -> items handled, idle seconds, singleton)
+BUSY_PAUSE = 0.5    # seconds between passes that found work
+ROWS_PER_PASS = 100
+
+_NO_PREVIEW = set()   # video ids postprocess already tried
+
+
+def loop(name, idle, singleton=False):
+    def register(fn):
+        LOOPS[name] = (fn, idle, singleton)
+        return fn
+    return register
+
+
+def _configure(app):
+    env = os.environ.get
+    app.config.setdefault("WORKER_POLL_INTERVAL", float(env("WORKER_POLL_INTERVAL", 5)))
+    app.config.setdefault("WORKER_LEASE_SECONDS", int(env("WORKER_LEASE_SECONDS", 60)))
+    app.config.setdefault("BATCH_INTERVAL", float(env("BATCH_INTERVAL", 60)))
+    # Workers have no request to take a host from when building video URLs
+    app.config.setdefault("PUBLIC_BASE_URL", env("PUBLIC_BASE_URL", "http://localhost:5000"))
+
+
+# Sweeps run one query per status and merge: each then reads the (status, created_at)
+# index in order, where an IN list needs a sort and lets SQLite pick batch_id IS NULL
+# (true of nearly every row) as the "selective" filter instead.
+
+def reconcile_query(model, status):
+    """Persona or Script rows of one status waiting on a non-batch upstream job, oldest first."""
+    return (model.query
+            .filter(model.status == status, model.openai_job_id.isnot(None), model.batch_id.is_(None))
+            .order_by(model.created_at).limit(ROWS_PER_PASS))
+
+
+def downloads_query(status, now):
+    """Unleased (or lease-expired) videos of one status the download loop may take, oldest first."""
+    return (Video.query
+            .filter(Video.status == status,
+                    db.or_(Video.openai_job_id.isnot(None), Video.segments.isnot(None)),
+                    db.or_(Video.lease_expires_at.is_(None), Video.lease_expires_at < now))
+            .order_by(Video.created_at).limit(ROWS_PER_PASS))
+
+
+def previews_query():
+    """Completed videos without a poster that postprocess hasn't given up on, oldest first."""
+    return (db.session.query(Video.id)
+            .filter(Video.status == "completed", Video.file_path.isnot(None), Video.poster_path.is_(None),
+                    Video.id.notin_(_NO_PREVIEW))
+            .order_by(Video.completed_at).limit(ROWS_PER_PASS))
+
+
+def _oldest(queries):
+    return sorted((row for query in queries for row in query), key=lambda row: row.created_at)[:ROWS_PER_PASS]
+
+
+@loop("reconcile", idle=2, singleton=True)
+def reconcile(stop):
+    interval = current_app.config["WORKER_POLL_INTERVAL"]
+    handled = 0
+    for model, kind, apply in ((Persona, "persona", sora.apply_persona_response),
+                               (Script, "script", sora.apply_script_response)):
+        rows = _oldest(reconcile_query(model, status) for status in sora.ACTIVE_STATUSES)
+        for row in rows:
+            # Fused rows complete together, so the Script may be done by now
+            if stop.is_set() or row.status in sora.TERMINAL_STATUSES:
+                continue
+            if not sora.poll_due(kind, row.id, interval):
+                continue
+            try:
+                with upstream(row.model or "gpt-5", "responses.retrieve"):
+                    resp = sora.get_client().responses.retrieve(row.openai_job_id)
+                apply(row, resp)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                log.warning("Reconciling %s %s failed: %s", kind, row.id, e)
+            handled += 1
+    speculative.sweep()
+    return handled
+
+
+def _lease(v):
+    """Lease a video for one poll so other download workers skip it."""
+    now = datetime.utcnow()
+    leased = Video.query.filter(
+        Video.id == v.id,
+        db.or_(Video.lease_expires_at.is_(None), Video.lease_expires_at < now),
+    ).update({
+        "lease_owner": sora.lease_owner(),
+        "lease_expires_at": now + timedelta(seconds=current_app.config["WORKER_LEASE_SECONDS"]),
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(leased)
+
+
+def release_leases():
+    """Give back every lease this process holds; unfinished downloads are retried."""
+    owner = sora.lease_owner()
+    for model in (Video, VideoSegment):
+        model.query.filter(model.lease_owner == owner, model.status == "downloading").update(
+            {"status": "in_progress"}, synchronize_session=False)
+        model.query.filter(model.lease_owner == owner).update(
+            {"lease_owner": None, "lease_expires_at": None}, synchronize_session=False)
+    db.session.commit()
+
+
+@loop("downloads", idle=2)
+def downloads(stop):
+    interval = current_app.config["WORKER_POLL_INTERVAL"]
+    now = datetime.utcnow()
+    rows = _oldest(downloads_query(status, now) for status in sora.ACTIVE_STATUSES + ("downloading",))
+    handled = 0
+    for v in rows:
+        if stop.is_set():
+            break
+        if v.status == "downloading":
+            # Its downloader died; the render is known to be finished
+            try:
+                if v.segments:
+                    sora.stitch_video(v)
+                else:
+                    sora.download_video(v)
+            except Exception as e:
+                log.warning("Download of video %s failed: %s", v.id, e)
+            handled += 1
+            continue
+        # Segments are throttled one by one in refresh_segments
+        if not (v.segments or sora.poll_due("video", v.id, interval)) or not _lease(v):
+            continue
+        try:
+            if v.segments:
+                sora.refresh_segments(v, interval)
+            else:
+                with upstream("sora-2", "videos.retrieve"):
+                    resp = sora.get_client().videos.retrieve(v.openai_job_id)
+                sora.apply_video_response(v, resp)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log.warning("Video %s failed: %s", v.id, e)
+        # Drop the poll lease unless a download now holds it
+        Video.query.filter(Video.id == v.id, Video.lease_owner == sora.lease_owner(),
+                           Video.status != "downloading").update(
+            {"lease_owner": None, "lease_expires_at": None}, synchronize_session=False)
+        db.session.commit()
+        handled += 1
+    return handled
+
+
+@loop("submit", idle=60, singleton=True)
+def submit(stop):
+    for b in Batch.query.filter(Batch.status.in_(batches.OPEN), Batch.openai_batch_id.isnot(None)).all():
+        if stop.is_set():
+            return 0
+        sora.collect_batch(b)
+    sora.compile_batches()
+    for b in Batch.query.filter(Batch.status == "compiled", Batch.request_count > 0).all():
+        if stop.is_set():
+            break
+        try:
+            sora.submit_batch(b)
+        except Exception as e:
+            db.session.rollback()
+            log.warning("Submitting batch %s failed: %s", b.id, e)
+    return 0   # batches take minutes at least; always wait BATCH_INTERVAL
+
+
+@loop("postprocess", idle=10, singleton=True)
+def postprocess(stop):
+    if not previews.ffmpeg():
+        return 0
+    ids = [vid for (vid,) in previews_query()]
+    handled = 0
+    for vid in ids:
+        if stop.is_set():
+            break
+        if not previews.generate(vid):
+            _NO_PREVIEW.add(vid)
+        handled += 1
+    return handled
+
+
+class _Leadership:
+    """
+    The stop flag a singleton loop sees during a pass. It renews the loop's
+    lock every third of LOCK_TTL and reads as set once the lock is lost, so
+    a pass stops at the next item instead of running beside the new holder.
+    """
+
+    def __init__(self, stop, name, token):
+        self.stop, self.name, self.token = stop, name, token
+        self.ttl = current_app.config["LOCK_TTL"]
+        self.renew_at = time.monotonic() + self.ttl / 3
+        self.lost = False
+
+    def is_set(self):
+        if self.stop.is_set() or self.lost:
+            return True
+        if time.monotonic() >= self.renew_at:
+            self.lost = not locks.renew(self.name, self.token)
+            self.renew_at = time.monotonic() + self.ttl / 3
+        return self.lost
+
+
+def _lead(name, token):
+    """Renew or take the singleton lock for a loop; the token, or None while another node leads."""
+    if token is not None and locks.renew(name, token):
+        return token
+    token = locks.acquire(name)
+    if token is not None:
+        log.info("Leading %s (token %s)", name, token)
+    return token
+
+
+def run_loop(name, stop, once=False, app=None):
+    """Body of one worker process: run loop name until stop is set."""
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s {name}[%(process)d] %(levelname)s %(message)s")
+    app = app or sora.create_app({"INLINE_DOWNLOADS": True})
+    _configure(app)
+    fn, idle, singleton = LOOPS[name]
+    if name == "submit":
+        idle = app.config["BATCH_INTERVAL"]
+    lock, token = f"worker:{name}", None
+
+    # A request context so url_for(..., _external=True) can build video URLs
+    with app.test_request_context(base_url=app.config["PUBLIC_BASE_URL"]):
+        try:
+            while not stop.is_set():
+                try:
+                    if singleton:
+                        token = _lead(lock, token)
+                        if token is None:
+                            # Standby; check again well within the holder's LOCK_TTL
+                            if once:
+                                break
+                            stop.wait(min(idle, app.config["LOCK_TTL"] / 3))
+                            continue
+                        handled = fn(_Leadership(stop, lock, token))
+                    else:
+                        handled = fn(stop)
+                except Exception:
+                    log.exception("Loop %s crashed", name)
+                    db.session.rollback()
+                    handled = 0
+                if once:
+                    break
+                stop.wait(BUSY_PAUSE if handled else idle)
+        finally:
+            db.session.rollback()
+            release_leases()
+            if token is not None:
+                locks.release(lock, token)   # a standby takes over without waiting out the TTL
+            db.session.remove()
+
+
+def parse_loops(spec):
+    """"downloads=4,reconcile" -> [("downloads", 4), ("reconcile", 1)]"""
+    loops = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, count = part.partition("=")
+        if name not in LOOPS:
+            raise ValueError(f"unknown loop {name!r} (choose from {', '.join(LOOPS)})")
+        loops.append((name, int(count or 1)))
+    return loops
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the UGC generator's background loops.")
+    parser.add_argument("--loops", default=",".join(LOOPS),
+                        help="comma-separated loop[=processes], e.g. downloads=4,reconcile")
+    parser.add_argument("--once", action="store_true", help="run one pass of each loop and exit")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="seconds to wait for loops to finish their current item on shutdown")
+    args = parser.parse_args(argv)
+    try:
+        loops = parse_loops(args.loops)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # spawn: each process builds its own app, engine and client
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+
+    def start(name, i):
+        p = ctx.Process(target=run_loop, args=(name, stop, args.once), name=f"{name}-{i}")
+        p.start()
+        return p
+
+    procs = {(name, i): start(name, i) for name, count in loops for i in range(count)}
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    while not stop.wait(1):
+        if args.once and not any(p.is_alive() for p in procs.values()):
+            break
+        for key, p in procs.items():
+            if not args.once and not p.is_alive():
+                print(f"worker {p.name} exited ({p.exitcode}), restarting", file=sys.stderr)
+                procs[key] = start(*key)
+
+    # Drain: loops finish the item in hand and release their leases
+    deadline = time.monotonic() + args.drain_timeout
+    for p in procs.values():
+        p.join(max(0.0, deadline - time.monotonic()))
+    for p in procs.values():
+        if p.is_alive():
+            print(f"worker {p.name} did not drain in time, terminating", file=sys.stderr)
+            p.terminate()
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+ZIP archives streamed straight from files on disk, for project exports.
+
+    archive = StoredZip([Entry("videos/a.mp4", path="videos/a.mp4"),
+                         Entry("manifest.json", data=manifest_bytes)])
+    archive.size                   # exact length, known before any byte is sent
+    archive.stream(start, stop)    # bytes [start, stop), read in CHUNK_SIZE pieces
+
+Entries are stored, not deflated (MP4 and JPEG don't compress), so every
+offset in the archive follows from the file sizes alone: Content-Length
+and Range work without building the archive first. CRC-32s are computed
+while the data goes out and written in a data descriptor after each entry
+(general purpose flag bit 3), so nothing is read twice on a plain
+download. A Range request that starts past an entry still needs its CRC
+for the central directory; that means one extra read of the file, unless
+the CRC is already cached in this process. ZIP64 records are used for
+entries of 4 GiB and more, offsets past 4 GiB and more than 65535 entries.
+
+The archive is byte-for-byte the same for the same files (names, sizes,
+mtimes), which is what `etag` identifies and what resuming relies on.
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+
+CHUNK_SIZE = 256 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF   # sizes and offsets from here on need ZIP64 fields
+MAX_ENTRIES = 0xFFFF
+MAX32, MAX16 = 0xFFFFFFFF, 0xFFFF   # "see the ZIP64 record" placeholders
+
+FLAGS = 0x08 | 0x800      # data descriptor follows the data; names are UTF-8
+VERSION = 20
+VERSION_ZIP64 = 45
+MADE_BY_UNIX = 3 << 8
+FILE_MODE = 0o100644 << 16
+
+_CRCS = {}   # (path, size, mtime_ns) -> CRC-32
+_CRCS_LOCK = threading.Lock()
+
+
+def _dos_time(mtime):
+    t = time.gmtime(max(mtime, 315532800))   # ZIP dates start in 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _crc_key(entry):
+    return entry.path, entry.size, entry.mtime_ns
+
+
+class Entry:
+    """One stored file of the archive: a file on disk (path) or bytes in memory (data)."""
+
+    def __init__(self, name, path=None, data=None, mtime=None):
+        self.name = name.encode("utf-8")
+        self.path, self.data = path, data
+        if path is not None:
+            st = os.stat(path)
+            self.size, self.mtime_ns = st.st_size, st.st_mtime_ns
+            mtime = st.st_mtime if mtime is None else mtime
+        else:
+            self.size, self.mtime_ns = len(data), 0
+            self.crc = zlib.crc32(data)
+        self.time, self.date = _dos_time(mtime or 0)
+        self.offset = 0   # of the local header, set by StoredZip
+
+    @property
+    def zip64(self):
+        return self.size >= ZIP64_LIMIT
+
+    def known_crc(self):
+        if self.path is None:
+            return self.crc
+        with _CRCS_LOCK:
+            return _CRCS.get(_crc_key(self))
+
+    def remember_crc(self, crc):
+        with _CRCS_LOCK:
+            if len(_CRCS) > 100000:
+                _CRCS.clear()
+            _CRCS[_crc_key(self)] = crc
+
+    def get_crc(self):
+        crc = self.known_crc()
+        if crc is None:
+            crc = 0
+            for chunk in self.read(0, self.size):
+                crc = zlib.crc32(chunk, crc)
+            self.remember_crc(crc)
+        return crc
+
+    def read(self, lo, hi):
+        """The entry's bytes [lo, hi), in chunks."""
+        if self.path is None:
+            yield self.data[lo:hi]
+            return
+        with open(self.path, "rb") as f:
+            f.seek(lo)
+            remaining = hi - lo
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{self.path} shrank while being exported")
+                remaining -= len(chunk)
+                yield chunk
+
+    def local_header(self):
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0) if self.zip64 else b""
+        size = MAX32 if self.zip64 else 0
+        return struct.pack("<IHHHHHIIIHH", 0x04034b50, VERSION_ZIP64 if self.zip64 else VERSION, FLAGS, 0,
+                           self.time, self.date, 0, size, size, len(self.name), len(extra)) + self.name + extra
+
+    def descriptor_size(self):
+        return 24 if self.zip64 else 16
+
+    def descriptor(self):
+        fmt = "<IIQQ" if self.zip64 else "<IIII"
+        return struct.pack(fmt, 0x08074b50, self.get_crc(), self.size, self.size)
+
+    def _central_extra(self):
+        values = [self.size, self.size] if self.zip64 else []
+        if self.offset >= ZIP64_LIMIT:
+            values.append(self.offset)
+        return struct.pack(f"<HH{len(values)}Q", 1, 8 * len(values), *values) if values else b""
+
+    def central_size(self):
+        return 46 + len(self.name) + len(self._central_extra())
+
+    def central_header(self):
+        extra = self._central_extra()
+        version = VERSION_ZIP64 if extra else VERSION
+        size = MAX32 if self.zip64 else self.size
+        offset = MAX32 if self.offset >= ZIP64_LIMIT else self.offset
+        return struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, MADE_BY_UNIX | version, version, FLAGS, 0,
+                           self.time, self.date, self.get_crc(), size, size, len(self.name), len(extra),
+                           0, 0, 0, FILE_MODE, offset) + self.name + extra
+
+
+class StoredZip:
+    """Layout of an uncompressed ZIP of entries; streams any byte range of it."""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self._parts = []   # (offset, length, fn(lo, hi) -> chunks)
+        pos = 0
+        for e in self.entries:
+            e.offset = pos
+            header = e.local_header()
+            for length, fn in ((len(header), lambda lo, hi, b=header: [b[lo:hi]]),
+                               (e.size, lambda lo, hi, e=e: self._data(e, lo, hi)),
+                               (e.descriptor_size(), lambda lo, hi, e=e: [e.descriptor()[lo:hi]])):
+                self._parts.append((pos, length, fn))
+                pos += length
+        self.central_offset = pos
+        self.central_length = sum(e.central_size() for e in self.entries)
+        self._parts.append((pos, self.central_length, lambda lo, hi: self._central(lo, hi)))
+        pos += self.central_length
+        end = self._end()
+        self._parts.append((pos, len(end), lambda lo, hi: [end[lo:hi]]))
+        self.size = pos + len(end)
+
+    @property
+    def etag(self):
+        h = hashlib.sha256()
+        for e in self.entries:
+            h.update(b"%s\0%d\0%d\0" % (e.name, e.size, e.mtime_ns))
+            if e.path is None:
+                h.update(e.data)
+        return h.hexdigest()[:32]
+
+    def _data(self, e, lo, hi):
+        # A whole file going out gets its CRC on the way, for the descriptor after it
+        whole = lo == 0 and hi == e.size and e.known_crc() is None
+        crc = 0
+        for chunk in e.read(lo, hi):
+            if whole:
+                crc = zlib.crc32(chunk, crc)
+            yield chunk
+        if whole:
+            e.remember_crc(crc)
+
+    def _central(self, lo, hi):
+        # Built per entry so a range in the middle only encodes what it needs
+        pos = 0
+        for e in self.entries:
+            length = e.central_size()
+            if pos + length > lo and pos < hi:
+                yield e.central_header()[max(lo - pos, 0):hi - pos]
+            pos += length
+
+    def _end(self):
+        count, cd_size, cd_offset = len(self.entries), self.central_length, self.central_offset
+        end = b""
+        if count >= MAX_ENTRIES or cd_size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+            zip64_offset = cd_offset + cd_size
+            end += struct.pack("<IQHHIIQQQQ", 0x06064b50, 44, MADE_BY_UNIX | VERSION_ZIP64, VERSION_ZIP64,
+                               0, 0, count, count, cd_size, cd_offset)
+            end += struct.pack("<IIQI", 0x07064b50, 0, zip64_offset, 1)
+        count16 = MAX16 if count >= MAX_ENTRIES else count
+        return end + struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, count16, count16,
+                                 MAX32 if cd_size >= ZIP64_LIMIT else cd_size,
+                                 MAX32 if cd_offset >= ZIP64_LIMIT else cd_offset, 0)
+
+    def stream(self, start=0, stop=None):
+        """The archive's bytes [start, stop), in chunks of at most CHUNK_SIZE."""
+        stop = self.size if stop is None else stop
+        for offset, length, fn in self._parts:
+            if offset + length <= start or not length:
+                continue
+            if offset >= stop:
+                break
+            yield from fn(max(start - offset, 0), min(stop - offset, length))